@@ -0,0 +1,510 @@
+# Custody receipt documents (PDF and Excel). reportlab, openpyxl and the Arabic
+# shaping libraries are slow to import and exports are rare, so nothing imports
+# this module at startup: the export code loads it on the first receipt.
+import io
+import os
+import re
+import threading
+from functools import cached_property, lru_cache
+
+import arabic_reshaper
+import openpyxl
+from bidi.algorithm import get_display
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle
+
+from django.conf import settings
+
+
+# =============== Arabic Shaping ===============
+ARABIC_LETTERS = re.compile("[\u0600-\u06FF]")
+# Distinct strings kept shaped: the fixed wording plus names, departments,
+# devices and accessories recurring across receipts
+SHAPE_CACHE_SIZE = 4096
+
+
+class Reshaper(arabic_reshaper.ArabicReshaper):
+    # ArabicReshaper means to cache its ligature regex, but its hasattr() check
+    # misses the name-mangled attribute, so every reshape() rebuilds the regex
+    # with ~300 configparser lookups
+    @cached_property
+    def _ligatures_re(self):
+        return super()._ligatures_re
+
+
+reshaper = Reshaper()
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def shape(text):
+    """Reshape + bidi ``text`` for correct PDF rendering."""
+    return get_display(reshaper.reshape(text))
+
+
+@lru_cache(maxsize=SHAPE_CACHE_SIZE)
+def paragraph_markup(text):
+    """Paragraph markup for ``text``: shaped with <br/> line breaks if it has Arabic letters, else as is."""
+    if ARABIC_LETTERS.search(text):
+        return shape(text).replace("\n", "<br/>")
+    return text
+
+
+# =============== Static Text ===============
+# The receipt's fixed wording, shaped once per process by PDFConfig.load()
+STATIC_TEXT = {
+    "title": "نموذج تسليم عهدة / Custody Receipt Form",
+    "date": "التاريخ / Date : ",
+    "employee_name": "اسم الموظف / Employee Name :",
+    "department": "القسم / Department : ",
+    "job_title": "المسمى الوظيفي / Job Title : ",
+    "badge_number": "الرقم الوظيفي / Badget Number : ",
+    "intro_ar": "بموجب هذا النموذج، نُقر نحن الكليات الأولى بأن الموظف المذكور أعلاه قد استلم عهدة العمل التالية:",
+    "intro_en": (
+        "By this form, we at Al-Kulliyat Al-Oula (First Colleges) acknowledge that the "
+        "above-mentioned employee has received the following work-related items."
+    ),
+    "declaration_title": "إقرار الموظف:",
+    "declaration_ar": (
+        "أُقرّ أنا الموقع أدناه بأنني قد استلمت العهدة الموضحة أعلاه بحالة سليمة.\n"
+        "وأتعهد بالمحافظة عليها واستخدامها فقط في الأغراض الوظيفية.\n"
+        "كما أتحمل كامل المسؤولية عنها، وفي حال ضياعها أو تلفها نتيجة الإهمال أو الاستخدام الخاطئ،\n"
+        "أتحمل التبعات القانونية والمالية المترتبة على ذلك، وفق سياسات وأنظمة الشركة."
+    ),
+    "receiver_name": "اسم الموظف المستلم/ Employee Name: ",
+    "signature": "التوقيع / Signature: ___________________",
+    "header_ar_1": "المملكة العربية السعودية",
+    "header_ar_2": "مجلس شؤون الجامعات",
+    "header_ar_3": "كليات الأولى الأهلية بالأحساء",
+    "footer_ar": "الأحساء – المبرز – الحي الأكاديمي، الرمز البريدي: 36429 | Al-Mubarraz, Al-Ahsa - Academic District, Zip Code: 36429",
+    "th_condition": "الحالة\nCondition",
+    "th_accessories": "الملحقات\nAccessories",
+    "th_serial": "الرقم التسلسلي\nSerial Number",
+    "th_brand": "الماركة\nBrand",
+    "th_item_type": "نوع الجهاز\nItem Type",
+    "th_no": "م.\nNo.",
+}
+
+
+# =============== PDF Config (Helpers, Fonts, Styles) ===============
+class PDFConfig:
+    """
+    Centralized configuration for fonts, helpers, and styles. Fonts and
+    styles are set up by load(), once per process, on the first receipt.
+    """
+    font_dir = os.path.join(settings.BASE_DIR, "static", "font")
+    dejavu_path = os.path.join(font_dir, "DejaVuSans.ttf")
+
+    styles = None
+    # STATIC_TEXT as Paragraph markup
+    text = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ar_text(txt: str) -> str:
+        """Reshape + bidi Arabic text for correct PDF rendering."""
+        if not txt:
+            return ""
+        return shape(str(txt))
+
+    @classmethod
+    def load(cls):
+        """Register the fonts, build the stylesheet and shape the static text; thread-safe, and a no-op once done."""
+        if cls.styles is not None:
+            return
+        with cls._lock:
+            if cls.styles is not None:
+                return
+
+            # ---- Fonts ----
+            try:
+                pdfmetrics.registerFont(TTFont("DejaVu", cls.dejavu_path))
+            except Exception:
+                pass
+
+            # ---- Styles ----
+            styles = getSampleStyleSheet()
+            styles.add(ParagraphStyle(name="Arabic", fontName="DejaVu", alignment=2, fontSize=12, leading=16))
+            styles.add(ParagraphStyle(name="English", fontName="DejaVu", alignment=0, fontSize=10))
+            styles.add(
+                ParagraphStyle(
+                    name="SectionTitle",
+                    fontName="DejaVu",
+                    alignment=1,
+                    fontSize=13,
+                    spaceAfter=12,
+                    spaceBefore=12,
+                )
+            )
+            cls.text = {name: paragraph_markup(value) for name, value in STATIC_TEXT.items()}
+            # Published last: other threads only see a complete configuration
+            cls.styles = styles
+
+
+# =============== Header/Footer ===============
+class HeaderFooter:
+    """
+    The letterhead of every page. It is recorded once per document as two
+    Form XObjects (the header goes under the page content, the footer over
+    it) that each page only references. The logo is decoded and scaled down
+    to ``logo_dpi`` once per process; drawn inside the header form, it is
+    embedded once per document.
+    """
+    header_form = "ReceiptHeader"
+    footer_form = "ReceiptFooter"
+
+    logo_path = os.path.join(settings.BASE_DIR, "static", "img", "logo.png")
+    # Box the logo is fitted into (points) and the resolution it is embedded at
+    logo_box = (A4[0] / 2 - 30, A4[1] - 70, 100, 60)
+    logo_dpi = 300
+
+    # ImageReader over the scaled logo, or False without a logo file; set by logo()
+    _logo = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def logo(cls):
+        if cls._logo is None:
+            with cls._lock:
+                if cls._logo is None:
+                    cls._logo = cls._load_logo()
+        return cls._logo
+
+    @classmethod
+    def _load_logo(cls):
+        if not os.path.exists(cls.logo_path):
+            return False
+        with Image.open(cls.logo_path) as image:
+            image.load()
+            image.thumbnail([round(side / 72 * cls.logo_dpi) for side in cls.logo_box[2:]], Image.LANCZOS)
+        return ImageReader(image)
+
+    @classmethod
+    def draw_logo(cls, canvas):
+        logo = cls.logo()
+        if logo:
+            canvas.drawImage(logo, *cls.logo_box, mask="auto", preserveAspectRatio=True, anchor="c")
+
+    @classmethod
+    def draw_header(cls, canvas, doc):
+        if not canvas.hasForm(cls.header_form):
+            canvas.beginForm(cls.header_form)
+            cls._header(canvas)
+            canvas.endForm()
+        canvas.doForm(cls.header_form)
+
+    @classmethod
+    def draw_footer(cls, canvas, doc):
+        if not canvas.hasForm(cls.footer_form):
+            canvas.beginForm(cls.footer_form)
+            cls._footer(canvas)
+            canvas.endForm()
+        canvas.doForm(cls.footer_form)
+
+    @classmethod
+    def _header(cls, canvas):
+        canvas.saveState()
+        canvas.setFont("DejaVu", 11)
+
+        # Arabic (right side)
+        for i, name in enumerate(("header_ar_1", "header_ar_2", "header_ar_3")):
+            canvas.drawRightString(A4[0] - 30, A4[1] - 30 - (i * 18), PDFConfig.text[name])
+
+        # Logo
+        cls.draw_logo(canvas)
+
+        # English (left side)
+        left_text = (
+            "Kingdom of Saudi Arabia\n"
+            "Council Of Universities' Affairs\n"
+            "AlOola Colleges Private Al Ahsa"
+        )
+        for i, line in enumerate(left_text.split("\n")):
+            canvas.drawString(30, A4[1] - 30 - (i * 18), line)
+
+        canvas.restoreState()
+
+    @staticmethod
+    def _footer(canvas):
+        canvas.saveState()
+        canvas.setFont("DejaVu", 8)
+
+        # Top line (gold color)
+        canvas.setStrokeColorRGB(193 / 255.0, 135 / 255.0, 65 / 255.0)
+        canvas.setLineWidth(8)
+        canvas.line(0, A4[1], A4[0], A4[1] - 0)
+
+        canvas.drawCentredString(A4[0] / 2, 14, PDFConfig.text["footer_ar"])
+        canvas.line(0, 0, A4[0], 0)
+        canvas.setLineWidth(1)
+        canvas.setStrokeColorRGB(0, 0, 0)
+        canvas.line(30, 30, A4[0] - 30, 30)
+        canvas.restoreState()
+
+
+# =============== Main Export Class ===============
+class CustodyPDFBuilder:
+    def __init__(self, obj):
+        PDFConfig.load()
+        self.obj = obj
+        self.buffer = io.BytesIO()
+        self.header_style = ParagraphStyle(
+            "HeaderStyle", fontName="DejaVu", fontSize=10, textColor=colors.white, alignment=1
+        )
+
+    def build(self):
+        doc = BaseDocTemplate(
+            self.buffer,
+            pagesize=A4,
+            leftMargin=30,
+            rightMargin=30,
+            topMargin=100,
+            bottomMargin=40
+        )
+
+        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="normal")
+
+        doc.addPageTemplates([
+            PageTemplate(id="main", frames=frame, onPage=HeaderFooter.draw_header, onPageEnd=HeaderFooter.draw_footer)
+        ])
+
+        story = []
+        story += self._title_section()
+        story += self._employee_section()
+        story += self._devices_section()
+        story += self._declaration_section()
+        story += self._signature_section()
+
+        doc.build(story)
+        self.buffer.seek(0)
+        return self.buffer
+
+    # ---------- Helpers ----------
+    def make_paragraph(self, text, style=None):
+        """Return a Paragraph with Arabic reshaping + bidi if needed."""
+        style = style or PDFConfig.styles["Arabic"]
+        if text is None:
+            text = "-"
+        return Paragraph(paragraph_markup(str(text)), style)
+
+    # ---------- Sections ----------
+    def _title_section(self):
+        return [
+            Paragraph(PDFConfig.text["title"], PDFConfig.styles["SectionTitle"]),
+            Spacer(1, 20),
+        ]
+
+    def _employee_section(self):
+        fields = [
+            (str(self.obj.custody_date), PDFConfig.text["date"]),
+            (PDFConfig.text["employee_name"], ""),
+            (f"{PDFConfig.ar_text(self.obj.employee.full_name_ar)} / {self.obj.employee.full_name_en}", ""),
+            (PDFConfig.ar_text(self.obj.employee.department), PDFConfig.text["department"]),
+            (PDFConfig.ar_text(self.obj.employee.job_title), PDFConfig.text["job_title"]),
+            (PDFConfig.ar_text(self.obj.employee.job_title), PDFConfig.text["badge_number"]),
+        ]
+
+        story = []
+        for i, (label, value) in enumerate(fields):
+            text = f"<b>{label}</b> {value}"
+            story.append(Paragraph(text, PDFConfig.styles["Arabic"] if i != 2 else PDFConfig.styles["SectionTitle"]))
+            story.append(Spacer(1, 6))
+
+        story.append(Spacer(1, 20))
+        story.append(Paragraph(PDFConfig.text["intro_ar"], PDFConfig.styles["Arabic"]))
+        story.append(Paragraph(PDFConfig.text["intro_en"], PDFConfig.styles["English"]))
+        story.append(Spacer(1, 20))
+
+        return story
+
+    def _signature_section(self):
+        return [
+            Paragraph(PDFConfig.text["receiver_name"], PDFConfig.styles["Arabic"]),
+            Paragraph(PDFConfig.text["signature"], PDFConfig.styles["Arabic"]),
+            Spacer(1, 20),
+        ]
+
+    def _declaration_section(self):
+        para_en = (
+            "I, the undersigned, acknowledge that I have received the above-listed items "
+            "in good condition.\nI commit to maintaining and using them solely for work purposes.\n"
+            "In case of loss or damage due to negligence or misuse, I agree to bear the legal "
+            "and financial consequences in accordance with the company's policies."
+        )
+
+        return [
+            Paragraph(PDFConfig.text["declaration_title"], PDFConfig.styles["Arabic"]),
+            Paragraph(PDFConfig.text["declaration_ar"], PDFConfig.styles["Arabic"]),
+            Spacer(1, 10),
+            Paragraph(para_en, PDFConfig.styles["English"]),
+            Spacer(1, 20),
+        ]
+
+    def _devices_section(self):
+        headers = ["th_condition", "th_accessories", "th_serial", "th_brand", "th_item_type", "th_no"]
+        header_row = [Paragraph(PDFConfig.text[h], self.header_style) for h in headers]
+        data = [header_row]
+
+        for i, dc in enumerate(self.obj.devices.all()):
+            accessories = "\n".join([f"- {a.name_ar}/{a.name_en}" for a in dc.accessories.all()]) or "-"
+            item_text = f"{dc.device.name_ar}/{dc.device.name_en} | {dc.device.device_type.name_ar}/{dc.device.device_type.name_en}"
+
+            row = [
+                self.make_paragraph(dc.device.get_status_display()),
+                self.make_paragraph(accessories),
+                self.make_paragraph(dc.device.serial_number or "-"),
+                self.make_paragraph(dc.device.brand or "-"),
+                self.make_paragraph(item_text),
+                Paragraph(str(i + 1), PDFConfig.styles["SectionTitle"]),
+            ]
+            data.append(row)
+
+        max_col_lengths = [
+            max(len(str(r[j].text)) if hasattr(r[j], "text") else 10 for r in data) for j in range(len(headers))
+        ]
+        total_width = 550
+        min_width, max_width = 40, 160
+        scale = total_width / sum(max_col_lengths)
+        col_widths = [max(min_width, min(int(l * scale), max_width)) for l in max_col_lengths]
+
+        table = Table(data, colWidths=col_widths, repeatRows=1)
+        table.setStyle(TableStyle([
+            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1B2856")),
+            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
+            ("FONTNAME", (0, 0), (-1, 0), "DejaVu"),
+            ("FONTSIZE", (0, 0), (-1, 0), 10),
+            ("ALIGN", (0, 0), (-1, 0), "CENTER"),
+            ("VALIGN", (0, 0), (-1, 0), "MIDDLE"),
+            ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
+            ("TOPPADDING", (0, 0), (-1, 0), 6),
+            ("FONTNAME", (0, 1), (-1, -1), "DejaVu"),
+            ("FONTSIZE", (0, 1), (-1, -1), 10),
+            ("ALIGN", (0, 1), (-1, -1), "CENTER"),
+            ("VALIGN", (0, 1), (-1, -1), "TOP"),
+            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.HexColor("#F9F9F9"), colors.white]),
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#D3D3D3")),
+            ("BOX", (0, 0), (-1, -1), 0.75, colors.HexColor("#1B2856")),
+            ("LEFTPADDING", (0, 0), (-1, -1), 6),
+            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
+            ("TOPPADDING", (0, 1), (-1, -1), 4),
+            ("BOTTOMPADDING", (0, 1), (-1, -1), 4),
+        ]))
+        return [table, Spacer(1, 20)]
+
+
+# =============== Excel Exporter ===============
+class CustodyExcelBuilder:
+    def __init__(self, obj):
+        self.obj = obj
+
+    def build(self):
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Custody Receipt"
+
+        # ---------- Styles ----------
+        bold_font = Font(bold=True)
+        center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
+        right_align = Alignment(horizontal="right", vertical="center", wrap_text=True)
+        header_fill = PatternFill("solid", fgColor="1B2856")
+        white_font = Font(color="FFFFFF", bold=True)
+        thin_border = Border(
+            left=Side(style="thin"),
+            right=Side(style="thin"),
+            top=Side(style="thin"),
+            bottom=Side(style="thin"),
+        )
+
+        row = 1
+        # ---------- Title ----------
+        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
+        ws.cell(row=row, column=1, value="نموذج تسليم عهدة / Custody Receipt Form").font = Font(bold=True, size=14)
+        ws.cell(row=row, column=1).alignment = center_align
+        row += 2
+
+        # ---------- Employee Info ----------
+        def add_full_row(value, align=center_align, bold=False):
+            nonlocal row
+            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
+            cell = ws.cell(row=row, column=1, value=value)
+            cell.alignment = align
+            if bold:
+                cell.font = Font(bold=True)
+            row += 1
+
+        add_full_row(f"التاريخ / Date: {self.obj.custody_date}", right_align)
+        add_full_row(f"اسم الموظف / Employee Name: {self.obj.employee.full_name_ar} / {self.obj.employee.full_name_en}", right_align, bold=True)
+        add_full_row(f"القسم / Department: {self.obj.employee.department}", right_align)
+        add_full_row(f"المسمى الوظيفي / Job Title: {self.obj.employee.job_title}", right_align)
+        add_full_row(f"الرقم الوظيفي / Badge Number: {self.obj.employee.job_title or '-'}", right_align)
+        row += 1
+
+        # ---------- Intro ----------
+        add_full_row("بموجب هذا النموذج، نُقر نحن الكليات الأولى بأن الموظف المذكور أعلاه قد استلم عهدة العمل التالية:", right_align)
+        add_full_row("By this form, we at Al-Kulliyat Al-Oula (First Colleges) acknowledge that the employee has received the following items.")
+        row += 1
+
+        # ---------- Devices Table ----------
+        headers = ["م.\nNo.", "نوع الجهاز\nItem Type", "الماركة\nBrand", "الرقم التسلسلي\nSerial Number", "الملحقات\nAccessories", "الحالة\nCondition"]
+        for col in range(1, len(headers) + 1):
+            cell = ws.cell(row=row, column=col)
+            cell.fill = header_fill
+            cell.font = white_font
+            cell.alignment = center_align
+            cell.border = thin_border
+            cell.value = headers[col - 1]
+        row += 1
+
+        for i, dc in enumerate(self.obj.devices.all(), start=1):
+            accessories = ", ".join([f"{a.name_ar}/{a.name_en}" for a in dc.accessories.all()]) or "-"
+            item_text = f"{dc.device.name_ar}/{dc.device.name_en} | {dc.device.device_type.name_ar}/{dc.device.device_type.name_en}"
+
+            values = [
+                i,
+                item_text,
+                dc.device.brand or "-",
+                dc.device.serial_number or "-",
+                accessories,
+                dc.device.get_status_display(),
+            ]
+            ws.append(values)
+            for col in range(1, len(values) + 1):
+                cell = ws.cell(row=row, column=col)
+                cell.alignment = center_align
+                cell.border = thin_border
+            row += 1
+
+        row += 1
+
+        # ---------- Declaration ----------
+        add_full_row("إقرار الموظف:", right_align, bold=True)
+        add_full_row("أُقرّ أنا الموقع أدناه بأنني قد استلمت العهدة الموضحة أعلاه بحالة سليمة. "
+                     "وأتعهد بالمحافظة عليها واستخدامها فقط في الأغراض الوظيفية.", right_align)
+        add_full_row("I, the undersigned, acknowledge that I have received the above-listed items "
+                     "in good condition and commit to maintaining and using them solely for work purposes.")
+        row += 1
+
+        # ---------- Signature ----------
+        add_full_row("اسم الموظف المستلم / Employee Name:", right_align)
+        add_full_row("التوقيع / Signature: ___________________", right_align)
+
+        # ---------- Column widths ----------
+        for col in range(1, 7):
+            ws.column_dimensions[get_column_letter(col)].width = 25
+
+        # Save to BytesIO
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        return buffer
+
+
+# Export action -> builder
+BUILDERS = {"pdf": CustodyPDFBuilder, "excel": CustodyExcelBuilder}
@@ -1,6 +1,12 @@
+from collections import defaultdict
+
 from django import forms
-from django.forms import inlineformset_factory
-from .models import Device, DeviceAccessory, Custody, DeviceCustody, Status
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+
+from employees.models import Employee
+from .models import Device, DeviceAccessory, Custody, DeviceCustody, AccessoryCustody, Status
 
 
 # Device Form
@@ -39,53 +45,174 @@ class CustodyForm(forms.ModelForm):
         }
 
 
+# Bulk receipt export filter
+class CustodyExportForm(forms.Form):
+    start = forms.DateField(required=False, label=_("From"), widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(required=False, label=_("To"), widget=forms.DateInput(attrs={"type": "date"}))
+    department = forms.ChoiceField(required=False, label=_("Department"))
+    not_returned = forms.BooleanField(required=False, label=_("Not returned only"))
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        departments = (
+            Employee.objects.exclude(department__isnull=True).exclude(department="")
+            .order_by("department").values_list("department", flat=True).distinct()
+        )
+        self.fields["department"].choices = [("", _("All"))] + [(name, name) for name in departments]
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start, end = cleaned_data.get("start"), cleaned_data.get("end")
+        if start and end and start > end:
+            raise forms.ValidationError(_("The start date must be before the end date."))
+        return cleaned_data
+
+
+class PrefetchedModelChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that, once ``objects`` ({pk: instance}) is set, looks the
+    submitted value up there instead of querying ``queryset``. ``objects``
+    must only hold instances the queryset would return.
+    """
+
+    def __init__(self, *args, objects=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def to_python(self, value):
+        if self.objects is None or value in self.empty_values:
+            return super().to_python(value)
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            return self.objects[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise forms.ValidationError(
+                self.error_messages["invalid_choice"], code="invalid_choice", params={"value": value}
+            )
+
+
+class PrefetchedModelMultipleChoiceField(forms.ModelMultipleChoiceField):
+    """ModelMultipleChoiceField counterpart of PrefetchedModelChoiceField; cleans to a list."""
+
+    def __init__(self, *args, objects=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = objects
+
+    def clean(self, value):
+        if self.objects is None:
+            return super().clean(value)
+        value = self.prepare_value(value)
+        if not value:
+            if self.required:
+                raise forms.ValidationError(self.error_messages["required"], code="required")
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise forms.ValidationError(self.error_messages["invalid_list"], code="invalid_list")
+        selected = []
+        for pk in value:
+            try:
+                selected.append(self.objects[int(pk)])
+            except (KeyError, TypeError, ValueError):
+                raise forms.ValidationError(
+                    self.error_messages["invalid_choice"], code="invalid_choice", params={"value": pk}
+                )
+        self.run_validators(value)
+        return selected
+
+
 # DeviceCustody Form 
 class DeviceCustodyForm(forms.ModelForm):
-    device = forms.ModelChoiceField(
+    device = PrefetchedModelChoiceField(
         queryset=Device.objects.none(),  # will set in __init__
         label="Device",
         disabled=False  # will disable later for existing instance
     )
-    accessories = forms.ModelMultipleChoiceField(
-        queryset=DeviceAccessory.objects.select_related("device"),
+    accessories = PrefetchedModelMultipleChoiceField(
+        queryset=DeviceAccessory.objects.none(),  # scoped to the selected device in __init__
         required=False,
         widget=forms.CheckboxSelectMultiple
     )
 
     class Meta:
         model = DeviceCustody
-        fields = ["device", "accessories"]
+        # accessories is handled in __init__/save() so model_to_dict doesn't query it per row
+        fields = ["device"]
 
-    def __init__(self, *args, **kwargs):
+    def __init__(
+        self, *args, accessory_lookup=None, selected_accessories=None, device_choices=None,
+        available_devices=None, **kwargs
+    ):
+        """
+        ``accessory_lookup`` ({device_id: [accessories]}), ``selected_accessories``
+        ({device_custody_id: [accessory_ids]}), ``device_choices`` and
+        ``available_devices`` ({device_id: device} for the submitted devices that
+        are available) are shared by DeviceCustodyFormSet so subforms don't each
+        query and render the whole inventory, nor query their values when cleaned.
+        """
         super().__init__(*args, **kwargs)
 
         if self.instance and self.instance.pk:
             # Existing device cannot be changed
-            self.fields["device"].queryset = Device.objects.filter(pk=self.instance.device.pk)
+            self.fields["device"].queryset = Device.objects.filter(pk=self.instance.device_id)
             self.fields["device"].disabled = True
+            self.fields["device"].widget.choices = [(self.instance.device_id, str(self.instance.device))]
+            if available_devices is not None:
+                self.fields["device"].objects = {self.instance.device_id: self.instance.device}
 
             # Pre-select accessories for this custody
-            self.fields["accessories"].initial = self.instance.accessories.all()
+            if selected_accessories is not None:
+                self.fields["accessories"].initial = selected_accessories.get(self.instance.pk, [])
+            else:
+                self.fields["accessories"].initial = self.instance.accessories.all()
         else:
             # New custody: show only available devices
             self.fields["device"].queryset = Device.objects.filter(status=Status.AVAILABLE)
+            if device_choices is not None:
+                self.fields["device"].widget.choices = device_choices
+            if available_devices is not None:
+                self.fields["device"].objects = available_devices
+
+        # Only the accessories of this row's device are valid choices
+        device_id = self.get_device_id()
+        if device_id:
+            self.fields["accessories"].queryset = DeviceAccessory.objects.filter(device_id=device_id)
+        if accessory_lookup is not None:
+            accessories = accessory_lookup.get(device_id, [])
+            self.fields["accessories"].objects = {accessory.pk: accessory for accessory in accessories}
+            self.fields["accessories"].widget.choices = [
+                (accessory.pk, f"{accessory.name_en} / {accessory.name_ar}") for accessory in accessories
+            ]
+
+    def get_device_id(self):
+        """Device of this row, from the instance or the submitted data."""
+        if self.instance and self.instance.pk:
+            return self.instance.device_id
+        if self.is_bound:
+            value = str(self.data.get(self.add_prefix("device"), "")).strip()
+            if value.isdigit():
+                return int(value)
+        return None
 
-        # Add data-device attribute to accessories for JS filtering (optional)
-        self.fields["accessories"].widget.option_attrs = {
-            accessory.pk: {"data-device": str(accessory.device_id)}
-            for accessory in self.fields["accessories"].queryset
-        }
-    
     def clean_accessories(self):
         selected_accessories = self.cleaned_data.get("accessories")
         device = self.cleaned_data.get("device")
 
         for accessory in selected_accessories:
-            if accessory.device != device:
+            if device is None or accessory.device_id != device.pk:
                 raise forms.ValidationError(f"Accessory {accessory} does not belong to the selected device {device}.")
 
         return selected_accessories
-    
+
+    def _get_validation_exclusions(self):
+        exclude = super()._get_validation_exclusions()
+        # A prefetched device exists and is allowed; the model would re-check
+        # that and (custody, device) uniqueness with two queries per row, so
+        # DeviceCustodyFormSet.clean() checks duplicates once for all rows
+        if self.fields["device"].objects is not None:
+            exclude.add("device")
+        return exclude
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         if commit:
@@ -95,11 +222,102 @@ class DeviceCustodyForm(forms.ModelForm):
         return instance
 
 
+class BaseDeviceCustodyFormSet(BaseInlineFormSet):
+    """
+    Builds one accessory lookup for the whole formset, limited to the devices
+    actually present (existing rows + submitted rows), and hands it to every subform.
+    """
+
+    def __init__(self, *args, queryset=None, **kwargs):
+        if queryset is None:
+            queryset = self.model._default_manager.select_related("device")
+        super().__init__(*args, queryset=queryset, **kwargs)
+
+    def _submitted_device_ids(self):
+        if not self.is_bound:
+            return set()
+        device_ids = set()
+        for i in range(self.total_form_count()):
+            value = str(self.data.get(f"{self.prefix}-{i}-device", "")).strip()
+            if value.isdigit():
+                device_ids.add(int(value))
+        return device_ids
+
+    @cached_property
+    def accessory_lookup(self):
+        device_ids = {dc.device_id for dc in self.get_queryset()} | self._submitted_device_ids()
+        lookup = defaultdict(list)
+        if device_ids:
+            for accessory in DeviceAccessory.objects.filter(device_id__in=device_ids):
+                lookup[accessory.device_id].append(accessory)
+        return lookup
+
+    @cached_property
+    def existing_rows(self):
+        return {device_custody.pk: device_custody for device_custody in self.get_queryset()}
+
+    @cached_property
+    def available_devices(self):
+        return Device.objects.filter(status=Status.AVAILABLE).in_bulk(self._submitted_device_ids())
+
+    @cached_property
+    def selected_accessories(self):
+        selected = defaultdict(list)
+        if self.instance.pk:
+            rows = AccessoryCustody.objects.filter(
+                device_custody__custody=self.instance
+            ).values_list("device_custody_id", "accessory_id")
+            for device_custody_id, accessory_id in rows:
+                selected[device_custody_id].append(accessory_id)
+        return selected
+
+    @cached_property
+    def device_choices(self):
+        field = DeviceCustodyForm.base_fields["device"]
+        return [("", field.empty_label)] + [
+            (device.pk, str(device)) for device in Device.objects.filter(status=Status.AVAILABLE)
+        ]
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs["accessory_lookup"] = self.accessory_lookup
+        kwargs["selected_accessories"] = self.selected_accessories
+        kwargs["device_choices"] = self.device_choices
+        kwargs["available_devices"] = self.available_devices
+        return kwargs
+
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        # Submitted row ids resolve against the rows the formset already loaded
+        pk_name = self._pk_field.name
+        field = form.fields[pk_name]
+        form.fields[pk_name] = PrefetchedModelChoiceField(
+            field.queryset, objects=self.existing_rows,
+            initial=field.initial, required=False, widget=field.widget,
+        )
+
+    def clean(self):
+        super().clean()
+        # Subforms skip the model's (custody, device) unique check; every row of
+        # the custody is in the formset, so comparing the rows covers it
+        seen = set()
+        for form in self.forms:
+            if not hasattr(form, "cleaned_data") or self._should_delete_form(form):
+                continue
+            device = form.cleaned_data.get("device")
+            if device is None:
+                continue
+            if device.pk in seen:
+                form.add_error("device", _("This device is already in the custody."))
+            seen.add(device.pk)
+
+
 # Inline formset: multiple devices per custody
 DeviceCustodyFormSet = inlineformset_factory(
     Custody,
     DeviceCustody,
     form=DeviceCustodyForm,
+    formset=BaseDeviceCustodyFormSet,
     extra=0,
     can_delete=True
 )
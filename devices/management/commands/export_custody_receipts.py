@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from devices import receipts
+
+
+class Command(BaseCommand):
+    help = "Render the PDF receipts of the matching custodies in parallel into one ZIP archive"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=datetime.date.fromisoformat, help="First custody date (YYYY-MM-DD)")
+        parser.add_argument("--to", dest="end", type=datetime.date.fromisoformat, help="Last custody date (YYYY-MM-DD)")
+        parser.add_argument("--department", help="Only custodies of employees in this department")
+        parser.add_argument("--not-returned", action="store_true", help="Only custodies that have not been returned")
+        parser.add_argument("--workers", type=int, help="Rendering processes (default: RECEIPT_EXPORT_WORKERS)")
+        parser.add_argument("-o", "--output", default="custody_receipts.zip")
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        custodies = list(receipts.select(
+            start=kwargs["start"],
+            end=kwargs["end"],
+            department=kwargs["department"],
+            not_returned=kwargs["not_returned"],
+        ))
+        if not custodies:
+            raise CommandError("No custodies match these filters.")
+
+        with open(kwargs["output"], "wb") as archive:
+            count = receipts.write_zip(custodies, archive, workers=kwargs["workers"])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} receipt(s) to {kwargs['output']}"))
+
+# python manage.py export_custody_receipts --from 2025-09-01 --not-returned [-o receipts.zip]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0003_device_it_service_tag'),
+        ('employees', '0005_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='custody',
+            index=models.Index(fields=['custody_date', 'id'], name='custody_date_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='device',
+            index=models.Index(fields=['added_at', 'id'], name='device_added_keyset_idx'),
+        ),
+    ]
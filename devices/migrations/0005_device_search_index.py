@@ -0,0 +1,63 @@
+from django.db import migrations
+
+from employees.search import normalize_text
+
+# The index as it was defined when this migration was written; later changes
+# to devices.search ship their own migration
+TABLE = "devices_device_fts"
+COLUMNS = ("serial_number", "name_en", "name_ar", "brand")
+CREATE = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(serial_number, name_en, name_ar, brand, tokenize='trigram')",
+    ],
+    "postgresql": [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)",
+    ],
+}
+INSERT = {
+    "sqlite": f"INSERT INTO {TABLE} (rowid, serial_number, name_en, name_ar, brand) VALUES (%s, %s, %s, %s, %s)",
+    "postgresql": (
+        f"INSERT INTO {TABLE} (id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C'))"
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE:
+        return
+    Device = apps.get_model('devices', 'Device')
+    rows = Device.objects.using(connection.alias).order_by('pk').values_list('pk', *COLUMNS)
+    with connection.cursor() as cursor:
+        for statement in CREATE[connection.vendor]:
+            cursor.execute(statement)
+        batch = []
+        for pk, *texts in rows.iterator(chunk_size=2000):
+            batch.append((pk, *[normalize_text(text) for text in texts]))
+            if len(batch) >= 2000:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0004_custody_custody_date_keyset_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+from employees.search import normalize_text
+
+# The index as it was defined when this migration was written; later changes
+# to devices.search ship their own migration
+TABLE = "devices_custody_fts"
+CREATE = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(username, employee_name_en, employee_name_ar, "
+        f"serials, device_names, device_types, tokenize='trigram')",
+    ],
+    "postgresql": [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)",
+    ],
+}
+INSERT = {
+    "sqlite": (
+        f"INSERT INTO {TABLE} (rowid, username, employee_name_en, employee_name_ar, "
+        f"serials, device_names, device_types) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    ),
+    "postgresql": (
+        f"INSERT INTO {TABLE} (id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'D'))"
+    ),
+}
+
+
+def document(custody):
+    employee = custody.employee
+    devices = [device_custody.device for device_custody in custody.devices.all()]
+    return [
+        employee.user.username,
+        employee.full_name_en,
+        employee.full_name_ar,
+        " ".join(device.serial_number for device in devices),
+        " ".join(f"{device.name_en} {device.name_ar}" for device in devices),
+        " ".join(f"devicetype{device.device_type_id}x" for device in devices if device.device_type_id),
+    ]
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE:
+        return
+    Custody = apps.get_model('devices', 'Custody')
+    custodies = (
+        Custody.objects.using(connection.alias)
+        .select_related('employee__user')
+        .prefetch_related('devices__device')
+        .order_by('pk')
+    )
+    with connection.cursor() as cursor:
+        for statement in CREATE[connection.vendor]:
+            cursor.execute(statement)
+        batch = []
+        for custody in custodies.iterator(chunk_size=2000):
+            batch.append((custody.pk, *[normalize_text(text) for text in document(custody)]))
+            if len(batch) >= 2000:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0005_device_search_index'),
+        ('employees', '0005_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
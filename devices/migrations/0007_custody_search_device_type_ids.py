@@ -0,0 +1,82 @@
+from django.db import migrations
+
+from employees.search import normalize_text
+
+# Device types in the custody search document become plain ids, matched
+# with a column filter, instead of "devicetype<id>x" tokens
+TABLE = "devices_custody_fts"
+INSERT = {
+    "sqlite": (
+        f"INSERT INTO {TABLE} (rowid, username, employee_name_en, employee_name_ar, "
+        f"serials, device_names, device_types) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+    ),
+    "postgresql": (
+        f"INSERT INTO {TABLE} (id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C') || "
+        "setweight(to_tsvector('simple', %s), 'D'))"
+    ),
+}
+
+
+def device_type_ids(devices):
+    return " {} ".format(" ".join(str(device.device_type_id) for device in devices if device.device_type_id))
+
+
+def device_type_tokens(devices):
+    return " ".join(f"devicetype{device.device_type_id}x" for device in devices if device.device_type_id)
+
+
+def reindex(apps, schema_editor, device_types):
+    connection = schema_editor.connection
+    if connection.vendor not in INSERT:
+        return
+    Custody = apps.get_model('devices', 'Custody')
+    custodies = (
+        Custody.objects.using(connection.alias)
+        .select_related('employee__user')
+        .prefetch_related('devices__device')
+        .order_by('pk')
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        batch = []
+        for custody in custodies.iterator(chunk_size=2000):
+            employee = custody.employee
+            devices = [device_custody.device for device_custody in custody.devices.all()]
+            document = [
+                employee.user.username,
+                employee.full_name_en,
+                employee.full_name_ar,
+                " ".join(device.serial_number for device in devices),
+                " ".join(f"{device.name_en} {device.name_ar}" for device in devices),
+                device_types(devices),
+            ]
+            batch.append((custody.pk, *[normalize_text(text) for text in document]))
+            if len(batch) >= 2000:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def forwards(apps, schema_editor):
+    reindex(apps, schema_editor, device_type_ids)
+
+
+def backwards(apps, schema_editor):
+    reindex(apps, schema_editor, device_type_tokens)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('devices', '0006_custody_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -1,5 +1,5 @@
 from django.db import models
-from employees.models import Employee
+from employees.models import CountedStatusMixin, Employee
 from django.utils.translation import gettext_lazy as _
 
 
@@ -32,7 +32,7 @@ class DeviceType(models.Model):
 
 
 # Device
-class Device(models.Model):
+class Device(CountedStatusMixin, models.Model):
     name_ar = models.CharField(max_length=100, verbose_name=_("Device Name (Arabic)"))
     name_en = models.CharField(max_length=100, verbose_name=_("Device Name (English)"))
     serial_number = models.CharField(max_length=100, unique=True, verbose_name=_("Serial Number"))
@@ -51,6 +51,9 @@ class Device(models.Model):
         verbose_name = _("Device")
         verbose_name_plural = _("Devices")
         ordering = ["-added_at"]
+        indexes = [
+            models.Index(fields=["added_at", "id"], name="device_added_keyset_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name_en} / {self.name_ar} - {self.serial_number}"
@@ -75,7 +78,7 @@ class DeviceAccessory(models.Model):
 
 
 # Custody
-class Custody(models.Model):
+class Custody(CountedStatusMixin, models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, verbose_name=_("Employee"))
     custody_date = models.DateField(verbose_name=_("Custody Date"))
     return_date = models.DateField(null=True, blank=True, verbose_name=_("Return Date"))
@@ -92,6 +95,9 @@ class Custody(models.Model):
         verbose_name = _("Custody")
         verbose_name_plural = _("Custodies")
         ordering = ["-custody_date"]
+        indexes = [
+            models.Index(fields=["custody_date", "id"], name="custody_date_keyset_idx"),
+        ]
 
     def __str__(self):
         return f"Custody {self.employee} on {self.custody_date}"
@@ -109,11 +115,11 @@ class DeviceCustody(models.Model):
             self.device.status = Status.AVAILABLE
         else:
             self.device.status = Status.IN_USE
-        self.device.save()
+        self.device.save(update_fields=["status"])
     
     def delete(self, using=None, keep_parents=False):
         self.device.status = Status.AVAILABLE
-        self.device.save()
+        self.device.save(update_fields=["status"])
         super().delete(using=using, keep_parents=keep_parents)
 
     class Meta:
@@ -0,0 +1,209 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import translation
+
+from .models import Custody, DeviceCustody
+
+# Part of every fingerprint: bump it whenever the receipt layout changes so
+# receipts rendered by the old code are no longer served
+RECEIPT_VERSION = 2
+
+# Export action -> file extension
+EXTENSIONS = {"pdf": "pdf", "excel": "xlsx"}
+
+
+def custodies():
+    """Custodies with everything a receipt shows loaded in three queries, whatever the number of devices."""
+    return Custody.objects.select_related("employee").prefetch_related(
+        Prefetch(
+            "devices",
+            queryset=DeviceCustody.objects.select_related("device__device_type")
+            .prefetch_related("accessories").order_by("pk"),
+        )
+    )
+
+
+def fingerprint(custody, action):
+    """
+    Hash of every value the ``action`` receipt of ``custody`` is rendered from
+    (custody, employee, device custodies, devices and accessories). Display
+    values are hashed rather than codes, so each language gets its own entry.
+    """
+    employee = custody.employee
+    content = [
+        RECEIPT_VERSION,
+        action,
+        [custody.pk, custody.custody_date, custody.return_date, custody.notes],
+        [
+            employee.full_name_en, employee.full_name_ar, employee.department,
+            employee.job_title, employee.job_number,
+        ],
+    ]
+    for dc in custody.devices.all():
+        device = dc.device
+        device_type = device.device_type
+        content.append([
+            dc.notes,
+            device.name_en, device.name_ar, device.serial_number, device.brand,
+            device.get_status_display(),
+            device_type and [device_type.name_en, device_type.name_ar],
+            [
+                [acc.name_en, acc.name_ar, acc.get_status_display(), acc.get_condition_display()]
+                for acc in dc.accessories.all()
+            ],
+        ])
+    payload = json.dumps(content, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ReceiptCache:
+    """
+    Rendered receipts on disk, one file per fingerprint. A file's mtime is
+    refreshed on every hit, and once the directory outgrows ``max_size`` the
+    least recently used files are deleted.
+    """
+
+    def __init__(self, directory=None, max_size=None):
+        self.directory = str(directory or settings.RECEIPT_CACHE_DIR)
+        self.max_size = settings.RECEIPT_CACHE_MAX_SIZE if max_size is None else max_size
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def open(self, key, extension):
+        """Return the cached file opened for reading, or None on a miss."""
+        path = self.path(key, extension)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted meanwhile; the open handle still reads the whole file
+            pass
+        return handle
+
+    def store(self, key, extension, buffer):
+        """Write ``buffer`` under ``key``, then evict down to the size limit; returns the path."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Written aside and renamed into place, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(buffer.getbuffer())
+            os.replace(tmp_path, self.path(key, extension))
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        self.evict()
+        return self.path(key, extension)
+
+    def evict(self):
+        """Delete the least recently used files until the cache fits ``max_size``; returns the number deleted."""
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".tmp") or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        removed = 0
+        for _mtime, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def select(start=None, end=None, department=None, not_returned=False):
+    """custodies() dated between ``start`` and ``end`` (inclusive) for one department, oldest first."""
+    queryset = custodies()
+    if start:
+        queryset = queryset.filter(custody_date__gte=start)
+    if end:
+        queryset = queryset.filter(custody_date__lte=end)
+    if department:
+        queryset = queryset.filter(employee__department=department)
+    if not_returned:
+        queryset = queryset.filter(return_date__isnull=True)
+    return queryset.order_by("custody_date", "pk")
+
+
+def _refuse_queries(execute, sql, params, many, context):
+    raise RuntimeError("Receipts are rendered from prefetched data only; a worker tried to query the database")
+
+
+def render_pdf(custody, language=None):
+    """PDF receipt bytes for a custody loaded by custodies(); runs in the export workers."""
+    from .exporters import CustodyPDFBuilder
+
+    with translation.override(language), connection.execute_wrapper(_refuse_queries):
+        return CustodyPDFBuilder(custody).build().getvalue()
+
+
+def render_many(custodies, workers=None):
+    """
+    Yield (custody, PDF bytes) for custodies loaded by custodies(), in order.
+    Receipts already in the ReceiptCache are read from disk; the others are
+    rendered across a process pool of ``workers`` (RECEIPT_EXPORT_WORKERS,
+    else one per CPU) and stored. The custodies are pickled to the workers
+    with their prefetched rows, so rendering issues no queries, and render in
+    the active language, which the fingerprints depend on.
+    """
+    cache = ReceiptCache()
+    language = translation.get_language()
+    entries = [(custody, fingerprint(custody, "pdf")) for custody in custodies]
+    missing = [custody for custody, key in entries if not os.path.exists(cache.path(key, "pdf"))]
+    workers = min(workers or settings.RECEIPT_EXPORT_WORKERS or os.cpu_count() or 1, len(missing))
+
+    executor = None
+    if workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+        chunksize = max(1, len(missing) // (workers * 4))
+        rendered = executor.map(render_pdf, missing, repeat(language), chunksize=chunksize)
+    else:
+        rendered = map(render_pdf, missing, repeat(language))
+    try:
+        missing = {custody.pk for custody in missing}
+        for custody, key in entries:
+            handle = None if custody.pk in missing else cache.open(key, "pdf")
+            if handle is None:
+                # Rendered here if it was evicted since the check above
+                content = next(rendered) if custody.pk in missing else render_pdf(custody, language)
+                cache.store(key, "pdf", io.BytesIO(content))
+            else:
+                with handle:
+                    content = handle.read()
+            yield custody, content
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+
+def write_zip(custodies, fileobj, workers=None):
+    """Write one custody_<pk>.pdf per custody into a ZIP archive on ``fileobj``; returns the number written."""
+    count = 0
+    with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as archive:
+        for custody, content in render_many(custodies, workers):
+            archive.writestr(f"custody_{custody.pk}.pdf", content)
+            count += 1
+    return count
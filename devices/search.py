@@ -0,0 +1,122 @@
+from django.db import connections
+from django.db.models import Q
+
+from employees.search import SearchIndex, register
+
+from .models import Custody, Device
+
+
+class DeviceSearchIndex(SearchIndex):
+    """
+    Substring search over device names, serial and brand. SQLite uses the
+    FTS5 trigram tokenizer so "ptop" still finds "Laptop" like icontains did;
+    PostgreSQL uses prefix matching on the tsvector.
+    """
+    name = "devices"
+    model = Device
+    table = "devices_device_fts"
+    columns = (
+        ("serial_number", 10.0),
+        ("name_en", 5.0),
+        ("name_ar", 5.0),
+        ("brand", 2.0),
+    )
+    tokenize = "trigram"
+    min_token_length = 3
+    # Keep the list's own ordering; ranking thousands of "ThinkPad" hits is wasted work
+    ranked = False
+
+    @staticmethod
+    def serial_prefix(term):
+        # Range on the unique serial index; terms arrive casefolded and serials are mostly upper case
+        condition = Q()
+        for prefix in dict.fromkeys([term, term.upper()]):
+            condition |= Q(serial_number__gte=prefix, serial_number__lt=prefix + "\U0010ffff")
+        return condition
+
+    def candidate_condition(self, terms, connection, columns=None):
+        # A serial (or its prefix) also matches through a range on its unique index,
+        # alongside the trigram matches on names and brand
+        condition = super().candidate_condition(terms, connection, columns)
+        if len(terms) == 1 and not columns:
+            condition |= self.serial_prefix(terms[0])
+        return condition
+
+
+device_index = register(DeviceSearchIndex())
+
+
+class CustodySearchIndex(SearchIndex):
+    """
+    Denormalized custody document: employee names and username plus the
+    names, serials and type ids of every device in the custody, so the
+    list's search and device-type filter read one indexed table instead of
+    joining Custody -> DeviceCustody -> Device -> Employee -> User. The type
+    ids are matched with a column filter on device_types (SQLite) or on its
+    weight (PostgreSQL, the only column weighted D).
+    """
+    name = "custodies"
+    model = Custody
+    table = "devices_custody_fts"
+    columns = (
+        ("username", 5.0),
+        ("employee_name_en", 5.0),
+        ("employee_name_ar", 5.0),
+        ("serials", 3.0),
+        ("device_names", 2.0),
+        ("device_types", 1.0),
+    )
+    search_columns = ("username", "employee_name_en", "employee_name_ar", "serials", "device_names")
+    tokenize = "trigram"
+    min_token_length = 3
+    ranked = False
+
+    def document(self, custody):
+        employee = custody.employee
+        devices = [device_custody.device for device_custody in custody.devices.all()]
+        return [
+            employee.user.username,
+            employee.full_name_en,
+            employee.full_name_ar,
+            " ".join(device.serial_number for device in devices),
+            " ".join(f"{device.name_en} {device.name_ar}" for device in devices),
+            # Space-delimited on both ends: the trigram phrase " 1 " does not match inside " 12 "
+            " {} ".format(" ".join(str(device.device_type_id) for device in devices if device.device_type_id)),
+        ]
+
+    def values(self, model=None, pks=None, using="default"):
+        model = model or self.get_model()
+        custodies = (
+            model._default_manager.using(using)
+            .select_related("employee__user")
+            .prefetch_related("devices__device")
+            .order_by("pk")
+        )
+        if pks is not None:
+            custodies = custodies.filter(pk__in=pks)
+        for custody in custodies.iterator(chunk_size=2000):
+            yield (custody.pk, *self.document(custody))
+
+    def fallback(self, queryset, query):
+        return queryset.filter(
+            Q(employee__user__username__icontains=query) |
+            Q(employee__full_name_en__icontains=query) |
+            Q(employee__full_name_ar__icontains=query) |
+            Q(devices__device__name_en__icontains=query) |
+            Q(devices__device__name_ar__icontains=query) |
+            Q(devices__device__serial_number__icontains=query)
+        ).distinct()
+
+    def filter_device_type(self, queryset, device_type_id):
+        connection = connections[queryset.db]
+        if not self.supports(connection):
+            return queryset.filter(devices__device__device_type_id=device_type_id).distinct()
+        device_type_id = int(device_type_id)
+        if connection.vendor == "sqlite":
+            expression = f'{{device_types}} : " {device_type_id} "'
+        else:
+            expression = f"{device_type_id}:D"
+        return self.filter_subquery(queryset, *self.match_query(expression, connection), connection)
+
+
+custody_index = register(CustodySearchIndex())
@@ -0,0 +1,94 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from employees.models import Employee, User
+from .models import Custody, Device, DeviceCustody
+from .search import custody_index, device_index
+
+# Fields of related rows copied into the custody search document
+CUSTODY_DEVICE_FIELDS = {"name_en", "name_ar", "serial_number", "device_type", "device_type_id"}
+CUSTODY_EMPLOYEE_FIELDS = {"full_name_en", "full_name_ar", "user", "user_id"}
+
+# Custody pks waiting for the current transaction to commit, per thread and database
+_pending = threading.local()
+
+
+def refresh_custody_on_commit(custody_id, using="default"):
+    """
+    Re-index a custody when the current transaction commits. The document
+    is rebuilt once per custody however many of its rows the transaction
+    saves: the first callback to run refreshes every pending pk and the
+    others find nothing left. A rolled-back transaction leaves its pks
+    pending, which only costs one extra refresh on the next commit.
+    """
+    pending = getattr(_pending, "custodies", None)
+    if pending is None:
+        pending = _pending.custodies = {}
+    pending.setdefault(using, set()).add(custody_id)
+
+    def refresh():
+        pks = pending.pop(using, None)
+        if pks:
+            custody_index.refresh(pks, using=using)
+
+    transaction.on_commit(refresh, using=using)
+
+
+def index_device(sender, instance, created=False, using="default", update_fields=None, **kwargs):
+    # Status-only saves (custody assignment) do not touch any indexed text
+    fields = set(update_fields) if update_fields is not None else None
+    if fields is None or fields & set(device_index.column_names()):
+        device_index.update(instance, using=using)
+    if not created and (fields is None or fields & CUSTODY_DEVICE_FIELDS):
+        custody_index.refresh(
+            Custody.objects.using(using).filter(devices__device=instance).values_list("pk", flat=True),
+            using=using,
+        )
+
+
+def unindex_device(sender, instance, using="default", **kwargs):
+    device_index.delete(instance.pk, using=using)
+
+
+def index_custody(sender, instance, using="default", **kwargs):
+    refresh_custody_on_commit(instance.pk, using=using)
+
+
+def unindex_custody(sender, instance, using="default", **kwargs):
+    custody_index.delete(instance.pk, using=using)
+
+
+def index_device_custody(sender, instance, using="default", **kwargs):
+    # Adding or removing a device changes the custody's document
+    refresh_custody_on_commit(instance.custody_id, using=using)
+
+
+def index_employee_custodies(sender, instance, using="default", update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & CUSTODY_EMPLOYEE_FIELDS:
+        return
+    custody_index.refresh(
+        Custody.objects.using(using).filter(employee=instance).values_list("pk", flat=True),
+        using=using,
+    )
+
+
+def index_user_custodies(sender, instance, created=False, using="default", update_fields=None, **kwargs):
+    # Logins save last_login only; a new user has no custodies yet
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    custody_index.refresh(
+        Custody.objects.using(using).filter(employee__user=instance).values_list("pk", flat=True),
+        using=using,
+    )
+
+
+post_save.connect(index_device, sender=Device)
+post_delete.connect(unindex_device, sender=Device)
+post_save.connect(index_custody, sender=Custody)
+post_delete.connect(unindex_custody, sender=Custody)
+post_save.connect(index_device_custody, sender=DeviceCustody)
+post_delete.connect(index_device_custody, sender=DeviceCustody)
+post_save.connect(index_employee_custodies, sender=Employee)
+post_save.connect(index_user_custodies, sender=User)
@@ -1,3 +1,615 @@
-from django.test import TestCase
+import datetime
+import io
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from employees.models import Employee, User
+from .forms import DeviceCustodyFormSet
+from .models import Custody, Device, DeviceAccessory, DeviceCustody, DeviceType
+from . import receipts
+from .search import custody_index, device_index
+from .receipts import ReceiptCache
+from . import exporters, views
+from .exporters import CustodyPDFBuilder, HeaderFooter, PDFConfig
+
+
+class QueryCountTests(TestCase):
+    """List and detail pages must issue the same number of queries however many rows they show."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        cls.device_type = DeviceType.objects.create(name_en="Laptop", name_ar="حاسوب")
+        cls.employee = Employee.objects.create(user=cls.admin, full_name_en="Admin", full_name_ar="مدير")
+        cls.custody = Custody.objects.create(employee=cls.employee, custody_date=datetime.date(2025, 1, 1))
+        cls.device = Device.objects.create(
+            name_en="Device", name_ar="جهاز", serial_number="SN-0", brand="Dell", device_type=cls.device_type
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_rows(self, count):
+        for _ in range(count):
+            n = Device.objects.count()
+            device = Device.objects.create(
+                name_en=f"Device {n}", name_ar=f"جهاز {n}", serial_number=f"SN-{n}",
+                brand="Dell", device_type=self.device_type,
+            )
+            DeviceAccessory.objects.create(device=device, name_en="Charger", name_ar="شاحن")
+            device_custody = DeviceCustody.objects.create(custody=self.custody, device=device)
+            device_custody.accessories.set(device.accessories.all())
+
+            custody = Custody.objects.create(employee=self.employee, custody_date=datetime.date(2025, 1, 2))
+            DeviceCustody.objects.create(custody=custody, device=self.device)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url):
+        self.add_rows(1)
+        baseline = self.count_queries(url)
+        self.add_rows(4)
+        self.assertEqual(self.count_queries(url), baseline)
+
+    def test_custody_list(self):
+        self.assertConstantQueries(reverse("custody_list"))
+
+    def test_custody_detail(self):
+        self.assertConstantQueries(reverse("custody_detail", args=[self.custody.pk]))
+
+    def test_device_list(self):
+        self.assertConstantQueries(reverse("device_list"))
+
+    def test_device_detail(self):
+        self.assertConstantQueries(reverse("device_detail", args=[self.device.pk]))
+
+
+class DeviceCustodyFormSetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="holder", email="holder@example.com")
+        cls.employee = Employee.objects.create(user=user, full_name_en="Holder", full_name_ar="حامل")
+        cls.custody = Custody.objects.create(employee=cls.employee, custody_date=datetime.date(2025, 1, 1))
+
+    def add_device(self):
+        n = Device.objects.count()
+        device = Device.objects.create(name_en=f"Device {n}", name_ar=f"جهاز {n}", serial_number=f"SN-{n}")
+        DeviceAccessory.objects.create(device=device, name_en="Charger", name_ar="شاحن")
+        return device
+
+    def add_rows(self, count):
+        for _ in range(count):
+            device = self.add_device()
+            device_custody = DeviceCustody.objects.create(custody=self.custody, device=device)
+            device_custody.accessories.set(device.accessories.all())
+
+    def post_data(self, new_devices, accessories=None):
+        """Management form, the custody's existing rows unchanged, then one new row per device."""
+        existing = list(self.custody.devices.order_by("pk"))
+        data = {
+            "devices-TOTAL_FORMS": len(existing) + len(new_devices),
+            "devices-INITIAL_FORMS": len(existing),
+        }
+        for i, device_custody in enumerate(existing):
+            data[f"devices-{i}-id"] = device_custody.pk
+            data[f"devices-{i}-accessories"] = list(device_custody.accessories.values_list("pk", flat=True))
+        for i, device in enumerate(new_devices, start=len(existing)):
+            data[f"devices-{i}-device"] = device.pk
+            data[f"devices-{i}-accessories"] = (
+                accessories if accessories is not None else list(device.accessories.values_list("pk", flat=True))
+            )
+        return data
+
+    def bound_formset(self, new_rows):
+        data = self.post_data([self.add_device() for _ in range(new_rows)])
+        return DeviceCustodyFormSet(data, instance=self.custody, prefix="devices")
+
+    def count_queries(self, action):
+        with CaptureQueriesContext(connection) as queries:
+            action()
+        return len(queries)
+
+    def test_accessory_of_another_device_is_rejected(self):
+        laptop, phone = self.add_device(), self.add_device()
+        data = self.post_data([laptop], accessories=[phone.accessories.get().pk])
+        formset = DeviceCustodyFormSet(data, instance=self.custody, prefix="devices")
+        self.assertFalse(formset.is_valid())
+        self.assertIn("accessories", formset.forms[0].errors)
+
+    def test_device_can_only_be_added_once(self):
+        self.add_rows(1)
+        laptop = self.add_device()
+        formset = DeviceCustodyFormSet(self.post_data([laptop, laptop]), instance=self.custody, prefix="devices")
+        self.assertFalse(formset.is_valid())
+        self.assertEqual(formset.errors[1], {})
+        self.assertIn("device", formset.errors[2])
+
+        existing = self.custody.devices.get().device
+        formset = DeviceCustodyFormSet(self.post_data([existing]), instance=self.custody, prefix="devices")
+        self.assertFalse(formset.is_valid())
+
+    def test_rendering_query_count_is_constant(self):
+        def render():
+            formset = DeviceCustodyFormSet(instance=self.custody, prefix="devices")
+            str(formset)
+
+        self.add_rows(1)
+        baseline = self.count_queries(render)
+        self.add_rows(5)
+        with self.assertNumQueries(baseline):
+            render()
+
+    def test_validating_a_post_query_count_is_constant(self):
+        self.add_rows(1)
+        formset = self.bound_formset(1)
+        baseline = self.count_queries(formset.is_valid)
+        self.assertTrue(formset.is_valid())
+
+        self.add_rows(5)
+        formset = self.bound_formset(5)
+        with self.assertNumQueries(baseline):
+            self.assertTrue(formset.is_valid())
+
+
+class AccessoriesAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        cls.laptop = Device.objects.create(name_en="Laptop", name_ar="حاسوب", serial_number="SN-1")
+        cls.phone = Device.objects.create(name_en="Phone", name_ar="هاتف", serial_number="SN-2")
+        cls.charger = DeviceAccessory.objects.create(device=cls.laptop, name_en="Charger", name_ar="شاحن")
+        cls.bag = DeviceAccessory.objects.create(device=cls.laptop, name_en="Bag", name_ar="حقيبة")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def get(self, params, **headers):
+        return self.client.get(reverse("api_device_accessories"), params, headers=headers)
+
+    def test_single_device(self):
+        response = self.get({"device_id": self.laptop.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {acc["id"] for acc in response.json()["accessories"]}, {self.charger.pk, self.bag.pk}
+        )
+
+    def test_batched_response_is_keyed_by_device_id(self):
+        response = self.get({"device_ids": f"0{self.laptop.pk}, {self.phone.pk}"})
+        self.assertEqual(response.status_code, 200)
+        devices = response.json()["devices"]
+        self.assertEqual(set(devices), {str(self.laptop.pk), str(self.phone.pk)})
+        self.assertEqual(
+            sorted(devices[str(self.laptop.pk)], key=lambda acc: acc["id"]),
+            [
+                {"id": self.charger.pk, "name": "Charger / شاحن"},
+                {"id": self.bag.pk, "name": "Bag / حقيبة"},
+            ],
+        )
+        self.assertEqual(devices[str(self.phone.pk)], [])
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.get({"device_ids": self.laptop.pk})
+        etag = response["ETag"]
+        self.assertIn("private", response["Cache-Control"])
+        self.assertEqual(self.get({"device_ids": self.laptop.pk}, if_none_match=etag).status_code, 304)
+
+        DeviceAccessory.objects.create(device=self.laptop, name_en="Mouse", name_ar="فأرة")
+        response = self.get({"device_ids": self.laptop.pk}, if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_bad_ids_are_rejected(self):
+        for params in ({"device_ids": f"{self.laptop.pk},abc"}, {"device_id": "x"}, {"device_ids": "²"}, {}):
+            with self.subTest(params=params):
+                self.assertEqual(self.get(params).status_code, 400)
+
+    def test_unknown_device_id_is_an_empty_list(self):
+        response = self.get({"device_id": 0})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"accessories": []})
+
+    def test_device_ids_are_capped(self):
+        limit = views.DeviceAccessoriesAPIView.max_device_ids
+        self.assertEqual(self.get({"device_ids": ",".join(map(str, range(1, limit + 1)))}).status_code, 200)
+        response = self.get({"device_ids": ",".join(map(str, range(1, limit + 2)))})
+        self.assertEqual(response.status_code, 400)
+
+
+class DeviceSearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptops = [
+            Device.objects.create(name_en=f"Laptop {n}", name_ar="حاسوب", serial_number=f"LT-{n:03}", brand="Dell")
+            for n in range(5)
+        ]
+        cls.printer = Device.objects.create(name_en="Printer", name_ar="طابعة", serial_number="PR-001", brand="HP")
+
+    def search(self, query):
+        with CaptureQueriesContext(connection) as queries:
+            devices = list(device_index.filter(Device.objects.order_by("pk"), query))
+        return devices, " ".join(query["sql"] for query in queries.captured_queries)
+
+    def test_serial_prefix(self):
+        for query in ("LT-003", "lt-00", "PR-001"):
+            with self.subTest(query=query):
+                devices, _sql = self.search(query)
+                self.assertEqual(devices, [d for d in [*self.laptops, self.printer] if d.serial_number.startswith(query.upper())])
+
+    def test_serial_prefix_does_not_hide_name_and_brand_matches(self):
+        tagged = Device.objects.create(name_en="Monitor", name_ar="شاشة", serial_number="DELL-77", brand="Acme")
+        abc = Device.objects.create(name_en="Scanner", name_ar="ماسح", serial_number="ABC123", brand="Canon")
+        abc_laptop = Device.objects.create(name_en="ABC Laptop", name_ar="حاسوب", serial_number="ZX-9", brand="Lenovo")
+        self.assertEqual(self.search("dell")[0], [*self.laptops, tagged])
+        self.assertEqual(self.search("abc")[0], [abc, abc_laptop])
+
+    def test_substring_search(self):
+        devices, sql = self.search("ptop")
+        self.assertIn(device_index.table, sql)
+        self.assertEqual(devices, self.laptops)
+        self.assertEqual(self.search("طابعه")[0], [self.printer])
+        # Serial substrings that are not a prefix still match through the index
+        self.assertEqual(self.search("-001")[0], [self.laptops[1], self.printer])
+        # Too short for trigrams: icontains
+        self.assertEqual(self.search("HP")[0], [self.printer])
+
+    def test_many_matches_use_a_subquery_in_the_list_order(self):
+        with mock.patch.object(device_index, "candidate_limit", 2):
+            devices = list(device_index.filter(Device.objects.order_by("-pk"), "laptop"))
+        self.assertEqual(devices, self.laptops[::-1])
+
+    def test_index_follows_saves_and_deletes(self):
+        printer = self.printer
+        printer.name_en = "Scanner"
+        printer.save()
+        self.assertEqual(self.search("scanner")[0], [printer])
+        self.assertEqual(self.search("printer")[0], [])
+        printer.delete()
+        self.assertEqual(self.search("scanner")[0], [])
+
+
+class CustodySearchIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="jdoe", email="jdoe@example.com")
+        cls.employee = Employee.objects.create(user=cls.user, full_name_en="John Doe", full_name_ar="جون")
+        # Ids chosen so a substring match of one would hit the other
+        cls.laptop = DeviceType.objects.create(pk=1, name_en="Laptop", name_ar="حاسوب")
+        cls.phone = DeviceType.objects.create(pk=12, name_en="Phone", name_ar="هاتف")
+
+    def add_custody(self, *devices):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                custody = Custody.objects.create(employee=self.employee, custody_date=datetime.date(2025, 1, 1))
+                for name, serial, device_type in devices:
+                    device = Device.objects.create(
+                        name_en=name, name_ar=name, serial_number=serial, device_type=device_type
+                    )
+                    DeviceCustody.objects.create(custody=custody, device=device)
+        return custody
+
+    def search(self, query):
+        return list(custody_index.filter(Custody.objects.order_by("pk"), query))
+
+    def test_document_is_rebuilt_once_per_transaction(self):
+        with mock.patch.object(custody_index, "refresh", wraps=custody_index.refresh) as refresh:
+            custody = self.add_custody(
+                ("ThinkPad", "SN-1001", self.laptop), ("iPhone", "SN-1002", self.phone), ("Dock", "SN-1003", None),
+            )
+        refresh.assert_called_once()
+        self.assertEqual(set(refresh.call_args.args[0]), {custody.pk})
+        for query in ("thinkpad", "SN-1003", "jdoe", "John"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), [custody])
+
+    def test_related_changes_reach_the_document(self):
+        custody = self.add_custody(("ThinkPad", "SN-2001", self.laptop))
+        device = Device.objects.get(serial_number="SN-2001")
+        device.name_en = "Latitude"
+        device.save()
+        self.assertEqual(self.search("latitude"), [custody])
+
+        self.employee.full_name_en = "Jane Roe"
+        self.employee.save()
+        self.assertEqual(self.search("jane"), [custody])
+        self.assertEqual(self.search("john"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            DeviceCustody.objects.filter(custody=custody).delete()
+        self.assertEqual(self.search("SN-2001"), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            custody.delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {custody_index.table}")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_device_type_filter_matches_whole_ids(self):
+        laptops = self.add_custody(("ThinkPad", "SN-3001", self.laptop))
+        phones = self.add_custody(("iPhone", "SN-3002", self.phone))
+        both = self.add_custody(("ThinkPad", "SN-3003", self.laptop), ("iPhone", "SN-3004", self.phone))
+        custodies = Custody.objects.order_by("pk")
+        self.assertEqual(list(custody_index.filter_device_type(custodies, 1)), [laptops, both])
+        self.assertEqual(list(custody_index.filter_device_type(custodies, 12)), [phones, both])
+        self.assertEqual(list(custody_index.filter_device_type(custodies, 2)), [])
+        # Type ids are not free-text search terms
+        self.assertEqual(self.search("12"), [])
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        response = self.client.get(reverse("custody_list"), {"device_type": 12})
+        self.assertEqual(set(response.context["custodies"]), {phones, both})
+
+
+class ReceiptCacheTests(TestCase):
+    """Custody receipts are rendered once per content and then served from the disk cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        cls.employee = Employee.objects.create(
+            user=cls.admin, full_name_en="Admin", full_name_ar="مدير", department="IT", job_title="Engineer"
+        )
+        device_type = DeviceType.objects.create(name_en="Laptop", name_ar="حاسوب")
+        cls.device = Device.objects.create(
+            name_en="Device", name_ar="جهاز", serial_number="SN-0", brand="Dell", device_type=device_type
+        )
+        cls.accessory = DeviceAccessory.objects.create(device=cls.device, name_en="Charger", name_ar="شاحن")
+        cls.custody = Custody.objects.create(employee=cls.employee, custody_date=datetime.date(2025, 1, 1))
+        device_custody = DeviceCustody.objects.create(custody=cls.custody, device=cls.device)
+        device_custody.accessories.set([cls.accessory])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        override = override_settings(RECEIPT_CACHE_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def export(self, action="pdf", **headers):
+        response = self.client.get(reverse("custody_export", args=[self.custody.pk, action]), headers=headers)
+        if response.status_code == 200:
+            response.body = response.getvalue()
+        return response
+
+    def test_second_download_is_served_from_cache(self):
+        with mock.patch.object(CustodyPDFBuilder, "build", autospec=True, side_effect=CustodyPDFBuilder.build) as build:
+            first = self.export()
+            second = self.export()
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(first.body, second.body)
+        self.assertTrue(first.body.startswith(b"%PDF"))
+        self.assertEqual(first["ETag"], second["ETag"])
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_pdf_and_excel_are_cached_apart(self):
+        pdf, excel = self.export("pdf"), self.export("excel")
+        self.assertNotEqual(pdf["ETag"], excel["ETag"])
+        self.assertTrue(excel["Content-Disposition"].endswith('.xlsx"'))
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.export()["ETag"]
+        response = self.export(if_none_match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_changes_to_the_receipt_change_the_etag(self):
+        etags = {self.export()["ETag"]}
+        self.accessory.name_en = "USB-C Charger"
+        self.accessory.save()
+        etags.add(self.export()["ETag"])
+        self.employee.department = "Finance"
+        self.employee.save()
+        etags.add(self.export()["ETag"])
+        self.device.serial_number = "SN-1"
+        self.device.save()
+        etags.add(self.export()["ETag"])
+        self.assertEqual(len(etags), 4)
+
+    def test_invalid_action(self):
+        self.assertEqual(self.export("csv").status_code, 400)
+
+    def test_eviction_removes_least_recently_used(self):
+        cache = ReceiptCache(self.directory, max_size=100)
+        for stamp, key in enumerate("abc", start=1):
+            path = cache.store(key, "pdf", io.BytesIO(b"x" * 10))
+            # Distinct mtimes without sleeping
+            os.utime(path, (stamp, stamp))
+        cache.open("a", "pdf").close()  # a hit makes "a" the most recent
+        cache.max_size = 25
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(sorted(os.listdir(self.directory)), ["a.pdf", "c.pdf"])
+
+
+class BulkReceiptExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        device_type = DeviceType.objects.create(name_en="Laptop", name_ar="حاسوب")
+        cls.custodies = []
+        for n, (department, day, returned) in enumerate([
+            ("IT", 1, False), ("IT", 10, True), ("Finance", 5, False), ("IT", 20, False),
+        ]):
+            user = User.objects.create(username=f"employee{n}", email=f"employee{n}@example.com")
+            employee = Employee.objects.create(
+                user=user, full_name_en=f"Employee {n}", full_name_ar=f"موظف {n}", department=department
+            )
+            custody = Custody.objects.create(
+                employee=employee,
+                custody_date=datetime.date(2025, 9, day),
+                return_date=datetime.date(2025, 12, 1) if returned else None,
+            )
+            device = Device.objects.create(
+                name_en=f"Device {n}", name_ar=f"جهاز {n}", serial_number=f"SN-{n}", brand="Dell",
+                device_type=device_type,
+            )
+            accessory = DeviceAccessory.objects.create(device=device, name_en="Charger", name_ar="شاحن")
+            DeviceCustody.objects.create(custody=custody, device=device).accessories.set([accessory])
+            cls.custodies.append(custody)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        override = override_settings(RECEIPT_CACHE_DIR=directory.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def pks(self, **filters):
+        return [custody.pk for custody in receipts.select(**filters)]
+
+    def test_filters(self):
+        first, returned, finance, last = (custody.pk for custody in self.custodies)
+        self.assertEqual(self.pks(), [first, finance, returned, last])
+        self.assertEqual(self.pks(department="IT", not_returned=True), [first, last])
+        self.assertEqual(
+            self.pks(start=datetime.date(2025, 9, 5), end=datetime.date(2025, 9, 10)), [finance, returned]
+        )
+
+    def test_rendering_needs_no_queries(self):
+        custodies = list(receipts.select())
+        with self.assertNumQueries(0):
+            rendered = list(receipts.render_many(custodies, workers=1))
+        self.assertEqual([custody for custody, _content in rendered], custodies)
+        self.assertTrue(all(content.startswith(b"%PDF") for _custody, content in rendered))
+
+    def test_process_pool_matches_inline_rendering(self):
+        custodies = list(receipts.select())
+        pooled = dict(receipts.render_many(custodies, workers=2))
+        self.assertEqual(len(pooled), len(custodies))
+        # Now all cached: the second run reads them back from disk
+        with mock.patch.object(receipts, "render_pdf") as render_pdf:
+            cached = dict(receipts.render_many(custodies, workers=2))
+        render_pdf.assert_not_called()
+        self.assertEqual(cached, pooled)
+
+    def test_download_zip(self):
+        response = self.client.get(reverse("custody_bulk_export"), {"department": "IT", "not_returned": "on"})
+        self.assertEqual(response.status_code, 200)
+        archive = zipfile.ZipFile(io.BytesIO(response.getvalue()))
+        self.assertEqual(
+            sorted(archive.namelist()),
+            sorted(f"custody_{pk}.pdf" for pk in (self.custodies[0].pk, self.custodies[3].pk)),
+        )
+
+    def test_form_and_errors(self):
+        url = reverse("custody_bulk_export")
+        self.assertContains(self.client.get(url), 'name="department"')
+        response = self.client.get(url, {"start": "2025-10-01", "end": "2025-09-01"})
+        self.assertContains(response, "The start date must be before the end date.")
+        response = self.client.get(url, {"start": "2026-01-01"})
+        self.assertContains(response, "No custodies match these filters.")
+
+
+class ExporterLoadingTests(TestCase):
+    def test_startup_does_not_import_export_libraries(self):
+        code = (
+            "import sys, django; django.setup(); import helpdesk_system.urls; "
+            "print(sorted({name.partition('.')[0] for name in sys.modules} "
+            "& {'reportlab', 'openpyxl', 'arabic_reshaper', 'bidi'}))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "[]")
+
+    def test_fonts_and_styles_load_once(self):
+        with mock.patch.object(PDFConfig, "styles", None), \
+                mock.patch("devices.exporters.pdfmetrics.registerFont") as register_font:
+            threads = [threading.Thread(target=PDFConfig.load) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            PDFConfig.load()
+            self.assertIsNotNone(PDFConfig.styles)
+        self.assertEqual(register_font.call_count, 1)
+
+
+class ArabicShapingTests(SimpleTestCase):
+    def test_matches_arabic_reshaper(self):
+        import arabic_reshaper
+        from bidi.algorithm import get_display
+
+        for text in [*exporters.STATIC_TEXT.values(), "موظف 1", "Laptop / حاسوب", "Dell"]:
+            self.assertEqual(exporters.shape(text), get_display(arabic_reshaper.reshape(text)))
+
+    def test_paragraph_markup(self):
+        self.assertEqual(exporters.paragraph_markup("Serial\nNumber"), "Serial\nNumber")
+        self.assertEqual(exporters.paragraph_markup("الماركة\nBrand"), exporters.shape("الماركة\nBrand").replace("\n", "<br/>"))
+
+    def test_static_text_is_shaped_once(self):
+        PDFConfig.load()
+        self.assertEqual(PDFConfig.text["title"], exporters.shape(exporters.STATIC_TEXT["title"]))
+        with mock.patch.object(exporters.reshaper, "reshape") as reshape:
+            PDFConfig.ar_text("نموذج تسليم عهدة / Custody Receipt Form")
+            exporters.paragraph_markup("الماركة\nBrand")
+        reshape.assert_not_called()
+
+
+class PageTemplateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        employee = Employee.objects.create(user=admin, full_name_en="Admin", full_name_ar="مدير")
+        device_type = DeviceType.objects.create(name_en="Laptop", name_ar="حاسوب")
+        custody = Custody.objects.create(employee=employee, custody_date=datetime.date(2025, 1, 1))
+        for n in range(40):
+            device = Device.objects.create(
+                name_en=f"Device {n}", name_ar=f"جهاز {n}", serial_number=f"SN-{n}", brand="Dell",
+                device_type=device_type,
+            )
+            DeviceCustody.objects.create(custody=custody, device=device)
+        cls.custody = receipts.custodies().get(pk=custody.pk)
+
+    def build(self):
+        return CustodyPDFBuilder(self.custody).build().getvalue()
+
+    def test_letterhead_is_one_form_per_document(self):
+        self.build()  # later documents reuse the prepared logo
+        pdf = self.build()
+        pages = len(re.findall(rb"/Type /Page\b", pdf))
+        self.assertGreater(pages, 1)
+        # Logo and its alpha mask, embedded once for all pages
+        self.assertEqual(len(re.findall(rb"/Subtype /Image", pdf)), 2)
+        self.assertEqual(len(re.findall(rb"/Subtype /Form", pdf)), 2)
+        self.assertEqual(len(re.findall(rb"/FormXob.ReceiptFooter \d+ 0 R /FormXob.ReceiptHeader \d+ 0 R", pdf)), pages)
+
+    def test_small_logo(self):
+        from PIL import Image
+
+        with tempfile.NamedTemporaryFile(suffix=".png") as logo:
+            Image.new("RGBA", (20, 12), (255, 0, 0, 128)).save(logo, "PNG")
+            logo.flush()
+            with mock.patch.object(HeaderFooter, "logo_path", logo.name), mock.patch.object(HeaderFooter, "_logo", None):
+                pdf = self.build()
+                logo = HeaderFooter.logo()
+        self.assertEqual(logo.getSize(), (20, 12))
+        self.assertTrue(pdf.startswith(b"%PDF"))
+
+    def test_without_logo(self):
+        with mock.patch.object(HeaderFooter, "logo_path", "/nonexistent/logo.png"), \
+                mock.patch.object(HeaderFooter, "_logo", None):
+            pdf = self.build()
+        self.assertNotIn(b"/Subtype /Image", pdf)
@@ -1,34 +1,23 @@
-import io, os
-import arabic_reshaper
-import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
-from openpyxl.utils import get_column_letter
-
-from bidi.algorithm import get_display
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import (
-    BaseDocTemplate, PageTemplate, Frame, Table, TableStyle,
-    Paragraph, Spacer
-)
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-
-from django.conf import settings
+import tempfile
+
 from django.urls import reverse_lazy
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, FormView, View
 from django.http import JsonResponse, FileResponse, HttpResponse
-from django.db import IntegrityError, DatabaseError
-from django.db.models import Q
+from django.db import IntegrityError, DatabaseError, transaction
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
 
-from employees.mixins import PermissionMixin, ExportMixin
+from employees.mixins import KeysetPaginationMixin, PermissionMixin, ExportMixin
 from .models import Device, DeviceType, Custody, Status, DeviceCustody, DeviceAccessory
-from .forms import DeviceForm, DeviceAccessoryFormSet, CustodyForm, DeviceCustodyFormSet
+from .forms import DeviceForm, DeviceAccessoryFormSet, CustodyForm, CustodyExportForm, DeviceCustodyFormSet
+from . import receipts
+from .search import custody_index, device_index
 
 # Device Types (manage manually)
 @login_required
@@ -117,27 +106,34 @@ def devices_type_manage(request):
     })
 
 
+def related_count(model, field):
+    """
+    Correlated COUNT of ``model`` rows pointing at the outer row. Unlike a
+    JOIN + GROUP BY annotation it is only evaluated for the rows on the page.
+    """
+    rows = model.objects.filter(**{field: OuterRef("pk")}).order_by().values(field)
+    return Coalesce(Subquery(rows.annotate(count=Count("pk")).values("count"), output_field=IntegerField()), 0)
+
+
 # Devices
-class DeviceListView(PermissionMixin, ListView):
+class DeviceListView(PermissionMixin, KeysetPaginationMixin, ListView):
     model = Device
     template_name = "devices/list.html"
     context_object_name = "devices"
     permission_required = "devices.view_device"
     paginate_by = 10
+    keyset_fields = ("added_at", "id")
 
     def get_queryset(self):
-        queryset = super().get_queryset().select_related("device_type")
+        queryset = super().get_queryset().select_related("device_type").annotate(
+            accessory_count=related_count(DeviceAccessory, "device")
+        )
         search_query = self.request.GET.get("q", "").strip()
         device_type_id = self.request.GET.get("device_type", "").strip()
         status = self.request.GET.get("status", "").strip()
 
         if search_query:
-            queryset = queryset.filter(
-                Q(name_en__icontains=search_query) |
-                Q(name_ar__icontains=search_query) |
-                Q(serial_number__icontains=search_query) |
-                Q(brand__icontains=search_query)
-            )
+            queryset = device_index.filter(queryset, search_query)
 
         if device_type_id.isdigit():
             queryset = queryset.filter(device_type_id=device_type_id)
@@ -163,6 +159,15 @@ class DeviceDetailView(PermissionMixin, DetailView):
     context_object_name = "device"
     permission_required = "devices.view_device"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related("device_type").prefetch_related(
+            "accessories",
+            Prefetch(
+                "custodies",
+                queryset=DeviceCustody.objects.select_related("custody__employee__user").order_by("-custody__custody_date"),
+            ),
+        )
+
 
 class DeviceCreateView(PermissionMixin, CreateView):
     model = Device
@@ -236,19 +241,22 @@ class DeviceDeleteView(DeleteView):
 
 
 # Custody Views
-class CustodyListView(PermissionMixin, ListView):
+class CustodyListView(PermissionMixin, KeysetPaginationMixin, ListView):
     model = Custody
     template_name = "custody/list.html"
     context_object_name = "custodies"
     permission_required = "devices.view_custody"
     paginate_by = 10
+    keyset_fields = ("custody_date", "id")
 
     def get_queryset(self):
         user = self.request.user
-        queryset = super().get_queryset().select_related("employee").prefetch_related("devices__device")
+        queryset = super().get_queryset().select_related("employee__user").annotate(
+            device_count=related_count(DeviceCustody, "custody")
+        )
 
         # Restrict access for non-managers
-        is_manager_or_it = user.groups.filter(name__in=["Manager", "IT Employee"]).exists()
+        is_manager_or_it = user.has_role("Manager", "IT Employee")
         if not is_manager_or_it and not user.is_superuser:
             employee_profile = getattr(user, "employee_profile", None)
             if employee_profile:
@@ -260,20 +268,13 @@ class CustodyListView(PermissionMixin, ListView):
         device_type_id = self.request.GET.get("device_type", "").strip()
         is_returned = self.request.GET.get("is_returned")
 
-        # Search across employee profile and device fields
+        # Search across employee profile and device fields (denormalized search document)
         if search_query:
-            queryset = queryset.filter(
-                Q(employee__user__username__icontains=search_query) |
-                Q(employee__full_name_en__icontains=search_query) |
-                Q(employee__full_name_ar__icontains=search_query) |
-                Q(devices__device__name_en__icontains=search_query) |
-                Q(devices__device__name_ar__icontains=search_query) |
-                Q(devices__device__serial_number__icontains=search_query)
-            ).distinct()
+            queryset = custody_index.filter(queryset, search_query)
 
         # Filter by device type
-        if device_type_id.isdigit():
-            queryset = queryset.filter(devices__device__device_type_id=device_type_id)
+        if device_type_id.isdecimal():
+            queryset = custody_index.filter_device_type(queryset, device_type_id)
 
         # Filter by returned status
         if is_returned == "yes":
@@ -298,6 +299,14 @@ class CustodyDetailView(PermissionMixin, DetailView):
     context_object_name = "custody"
     permission_required = "devices.view_custody"
 
+    def get_queryset(self):
+        return super().get_queryset().select_related("employee__user").prefetch_related(
+            Prefetch(
+                "devices",
+                queryset=DeviceCustody.objects.select_related("device__device_type").prefetch_related("accessories"),
+            ),
+        )
+
 
 class CustodyCreateView(PermissionMixin, CreateView):
     model = Custody
@@ -318,9 +327,11 @@ class CustodyCreateView(PermissionMixin, CreateView):
         context = self.get_context_data()
         formset = context["devicecustody_formset"]
         if form.is_valid() and formset.is_valid():
-            self.object = form.save()
-            formset.instance = self.object
-            formset.save()
+            # One transaction: the custody's search document is rebuilt once, on commit
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
             messages.success(self.request, _("Custody created successfully."))
             return redirect(self.success_url)
         messages.error(self.request, _("There was an error creating the custody."))
@@ -341,16 +352,11 @@ class CustodyUpdateView(PermissionMixin, UpdateView):
         else:
             formset = DeviceCustodyFormSet(instance=self.object)
 
-        # Prepare a list of selected accessory IDs for each subform
-        selected_accessories = {}
-        for subform in formset:
-            if subform.instance.pk:
-                # Convert QuerySet to a list of IDs
-                selected_accessories[subform.prefix] = list(
-                    subform.instance.accessories.values_list("id", flat=True)
-                )
-            else:
-                selected_accessories[subform.prefix] = []
+        # Selected accessory IDs for each subform, from the formset's shared lookup
+        selected_accessories = {
+            subform.prefix: formset.selected_accessories.get(subform.instance.pk, []) if subform.instance.pk else []
+            for subform in formset
+        }
 
         context["devicecustody_formset"] = formset
         context["selected_accessories"] = selected_accessories
@@ -360,9 +366,10 @@ class CustodyUpdateView(PermissionMixin, UpdateView):
         context = self.get_context_data()
         formset = context["devicecustody_formset"]
         if form.is_valid() and formset.is_valid():
-            self.object = form.save()
-            formset.instance = self.object
-            formset.save()
+            with transaction.atomic():
+                self.object = form.save()
+                formset.instance = self.object
+                formset.save()
             messages.success(self.request, _("Custody updated successfully."))
             return redirect(self.success_url)
         messages.error(self.request, _("There was an error updating the custody."))
@@ -370,19 +377,50 @@ class CustodyUpdateView(PermissionMixin, UpdateView):
 
 
 class DeviceAccessoriesAPIView(PermissionMixin, View):
+    """
+    Accessories of one device (``?device_id=1``) or of many devices at once
+    (``?device_ids=1,2,3``, grouped by device id). Responses carry an ETag so
+    unchanged lists are answered with 304 Not Modified.
+    """
     permission_required = "devices.view_deviceaccessory"
+    cache_max_age = 60
+    # Most device ids one request may ask for (a custody form's rows)
+    max_device_ids = 100
 
     def get(self, request, *args, **kwargs):
-        device_id = request.GET.get("device_id")
-        if not device_id:
+        device_id = request.GET.get("device_id") or None
+        raw_ids = ",".join(request.GET.getlist("device_ids"))
+
+        try:
+            if device_id is not None:
+                device_id = int(device_id)
+            elif raw_ids:
+                # Keys are the canonical ids, so "01" and "1" name the same device
+                device_ids = {int(value) for value in raw_ids.split(",") if value.strip()}
+        except ValueError:
+            return JsonResponse({"error": "Invalid device id."}, status=400)
+        if device_id is None and raw_ids and len(device_ids) > self.max_device_ids:
+            return JsonResponse({"error": f"At most {self.max_device_ids} device ids per request."}, status=400)
+
+        if device_id is not None:
+            accessories = DeviceAccessory.objects.filter(device_id=device_id)
+            data = {"accessories": [self.serialize(acc) for acc in accessories]}
+        elif raw_ids:
+            devices = {device_id: [] for device_id in device_ids}
+            for acc in DeviceAccessory.objects.filter(device_id__in=devices):
+                devices[acc.device_id].append(self.serialize(acc))
+            data = {"devices": devices}
+        else:
             return JsonResponse({"error": "No device_id provided."}, status=400)
 
-        accessories = DeviceAccessory.objects.filter(device_id=device_id)
-        data = [
-            {"id": acc.id, "name": f"{acc.name_en} / {acc.name_ar}"}
-            for acc in accessories
-        ]
-        return JsonResponse({"accessories": data})
+        response = JsonResponse(data)
+        patch_cache_control(response, private=True, max_age=self.cache_max_age)
+        set_response_etag(response)
+        return get_conditional_response(request, etag=response.get("ETag"), response=response)
+
+    @staticmethod
+    def serialize(acc):
+        return {"id": acc.id, "name": f"{acc.name_en} / {acc.name_ar}"}
 
 
 class DeviceCustodyDeleteView(PermissionMixin, DeleteView):
@@ -414,484 +452,76 @@ class CustodyDeleteView(PermissionMixin, DeleteView):
 
 
 class CustodyExportView(PermissionMixin, ExportMixin):
+    """
+    Custody receipt as PDF or Excel. Rendered files are cached on disk under
+    a hash of their content and the hash doubles as the ETag, so reprints of
+    an unchanged receipt are streamed from disk or answered with 304.
+    """
     model = Custody
     filename_prefix = "custody"
-    action = None
     permission_required = "devices.change_custody"
 
-    def dispatch(self, request, *args, **kwargs):
-        # get action from url (pdf or excel)
-        self.action = kwargs.pop("action", None)
-        return super().dispatch(request, *args, **kwargs)
-
     def get(self, request, *args, **kwargs):
-        if self.action == "pdf":
-            return self.export_pdf(request, *args, **kwargs)
-        elif self.action == "excel":
-            return self.export_excel(request, *args, **kwargs)
-        else:
+        action = kwargs.get("action")
+        if action not in receipts.EXTENSIONS:
             return HttpResponse("Invalid export action", status=400)
 
-    def get_pdf_content(self, obj):
-        fields = [
-            ("ID", obj.id),
-            ("Employee", f"{obj.employee.full_name_en} / {obj.employee.full_name_ar}"),
-            ("Department", obj.employee.department),
-            ("Job Title", obj.employee.job_title),
-            ("Custody Date", obj.custody_date),
-            ("Return Date", obj.return_date or "Not returned"),
-            ("Notes", obj.notes or "-"),
-        ]
-
-        devices_lines = []
-        for dc in obj.devices.select_related("device").all():
-            devices_lines.append(
-                f"{dc.device.name_en} / {dc.device.name_ar} "
-                f"({dc.device.serial_number}) - {dc.device.brand} - {dc.device.get_status_display()}"
-            )
-            if dc.notes:
-                devices_lines.append(f"Notes: {dc.notes}")
-            for acc in dc.accessories.all():
-                devices_lines.append(
-                    f"   * {acc.name_en}/{acc.name_ar} ({acc.get_status_display()} - {acc.get_condition_display()})"
-                )
-
-        extra_sections = [("Devices", devices_lines)]
-        return obj, fields, extra_sections
-
-    def get_excel_content(self, obj):
-        sheets = []
-
-        sheet1 = [
-            ["Field", "Value"],
-            ["ID", obj.id],
-            ["Employee", f"{obj.employee.full_name_en} / {obj.employee.full_name_ar}"],
-            ["Department", obj.employee.department],
-            ["Job Title", obj.employee.job_title],
-            ["Custody Date", obj.custody_date],
-            ["Return Date", obj.return_date or "Not returned"],
-            ["Notes", obj.notes or "-"],
-        ]
-        sheets.append(("Custody Info", sheet1))
-
-        sheet2 = [["Device", "Serial", "Brand", "Status", "Notes"]]
-        for dc in obj.devices.select_related("device").all():
-            sheet2.append([
-                f"{dc.device.name_en}/{dc.device.name_ar}",
-                dc.device.serial_number,
-                dc.device.brand,
-                dc.device.get_status_display(),
-                dc.notes or "",
-            ])
-        sheets.append(("Devices", sheet2))
-
-        sheet3 = [["Device", "Accessory", "Status", "Condition"]]
-        for dc in obj.devices.all():
-            for acc in dc.accessories.all():
-                sheet3.append([
-                    f"{dc.device.name_en}/{dc.device.name_ar}",
-                    f"{acc.name_en}/{acc.name_ar}",
-                    acc.get_status_display(),
-                    acc.get_condition_display(),
-                ])
-        sheets.append(("Accessories", sheet3))
-
-        return sheets
-
-
-# =============== PDF Config (Helpers, Fonts, Styles) ===============
-class PDFConfig:
-    """Centralized configuration for fonts, helpers, and styles."""
-
-    @staticmethod
-    def ar_text(txt: str) -> str:
-        """Reshape + bidi Arabic text for correct PDF rendering."""
-        if not txt:
-            return ""
-        return get_display(arabic_reshaper.reshape(str(txt)))
-
-    # ---- Fonts ----
-    font_dir = os.path.join(settings.BASE_DIR, "static", "font")
-    dejavu_path = os.path.join(font_dir, "DejaVuSans.ttf")
-
-    try:
-        pdfmetrics.registerFont(TTFont("DejaVu", dejavu_path))
-    except Exception:
-        pass
-
-    # ---- Styles ----
-    styles = getSampleStyleSheet()
-    styles.add(ParagraphStyle(name="Arabic", fontName="DejaVu", alignment=2, fontSize=12, leading=16))
-    styles.add(ParagraphStyle(name="English", fontName="DejaVu", alignment=0, fontSize=10))
-    styles.add(
-        ParagraphStyle(
-            name="SectionTitle",
-            fontName="DejaVu",
-            alignment=1,
-            fontSize=13,
-            spaceAfter=12,
-            spaceBefore=12,
-        )
-    )
-
-
-# =============== Header/Footer ===============
-class HeaderFooter:
-    @staticmethod
-    def draw_header(canvas, doc):
-        canvas.saveState()
-        canvas.setFont("DejaVu", 11)
-
-        # Arabic (right side)
-        text_ar = (
-            "المملكة العربية السعودية\n"
-            "مجلس شؤون الجامعات\n"
-            "كليات الأولى الأهلية بالأحساء"
-        )
-        for i, line in enumerate(text_ar.split("\n")):
-            canvas.drawRightString(A4[0] - 30, A4[1] - 30 - (i * 18), PDFConfig.ar_text(line))
-
-        # Logo
-        logo_path = os.path.join(settings.BASE_DIR, "static", "img", "logo.png")
-        if os.path.exists(logo_path):
-            canvas.drawImage(
-                logo_path,
-                A4[0] / 2 - 30,
-                A4[1] - 70,
-                width=100,
-                height=60,
-                preserveAspectRatio=True,
-                mask="auto"
-            )
-
-        # English (left side)
-        left_text = (
-            "Kingdom of Saudi Arabia\n"
-            "Council Of Universities' Affairs\n"
-            "AlOola Colleges Private Al Ahsa"
-        )
-        for i, line in enumerate(left_text.split("\n")):
-            canvas.drawString(30, A4[1] - 30 - (i * 18), line)
-
-        canvas.restoreState()
-
-    @staticmethod
-    def draw_footer(canvas, doc):
-        canvas.saveState()
-        canvas.setFont("DejaVu", 8)
-        footer_ar = "الأحساء – المبرز – الحي الأكاديمي، الرمز البريدي: 36429 | Al-Mubarraz, Al-Ahsa - Academic District, Zip Code: 36429"
-        footer_en = "Al-Mubarraz, Al-Ahsa - Academic District, Zip Code: 36429"
-
-        # Top line (gold color)
-        canvas.setStrokeColorRGB(193 / 255.0, 135 / 255.0, 65 / 255.0)
-        canvas.setLineWidth(8)
-        canvas.line(0, A4[1], A4[0], A4[1] - 0)
-
-        canvas.drawCentredString(A4[0] / 2, 14, PDFConfig.ar_text(footer_ar))
-        canvas.line(0, 0, A4[0], 0)
-        canvas.setLineWidth(1)
-        canvas.setStrokeColorRGB(0, 0, 0)
-        canvas.line(30, 30, A4[0] - 30, 30)
-        canvas.restoreState()
-
-
-# =============== Main Export Class ===============
-class CustodyPDFBuilder:
-    def __init__(self, obj):
-        self.obj = obj
-        self.buffer = io.BytesIO()
-        self.header_style = ParagraphStyle(
-            "HeaderStyle", fontName="DejaVu", fontSize=10, textColor=colors.white, alignment=1
-        )
-
-    def build(self):
-        doc = BaseDocTemplate(
-            self.buffer,
-            pagesize=A4,
-            leftMargin=30,
-            rightMargin=30,
-            topMargin=100,
-            bottomMargin=40
-        )
-
-        frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id="normal")
-
-        doc.addPageTemplates([
-            PageTemplate(id="main", frames=frame, onPage=HeaderFooter.draw_header, onPageEnd=HeaderFooter.draw_footer)
-        ])
-
-        story = []
-        story += self._title_section()
-        story += self._employee_section()
-        story += self._devices_section()
-        story += self._declaration_section()
-        story += self._signature_section()
-
-        doc.build(story)
-        self.buffer.seek(0)
-        return self.buffer
-
-    # ---------- Helpers ----------
-    def make_paragraph(self, text, style=PDFConfig.styles["Arabic"]):
-        """Return a Paragraph with Arabic reshaping + bidi if needed."""
-        if text is None:
-            text = "-"
-        if any("\u0600" <= c <= "\u06FF" for c in text):  # Arabic letters
-            reshaped = arabic_reshaper.reshape(str(text))
-            bidi_text = get_display(reshaped).replace("\n", "<br/>")
-            return Paragraph(bidi_text, style)
-        return Paragraph(str(text), style)
-
-    # ---------- Sections ----------
-    def _title_section(self):
-        return [
-            Paragraph(PDFConfig.ar_text("نموذج تسليم عهدة / Custody Receipt Form"), PDFConfig.styles["SectionTitle"]),
-            Spacer(1, 20),
-        ]
-
-    def _employee_section(self):
-        fields = [
-            (str(self.obj.custody_date), PDFConfig.ar_text("التاريخ / Date : ")),
-            (PDFConfig.ar_text("اسم الموظف / Employee Name :"), ""),
-            (f"{PDFConfig.ar_text(self.obj.employee.full_name_ar)} / {self.obj.employee.full_name_en}", ""),
-            (PDFConfig.ar_text(self.obj.employee.department), PDFConfig.ar_text("القسم / Department : ")),
-            (PDFConfig.ar_text(self.obj.employee.job_title), PDFConfig.ar_text("المسمى الوظيفي / Job Title : ")),
-            (PDFConfig.ar_text(self.obj.employee.job_title), PDFConfig.ar_text("الرقم الوظيفي / Badget Number : ")),
-        ]
-
-        story = []
-        for i, (label, value) in enumerate(fields):
-            text = f"<b>{label}</b> {value}"
-            story.append(Paragraph(text, PDFConfig.styles["Arabic"] if i != 2 else PDFConfig.styles["SectionTitle"]))
-            story.append(Spacer(1, 6))
-
-        intro_ar = "بموجب هذا النموذج، نُقر نحن الكليات الأولى بأن الموظف المذكور أعلاه قد استلم عهدة العمل التالية:"
-        intro_en = (
-            "By this form, we at Al-Kulliyat Al-Oula (First Colleges) acknowledge that the "
-            "above-mentioned employee has received the following work-related items."
-        )
-
-        story.append(Spacer(1, 20))
-        story.append(self.make_paragraph(intro_ar))
-        story.append(self.make_paragraph(intro_en, PDFConfig.styles["English"]))
-        story.append(Spacer(1, 20))
-
-        return story
-
-    def _signature_section(self):
-        return [
-            Paragraph(PDFConfig.ar_text("اسم الموظف المستلم/ Employee Name: "), PDFConfig.styles["Arabic"]),
-            Paragraph(PDFConfig.ar_text("التوقيع / Signature: ___________________"), PDFConfig.styles["Arabic"]),
-            Spacer(1, 20),
-        ]
-
-    def _declaration_section(self):
-        para_ar = (
-            "أُقرّ أنا الموقع أدناه بأنني قد استلمت العهدة الموضحة أعلاه بحالة سليمة.\n"
-            "وأتعهد بالمحافظة عليها واستخدامها فقط في الأغراض الوظيفية.\n"
-            "كما أتحمل كامل المسؤولية عنها، وفي حال ضياعها أو تلفها نتيجة الإهمال أو الاستخدام الخاطئ،\n"
-            "أتحمل التبعات القانونية والمالية المترتبة على ذلك، وفق سياسات وأنظمة الشركة."
-        )
-        para_en = (
-            "I, the undersigned, acknowledge that I have received the above-listed items "
-            "in good condition.\nI commit to maintaining and using them solely for work purposes.\n"
-            "In case of loss or damage due to negligence or misuse, I agree to bear the legal "
-            "and financial consequences in accordance with the company's policies."
-        )
-
-        return [
-            self.make_paragraph("إقرار الموظف:"),
-            self.make_paragraph(para_ar),
-            Spacer(1, 10),
-            Paragraph(para_en, PDFConfig.styles["English"]),
-            Spacer(1, 20),
-        ]
-
-    def _devices_section(self):
-        headers = [
-            "الحالة\nCondition",
-            "الملحقات\nAccessories",
-            "الرقم التسلسلي\nSerial Number",
-            "الماركة\nBrand",
-            "نوع الجهاز\nItem Type",
-            "م.\nNo.",
-        ]
-        header_row = [self.make_paragraph(h, self.header_style) for h in headers]
-        data = [header_row]
-
-        for i, dc in enumerate(self.obj.devices.select_related("device").all()):
-            accessories = "\n".join([f"- {a.name_ar}/{a.name_en}" for a in dc.accessories.all()]) or "-"
-            item_text = f"{dc.device.name_ar}/{dc.device.name_en} | {dc.device.device_type.name_ar}/{dc.device.device_type.name_en}"
-
-            row = [
-                self.make_paragraph(dc.device.get_status_display()),
-                self.make_paragraph(accessories),
-                self.make_paragraph(dc.device.serial_number or "-"),
-                self.make_paragraph(dc.device.brand or "-"),
-                self.make_paragraph(item_text),
-                Paragraph(str(i + 1), PDFConfig.styles["SectionTitle"]),
-            ]
-            data.append(row)
-
-        max_col_lengths = [
-            max(len(str(r[j].text)) if hasattr(r[j], "text") else 10 for r in data) for j in range(len(headers))
-        ]
-        total_width = 550
-        min_width, max_width = 40, 160
-        scale = total_width / sum(max_col_lengths)
-        col_widths = [max(min_width, min(int(l * scale), max_width)) for l in max_col_lengths]
-
-        table = Table(data, colWidths=col_widths, repeatRows=1)
-        table.setStyle(TableStyle([
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1B2856")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.white),
-            ("FONTNAME", (0, 0), (-1, 0), "DejaVu"),
-            ("FONTSIZE", (0, 0), (-1, 0), 10),
-            ("ALIGN", (0, 0), (-1, 0), "CENTER"),
-            ("VALIGN", (0, 0), (-1, 0), "MIDDLE"),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 6),
-            ("TOPPADDING", (0, 0), (-1, 0), 6),
-            ("FONTNAME", (0, 1), (-1, -1), "DejaVu"),
-            ("FONTSIZE", (0, 1), (-1, -1), 10),
-            ("ALIGN", (0, 1), (-1, -1), "CENTER"),
-            ("VALIGN", (0, 1), (-1, -1), "TOP"),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.HexColor("#F9F9F9"), colors.white]),
-            ("GRID", (0, 0), (-1, -1), 0.25, colors.HexColor("#D3D3D3")),
-            ("BOX", (0, 0), (-1, -1), 0.75, colors.HexColor("#1B2856")),
-            ("LEFTPADDING", (0, 0), (-1, -1), 6),
-            ("RIGHTPADDING", (0, 0), (-1, -1), 6),
-            ("TOPPADDING", (0, 1), (-1, -1), 4),
-            ("BOTTOMPADDING", (0, 1), (-1, -1), 4),
-        ]))
-        return [table, Spacer(1, 20)]
-
-
-# =============== Excel Exporter ===============
-class CustodyExcelBuilder:
-    def __init__(self, obj):
-        self.obj = obj
-
-    def build(self):
-        wb = openpyxl.Workbook()
-        ws = wb.active
-        ws.title = "Custody Receipt"
-
-        # ---------- Styles ----------
-        bold_font = Font(bold=True)
-        center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        right_align = Alignment(horizontal="right", vertical="center", wrap_text=True)
-        header_fill = PatternFill("solid", fgColor="1B2856")
-        white_font = Font(color="FFFFFF", bold=True)
-        thin_border = Border(
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-            bottom=Side(style="thin"),
-        )
-
-        row = 1
-        # ---------- Title ----------
-        ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-        ws.cell(row=row, column=1, value="نموذج تسليم عهدة / Custody Receipt Form").font = Font(bold=True, size=14)
-        ws.cell(row=row, column=1).alignment = center_align
-        row += 2
-
-        # ---------- Employee Info ----------
-        def add_full_row(value, align=center_align, bold=False):
-            nonlocal row
-            ws.merge_cells(start_row=row, start_column=1, end_row=row, end_column=6)
-            cell = ws.cell(row=row, column=1, value=value)
-            cell.alignment = align
-            if bold:
-                cell.font = Font(bold=True)
-            row += 1
-
-        add_full_row(f"التاريخ / Date: {self.obj.custody_date}", right_align)
-        add_full_row(f"اسم الموظف / Employee Name: {self.obj.employee.full_name_ar} / {self.obj.employee.full_name_en}", right_align, bold=True)
-        add_full_row(f"القسم / Department: {self.obj.employee.department}", right_align)
-        add_full_row(f"المسمى الوظيفي / Job Title: {self.obj.employee.job_title}", right_align)
-        add_full_row(f"الرقم الوظيفي / Badge Number: {self.obj.employee.job_title or '-'}", right_align)
-        row += 1
-
-        # ---------- Intro ----------
-        add_full_row("بموجب هذا النموذج، نُقر نحن الكليات الأولى بأن الموظف المذكور أعلاه قد استلم عهدة العمل التالية:", right_align)
-        add_full_row("By this form, we at Al-Kulliyat Al-Oula (First Colleges) acknowledge that the employee has received the following items.")
-        row += 1
-
-        # ---------- Devices Table ----------
-        headers = ["م.\nNo.", "نوع الجهاز\nItem Type", "الماركة\nBrand", "الرقم التسلسلي\nSerial Number", "الملحقات\nAccessories", "الحالة\nCondition"]
-        for col in range(1, len(headers) + 1):
-            cell = ws.cell(row=row, column=col)
-            cell.fill = header_fill
-            cell.font = white_font
-            cell.alignment = center_align
-            cell.border = thin_border
-            cell.value = headers[col - 1]
-        row += 1
-
-        for i, dc in enumerate(self.obj.devices.select_related("device").all(), start=1):
-            accessories = ", ".join([f"{a.name_ar}/{a.name_en}" for a in dc.accessories.all()]) or "-"
-            item_text = f"{dc.device.name_ar}/{dc.device.name_en} | {dc.device.device_type.name_ar}/{dc.device.device_type.name_en}"
-
-            values = [
-                i,
-                item_text,
-                dc.device.brand or "-",
-                dc.device.serial_number or "-",
-                accessories,
-                dc.device.get_status_display(),
-            ]
-            ws.append(values)
-            for col in range(1, len(values) + 1):
-                cell = ws.cell(row=row, column=col)
-                cell.alignment = center_align
-                cell.border = thin_border
-            row += 1
-
-        row += 1
-
-        # ---------- Declaration ----------
-        add_full_row("إقرار الموظف:", right_align, bold=True)
-        add_full_row("أُقرّ أنا الموقع أدناه بأنني قد استلمت العهدة الموضحة أعلاه بحالة سليمة. "
-                     "وأتعهد بالمحافظة عليها واستخدامها فقط في الأغراض الوظيفية.", right_align)
-        add_full_row("I, the undersigned, acknowledge that I have received the above-listed items "
-                     "in good condition and commit to maintaining and using them solely for work purposes.")
-        row += 1
-
-        # ---------- Signature ----------
-        add_full_row("اسم الموظف المستلم / Employee Name:", right_align)
-        add_full_row("التوقيع / Signature: ___________________", right_align)
-
-        # ---------- Column widths ----------
-        for col in range(1, 7):
-            ws.column_dimensions[get_column_letter(col)].width = 25
-
-        # Save to BytesIO
-        buffer = io.BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        return buffer
-
-# =============== Django View =============== 
-class CustodyExportView(PermissionMixin, ExportMixin):
-    model = Custody
-    filename_prefix = "custody"
+        obj = get_object_or_404(receipts.custodies(), pk=self.kwargs.get("pk"))
+        key = receipts.fingerprint(obj, action)
+        etag = f'"{key}"'
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            extension = receipts.EXTENSIONS[action]
+            cache = receipts.ReceiptCache()
+            handle = cache.open(key, extension)
+            if handle is None:
+                # Imported on the first export only: it pulls in reportlab and openpyxl
+                from . import exporters
+
+                handle = exporters.BUILDERS[action](obj).build()
+                cache.store(key, extension, handle)
+            filename = f"{self.filename_prefix}_{obj.pk}.{extension}"
+            response = FileResponse(handle, as_attachment=True, filename=filename)
+
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class CustodyBulkExportView(PermissionMixin, FormView):
+    """
+    PDF receipts of every custody matching the filter (date range, department,
+    not returned), rendered in parallel and downloaded as one ZIP archive.
+    Without query parameters the filter form is shown.
+    """
+    form_class = CustodyExportForm
+    template_name = "custody/bulk_export.html"
     permission_required = "devices.change_custody"
 
     def get(self, request, *args, **kwargs):
-        action = kwargs.get("action")
-        obj = self.get_object()
+        if not request.GET:
+            return super().get(request, *args, **kwargs)
+        form = self.get_form()
+        if form.is_valid():
+            return self.form_valid(form)
+        return self.form_invalid(form)
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if self.request.GET:
+            kwargs["data"] = self.request.GET
+        return kwargs
 
-        if action == "pdf":
-            builder = CustodyPDFBuilder(obj)
-            buffer = builder.build()
-            filename = f"{self.filename_prefix}_{obj.pk}.pdf"
-            return FileResponse(buffer, as_attachment=True, filename=filename)
-
-        elif action == "excel":
-            builder = CustodyExcelBuilder(obj)
-            buffer = builder.build()
-            filename = f"{self.filename_prefix}_{obj.pk}.xlsx"
-            return FileResponse(buffer, as_attachment=True, filename=filename)
-
-        return HttpResponse("Invalid export action", status=400)
+    def form_valid(self, form):
+        # Loaded once here with everything the receipts show; the workers get the rows
+        custodies = list(receipts.select(**form.cleaned_data))
+        if not custodies:
+            form.add_error(None, _("No custodies match these filters."))
+            return self.form_invalid(form)
+
+        archive = tempfile.TemporaryFile()
+        receipts.write_zip(custodies, archive)
+        archive.seek(0)
+        filename = f"custody_receipts_{timezone.localdate():%Y-%m-%d}.zip"
+        return FileResponse(archive, as_attachment=True, filename=filename)
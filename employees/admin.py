@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import User, Employee
+from .models import User, Employee, OutgoingEmail
 
 
 @admin.register(User)
@@ -13,3 +13,12 @@ class EmployeeAdmin(admin.ModelAdmin):
     list_display = ("full_name_ar", "full_name_en", "department", "phone_number", "user")
     list_filter = ("department",)
     search_fields = ("full_name_ar", "full_name_en", "phone_number", "user__username")
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("subject", "to", "state", "attempts", "created_at", "sent_at")
+    list_filter = ("state",)
+    search_fields = ("subject", "to")
+    # Credential emails carry the password in the body
+    exclude = ("body", "html_body")
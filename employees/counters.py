@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, Value, When
+
+from .models import StatusCounter
+from tickets.models import Ticket
+from devices.models import Device, Custody
+
+
+CUSTODY_ACTIVE = "active"
+CUSTODY_RETURNED = "returned"
+
+
+def _custody_state(return_date):
+    return CUSTODY_RETURNED if return_date else CUSTODY_ACTIVE
+
+
+# scope -> (model, tracked field, value -> status)
+TRACKED = {
+    "tickets": (Ticket, "status", str),
+    "devices": (Device, "status", str),
+    "custodies": (Custody, "return_date", _custody_state),
+}
+
+
+def tracked_scope(model):
+    for scope, (tracked_model, _field, _to_status) in TRACKED.items():
+        if tracked_model is model:
+            return scope
+    return None
+
+
+def status_of(scope, instance):
+    _model, field, to_status = TRACKED[scope]
+    return to_status(getattr(instance, field))
+
+
+def bump(scope, status, delta):
+    """Atomically add ``delta`` to a counter row, creating it if needed."""
+    if not delta:
+        return
+    updated = StatusCounter.objects.filter(scope=scope, status=status).update(count=F("count") + delta)
+    if not updated:
+        _obj, created = StatusCounter.objects.get_or_create(scope=scope, status=status, defaults={"count": delta})
+        if not created:
+            StatusCounter.objects.filter(scope=scope, status=status).update(count=F("count") + delta)
+
+
+def get_counts(scope):
+    """Return {status: count} for a scope straight from the counters table."""
+    return dict(StatusCounter.objects.filter(scope=scope).values_list("status", "count"))
+
+
+def compute_counts(scope):
+    """Count rows per status by scanning the source table."""
+    model, field, _to_status = TRACKED[scope]
+    if scope == "custodies":
+        rows = model.objects.annotate(
+            state=Case(
+                When(return_date__isnull=True, then=Value(CUSTODY_ACTIVE)),
+                default=Value(CUSTODY_RETURNED),
+            )
+        ).values("state").annotate(n=Count("id")).order_by()
+        return {row["state"]: row["n"] for row in rows}
+    rows = model.objects.values(field).annotate(n=Count("id")).order_by()
+    return {row[field]: row["n"] for row in rows}
+
+
+@transaction.atomic
+def rebuild(scopes=None):
+    """Recompute the counters for the given scopes (all by default)."""
+    for scope in scopes or TRACKED:
+        counts = compute_counts(scope)
+        StatusCounter.objects.filter(scope=scope).delete()
+        StatusCounter.objects.bulk_create([
+            StatusCounter(scope=scope, status=status, count=count)
+            for status, count in counts.items()
+        ])
+
+
+def verify(scopes=None):
+    """Return {scope: (stored, actual)} for every scope that has drifted."""
+    mismatches = {}
+    for scope in scopes or TRACKED:
+        stored = {status: count for status, count in get_counts(scope).items() if count}
+        actual = compute_counts(scope)
+        if stored != actual:
+            mismatches[scope] = (stored, actual)
+    return mismatches
@@ -0,0 +1,104 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .counters import CUSTODY_ACTIVE, CUSTODY_RETURNED, get_counts
+from .models import Employee
+from tickets.models import TicketStatus
+from devices.models import Status
+from inventories import forecast
+from inventories.models import InkInventory, OfficeSupply
+
+
+SNAPSHOT_CACHE_KEY = "dashboard:summaries"
+
+
+# Global status breakdowns come from the StatusCounter table; anything scoped
+# to a subset of rows is computed with a single conditional-aggregate query.
+def tickets_summary(queryset=None):
+    if queryset is None:
+        counts = get_counts("tickets")
+        return {
+            "total": sum(counts.values()),
+            "new": counts.get(TicketStatus.NEW, 0),
+            "in_progress": counts.get(TicketStatus.IN_PROGRESS, 0),
+            "resolved": counts.get(TicketStatus.RESOLVED, 0),
+            "rejected": counts.get(TicketStatus.REJECTED, 0),
+        }
+    return queryset.aggregate(
+        total=Count("id"),
+        new=Count("id", filter=Q(status=TicketStatus.NEW)),
+        in_progress=Count("id", filter=Q(status=TicketStatus.IN_PROGRESS)),
+        resolved=Count("id", filter=Q(status=TicketStatus.RESOLVED)),
+        rejected=Count("id", filter=Q(status=TicketStatus.REJECTED)),
+    )
+
+
+def devices_summary():
+    counts = get_counts("devices")
+    return {
+        "total": sum(counts.values()),
+        "available": counts.get(Status.AVAILABLE, 0),
+        "in_use": counts.get(Status.IN_USE, 0),
+        "maintenance": counts.get(Status.MAINTENANCE, 0),
+        "lost": counts.get(Status.LOST, 0),
+    }
+
+
+def custodies_summary():
+    counts = get_counts("custodies")
+    return {
+        "total": sum(counts.values()),
+        "active": counts.get(CUSTODY_ACTIVE, 0),
+        "inactive": counts.get(CUSTODY_RETURNED, 0),
+        "my_custodies": 0,
+    }
+
+
+def employees_summary():
+    summary = Employee.objects.aggregate(
+        total=Count("id"),
+        active=Count("id", filter=Q(user__is_active=True)),
+        inactive=Count("id", filter=Q(user__is_active=False)),
+        departments=Count("department", distinct=True),
+        job_titles=Count("job_title", distinct=True),
+    )
+    # Breakdowns stay lazy; they are only evaluated when rendered or cached
+    summary["by_department"] = Employee.objects.values("department").annotate(count=Count("id")).order_by()
+    summary["by_job_title"] = Employee.objects.values("job_title").annotate(count=Count("id")).order_by()
+    return summary
+
+
+def inventories_summary():
+    return {
+        "inks": InkInventory.objects.count(),
+        "office_supplies": OfficeSupply.objects.count(),
+        # Burn rates are recomputed nightly (forecast_stock); days left use the live quantity
+        "reorder_count": sum(
+            forecast.low_stock(model, settings.REORDER_LEAD_DAYS).count() for model in (InkInventory, OfficeSupply)
+        ),
+        "low_stock": forecast.reorder_list(limit=5),
+    }
+
+
+def build_summaries():
+    """Compute every summary block shown to managers on the dashboard."""
+    return {
+        "employees_summary": employees_summary(),
+        "tickets_summary": tickets_summary(),
+        "devices_summary": devices_summary(),
+        "custodies_summary": custodies_summary(),
+        "inventories_summary": inventories_summary(),
+    }
+
+
+def get_summaries():
+    """
+    Return the dashboard summaries, served from a cached snapshot when
+    DASHBOARD_CACHE_TIMEOUT is set (seconds, 0 disables caching). The
+    snapshot is not invalidated on writes: it lags by up to the timeout.
+    """
+    timeout = getattr(settings, "DASHBOARD_CACHE_TIMEOUT", 0)
+    if not timeout:
+        return build_summaries()
+    return cache.get_or_set(SNAPSHOT_CACHE_KEY, build_summaries, timeout)
@@ -0,0 +1,45 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+
+
+def _init_worker():
+    # Forked workers inherit the configured project; spawned ones need setup
+    if not apps.ready:
+        django.setup()
+
+
+def _hash(password):
+    return make_password(password)
+
+
+class PasswordHasherPool:
+    """
+    Hash passwords across a pool of processes. PBKDF2 is CPU-bound, so
+    threads don't help; with ``workers <= 1`` hashing stays in-process.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self._executor = None
+        if workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    def hash_many(self, passwords):
+        if self._executor is None:
+            return [make_password(password) for password in passwords]
+        chunksize = max(1, len(passwords) // (self.workers * 4))
+        return list(self._executor.map(_hash, passwords, chunksize=chunksize))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,49 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from employees.hashing import PasswordHasherPool
+
+
+class Command(BaseCommand):
+    help = "Time PasswordHasherPool (as used by import_employees) for several worker counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--passwords", type=int, default=32, help="Passwords hashed per run (default: 32).")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            action="append",
+            help="Worker count to time (may be repeated). Defaults to 1, 2, 4, ... up to the CPU count.",
+        )
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        counts = kwargs["workers"] or self.default_counts()
+        passwords = [f"password-{n}" for n in range(kwargs["passwords"])]
+
+        baseline = None
+        for workers in counts:
+            with PasswordHasherPool(workers) as hasher:
+                # Start the worker processes before timing
+                hasher.hash_many(passwords[:workers])
+                started = time.perf_counter()
+                hasher.hash_many(passwords)
+                elapsed = time.perf_counter() - started
+            baseline = baseline or elapsed
+            self.stdout.write(
+                f"workers={workers}: {elapsed:.2f}s, {len(passwords) / elapsed:.1f} passwords/s, "
+                f"speedup x{baseline / elapsed:.2f}"
+            )
+
+    def default_counts(self):
+        cpus = os.cpu_count() or 1
+        counts = [1]
+        while counts[-1] * 2 <= cpus:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != cpus:
+            counts.append(cpus)
+        return counts
+
+# python manage.py bench_password_hashing [--passwords 64] [--workers 1 --workers 4]
@@ -1,8 +1,11 @@
-import pandas as pd
+import csv
+import os
 import secrets
 import string
 import re
+import time
 
+from django import forms
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group
@@ -10,26 +13,94 @@ from django.template.loader import render_to_string
 from django.core.mail import EmailMultiAlternatives
 from django.conf import settings
 from django.db import transaction
+from django.db.models.functions import Lower
 from datetime import datetime
 
-from employees.models import Employee
+from employees import outbox
+from employees.hashing import PasswordHasherPool
+from employees.models import Employee, ImportCheckpoint
+from employees.search import employee_index
 
 
 User = get_user_model()
 
+EMPLOYEE_FIELDS = [
+    "full_name_ar", "full_name_en", "birth_date", "id_number", "address",
+    "job_title", "job_number", "department", "phone_number",
+]
+
+
+class EmployeeRowForm(forms.ModelForm):
+    """One CSV row: the Employee fields plus the account's email and username."""
+    email = forms.EmailField(max_length=254)
+    username = forms.CharField(max_length=150)
+
+    class Meta:
+        model = Employee
+        fields = EMPLOYEE_FIELDS
+
 
 class Command(BaseCommand):
-    help = "Import Employees + Send Credentials Email"
+    help = "Import Employees + Queue Credentials Email (delivered by send_outbox)"
 
     def add_arguments(self, parser):
         parser.add_argument("file", type=str)
+        parser.add_argument(
+            "--bulk",
+            action="store_true",
+            help="Set-based import: pre-fetch existing users and insert with bulk_create.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Rows per bulk_create batch / transaction in --bulk mode (default: 1000).",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes used to hash passwords in --bulk/--stream mode (default: all cores, 1 = in-process).",
+        )
+        parser.add_argument(
+            "--stream",
+            action="store_true",
+            help="Read the CSV chunk by chunk with bounded memory (no pandas) and "
+                 "resume from the last committed chunk if a previous run failed.",
+        )
 
     # -------------------------------------------------
-    @transaction.atomic
     def handle(self, *args, **kwargs):
 
-        df = pd.read_csv(kwargs["file"], sep=';')
-        df.columns = df.columns.str.strip() 
+        started = time.perf_counter()
+        if kwargs["stream"]:
+            with PasswordHasherPool(kwargs["workers"]) as hasher:
+                created, total = self.stream_import(kwargs["file"], kwargs["chunk_size"], hasher)
+        else:
+            import pandas as pd
+
+            df = pd.read_csv(kwargs["file"], sep=';')
+            df.columns = df.columns.str.strip()
+            total = len(df)
+
+            if kwargs["bulk"]:
+                with PasswordHasherPool(kwargs["workers"]) as hasher:
+                    created = self.bulk_import(df, kwargs["chunk_size"], hasher)
+            else:
+                created = self.import_rows(df)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {created} of {total} rows in {elapsed:.2f}s "
+                f"({total / elapsed if elapsed else 0:.0f} rows/s)"
+            )
+        )
+
+    # -------------------------------------------------
+    @transaction.atomic
+    def import_rows(self, df):
+        created = 0
 
         for _, row in df.iterrows():
 
@@ -74,39 +145,234 @@ class Command(BaseCommand):
                 phone_number=row.get("phone_number"),
             )
 
-            # ---------- Email HTML ----------
-            html_content = render_to_string(
-                "account/employee_credentials.html",
-                {
-                    "user": employee,
-                    "username": username,
-                    "password": password,
-                    "year": datetime.now().year,
-                },
+            outbox.enqueue_message(
+                self.build_credentials_email(employee, username, password)
             )
+            created += 1
 
-            subject = "Your HelpDesk Account Credentials"
-
-            email_msg = EmailMultiAlternatives(
-                subject=subject,
-                body="Account created",
-                from_email=None,
-                to=[email],
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Created & queued email: {email}"
+                )
             )
 
-            email_msg.attach_alternative(
-                html_content,
-                "text/html"
-            )
+        return created
 
-            email_msg.send()
+    # -------------------------------------------------
+    def bulk_import(self, df, chunk_size, hasher):
+        """
+        Set-based import: existing emails/usernames are loaded once into sets,
+        groups are resolved once, passwords are hashed by ``hasher`` (a process
+        pool) and users/employees are inserted with bulk_create, one
+        transaction per chunk.
+        """
+        existing_emails = {email.lower() for email in User.objects.values_list("email", flat=True)}
+        taken_usernames = set(User.objects.values_list("username", flat=True))
 
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f"Created & emailed: {email}"
+        group_names = {
+            name for name in (self.clean_value(value) for value in df.get("group_type", [])) if name
+        }
+        groups = {group.name: group for group in Group.objects.filter(name__in=group_names)}
+        for name in group_names - groups.keys():
+            groups[name] = Group.objects.create(name=name)
+
+        created = 0
+        records = df.to_dict("records")
+        for start in range(0, len(records), chunk_size):
+            pending = []
+            for line, row in enumerate(records[start:start + chunk_size], start=start + 2):
+                row = self.validate_row(row, line)
+                if row is None:
+                    continue
+                email = row["email"]
+                if email.lower() in existing_emails:
+                    self.stdout.write(self.style.WARNING(f"Skipped: {email}"))
+                    continue
+                existing_emails.add(email.lower())
+
+                username = self.make_unique_username(row["username"], taken_usernames)
+                password = self.generate_password()
+                pending.append((row, username, email, password))
+
+            if pending:
+                hashes = hasher.hash_many([password for *_rest, password in pending])
+                self.bulk_create_chunk(pending, hashes, groups)
+                created += len(pending)
+                self.stdout.write(
+                    self.style.SUCCESS(f"Created {created} employees so far")
                 )
+
+        return created
+
+    def validate_row(self, row, line):
+        """
+        Run EmployeeRowForm over a CSV row (``line`` is its line in the file).
+        Returns the cleaned values plus group_type, or None after reporting
+        the errors, so one bad row is skipped instead of failing its chunk.
+        """
+        form = EmployeeRowForm({
+            field: self.clean_value(row.get(field)) for field in ["email", "username", *EMPLOYEE_FIELDS]
+        })
+        if not form.is_valid():
+            errors = "; ".join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+            self.stdout.write(self.style.ERROR(f"Invalid row on line {line} ({errors}), skipped"))
+            return None
+        cleaned = form.cleaned_data
+        cleaned["group_type"] = self.clean_value(row.get("group_type"))
+        return cleaned
+
+    # -------------------------------------------------
+    def stream_import(self, path, chunk_size, hasher):
+        """
+        Streaming import: the CSV is read with the csv module in chunks of
+        ``chunk_size`` rows, each chunk is validated and inserted in its own
+        transaction together with an ImportCheckpoint, so a failed run resumes
+        from the last committed chunk. Memory stays bounded by the chunk size.
+        """
+        source = os.path.abspath(path)
+        stat = os.stat(source)
+        fingerprint = f"{stat.st_size}:{int(stat.st_mtime)}"
+
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(
+            source=source, defaults={"fingerprint": fingerprint}
+        )
+        if checkpoint.fingerprint != fingerprint:
+            self.stdout.write(self.style.WARNING("File changed since the last run, starting over."))
+            checkpoint.fingerprint = fingerprint
+            checkpoint.rows_done = 0
+            checkpoint.save()
+        elif checkpoint.rows_done:
+            self.stdout.write(self.style.WARNING(f"Resuming after row {checkpoint.rows_done}"))
+
+        groups = {}
+        created = total = 0
+        for rows in self.read_chunks(source, chunk_size):
+            first_line = total + 2
+            total += len(rows)
+            if total <= checkpoint.rows_done:
+                continue
+
+            pending = self.prepare_chunk(rows, first_line)
+            hashes = hasher.hash_many([password for *_rest, password in pending])
+            checkpoint.rows_done = total
+            self.bulk_create_chunk(pending, hashes, self.resolve_groups(pending, groups), checkpoint)
+            created += len(pending)
+            self.stdout.write(
+                self.style.SUCCESS(f"Committed rows up to {total} ({created} created)")
             )
 
+        # Finished cleanly: nothing to resume
+        checkpoint.delete()
+        return created, total
+
+    def read_chunks(self, path, chunk_size):
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=";")
+            reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+            chunk = []
+            for row in reader:
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+
+    def prepare_chunk(self, rows, first_line):
+        """Validate a chunk and drop rows whose email already exists (case-insensitively)."""
+        valid = [
+            cleaned for line, row in enumerate(rows, start=first_line)
+            if (cleaned := self.validate_row(row, line)) is not None
+        ]
+
+        existing_emails = set(
+            User.objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=[row["email"].lower() for row in valid])
+            .values_list("email_lower", flat=True)
+        )
+        candidates = [re.sub(r'[^a-zA-Z0-9_]', '_', row["username"]) for row in valid]
+        taken_usernames = set(User.objects.filter(username__in=candidates).values_list("username", flat=True))
+
+        pending = []
+        for row in valid:
+            email = row["email"]
+            if email.lower() in existing_emails:
+                self.stdout.write(self.style.WARNING(f"Skipped: {email}"))
+                continue
+            existing_emails.add(email.lower())
+            username = self.make_unique_username(row["username"], taken_usernames, check_db=True)
+            pending.append((row, username, email, self.generate_password()))
+        return pending
+
+    def resolve_groups(self, pending, groups):
+        """Add the chunk's group names to the ``groups`` cache, creating missing ones."""
+        for row, *_rest in pending:
+            name = self.clean_value(row.get("group_type"))
+            if name and name not in groups:
+                groups[name], _ = Group.objects.get_or_create(name=name)
+        return groups
+
+    def bulk_create_chunk(self, pending, hashes, groups, checkpoint=None):
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=username, email=email, password=password_hash)
+                for (_row, username, email, _password), password_hash in zip(pending, hashes)
+            ])
+
+            employees = Employee.objects.bulk_create([
+                Employee(user=user, **{field: self.clean_value(row.get(field)) for field in EMPLOYEE_FIELDS})
+                for user, (row, _username, _email, _password) in zip(users, pending)
+            ])
+
+            memberships = [
+                User.groups.through(user_id=user.pk, group_id=groups[group_name].pk)
+                for user, (row, *_rest) in zip(users, pending)
+                if (group_name := self.clean_value(row.get("group_type")))
+            ]
+            User.groups.through.objects.bulk_create(memberships)
+
+            # bulk_create skips the post_save signal that feeds the search index
+            employee_index.refresh([employee.pk for employee in employees])
+
+            # Queued with the chunk, delivered later by send_outbox
+            outbox.enqueue_messages([
+                self.build_credentials_email(employee, username, password)
+                for employee, (_row, username, _email, password) in zip(employees, pending)
+            ])
+
+            if checkpoint is not None:
+                checkpoint.save(update_fields=["rows_done", "updated_at"])
+
+    # -------------------------------------------------
+    def build_credentials_email(self, employee, username, password):
+
+        # ---------- Email HTML ----------
+        html_content = render_to_string(
+            "account/employee_credentials.html",
+            {
+                "user": employee,
+                "username": username,
+                "password": password,
+                "year": datetime.now().year,
+            },
+        )
+
+        subject = "Your HelpDesk Account Credentials"
+
+        email_msg = EmailMultiAlternatives(
+            subject=subject,
+            body="Account created",
+            from_email=None,
+            to=[employee.user.email],
+        )
+
+        email_msg.attach_alternative(
+            html_content,
+            "text/html"
+        )
+
+        return email_msg
+
     # -------------------------------------------------
     def generate_password(self, length=10):
 
@@ -121,6 +387,14 @@ class Command(BaseCommand):
             for _ in range(length)
         )
 
+    def clean_value(self, value):
+        """Empty CSV cells (NaN from pandas, "" from csv) are stored as NULL."""
+        if value is None or value != value:
+            return None
+        if isinstance(value, str):
+            return value.strip() or None
+        return value
+
     def make_valid_username(self, username):
         """
         Ensure username is valid (alphanumeric + underscores)
@@ -137,5 +411,26 @@ class Command(BaseCommand):
             counter += 1
 
         return username
-    
+
+    def make_unique_username(self, username, taken, check_db=False):
+        """
+        Same rules as make_valid_username, checked against an in-memory set.
+        With ``check_db``, suffixed candidates are also checked in the database
+        (used when ``taken`` only holds the current chunk's names).
+        """
+        username = re.sub(r'[^a-zA-Z0-9_]', '_', username)
+
+        original_username = username
+        counter = 1
+        while username in taken or (
+            check_db and counter > 1 and User.objects.filter(username=username).exists()
+        ):
+            username = f"{original_username}_{counter}"
+            counter += 1
+
+        taken.add(username)
+        return username
+
 # python manage.py import_employees employees_random_10.csv
+# python manage.py import_employees employees.csv --bulk --chunk-size 2000 --workers 8
+# python manage.py import_employees employees.csv --stream --chunk-size 2000
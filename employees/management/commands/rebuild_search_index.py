@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from employees import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search indexes from their source tables"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--index",
+            action="append",
+            choices=sorted(search.REGISTRY),
+            help="Limit to one index (may be repeated). Defaults to all indexes.",
+        )
+        parser.add_argument("--database", default="default")
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        names = kwargs["index"] or sorted(search.REGISTRY)
+
+        for name in names:
+            index = search.REGISTRY[name]
+            total = index.rebuild(using=kwargs["database"])
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt {name}: {total} rows indexed")
+            )
+
+# python manage.py rebuild_search_index [--index tickets]
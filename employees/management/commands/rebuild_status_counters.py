@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employees import counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the denormalized ticket/device/custody status counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scope",
+            action="append",
+            choices=sorted(counters.TRACKED),
+            help="Limit to one scope (may be repeated). Defaults to all scopes.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the counters with the source tables, do not rewrite them.",
+        )
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        scopes = kwargs["scope"] or list(counters.TRACKED)
+
+        if kwargs["verify"]:
+            mismatches = counters.verify(scopes)
+            for scope, (stored, actual) in mismatches.items():
+                self.stdout.write(
+                    self.style.ERROR(f"{scope}: stored {stored} != actual {actual}")
+                )
+            if mismatches:
+                raise CommandError("Status counters are out of date, run without --verify to rebuild them.")
+            self.stdout.write(self.style.SUCCESS("Status counters are consistent."))
+            return
+
+        counters.rebuild(scopes)
+        for scope in scopes:
+            self.stdout.write(
+                self.style.SUCCESS(f"Rebuilt {scope}: {counters.get_counts(scope)}")
+            )
+
+# python manage.py rebuild_status_counters [--verify] [--scope tickets]
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from employees import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails from the outbox in batches over a single connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Messages per batch (default: 100).")
+        parser.add_argument("--max-attempts", type=int, default=5, help="Give up on a message after this many failures (default: 5).")
+        parser.add_argument("--rate", type=float, default=None, help="Maximum messages per second (default: unlimited).")
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and poll the outbox every --interval seconds.",
+        )
+        parser.add_argument("--interval", type=float, default=10, help="Polling interval in --loop mode (default: 10).")
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        while True:
+            total_sent = total_failed = 0
+            while True:
+                sent, failed = outbox.send_pending(
+                    batch_size=kwargs["batch_size"],
+                    max_attempts=kwargs["max_attempts"],
+                    rate=kwargs["rate"],
+                )
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < kwargs["batch_size"]:
+                    break
+
+            if total_sent or total_failed:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed")
+                )
+
+            if not kwargs["loop"]:
+                break
+            time.sleep(kwargs["interval"])
+
+# python manage.py send_outbox [--batch-size 100] [--rate 5] [--loop --interval 10]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.5 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    StatusCounter = apps.get_model('employees', 'StatusCounter')
+    Ticket = apps.get_model('tickets', 'Ticket')
+    Device = apps.get_model('devices', 'Device')
+    Custody = apps.get_model('devices', 'Custody')
+
+    rows = []
+    for scope, model in (('tickets', Ticket), ('devices', Device)):
+        for row in model.objects.values('status').annotate(n=models.Count('id')).order_by():
+            rows.append(StatusCounter(scope=scope, status=row['status'], count=row['n']))
+    custodies = Custody.objects.aggregate(
+        active=models.Count('id', filter=models.Q(return_date__isnull=True)),
+        returned=models.Count('id', filter=models.Q(return_date__isnull=False)),
+    )
+    for status, count in custodies.items():
+        if count:
+            rows.append(StatusCounter(scope='custodies', status=status, count=count))
+    StatusCounter.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_alter_user_email'),
+        ('tickets', '0001_initial'),
+        ('devices', '0003_device_it_service_tag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=50, verbose_name='Scope')),
+                ('status', models.CharField(max_length=50, verbose_name='Status')),
+                ('count', models.IntegerField(default=0, verbose_name='Count')),
+            ],
+            options={
+                'verbose_name': 'Status Counter',
+                'verbose_name_plural': 'Status Counters',
+                'default_permissions': [],
+                'unique_together': {('scope', 'status')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
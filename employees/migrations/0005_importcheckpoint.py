@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=500, unique=True, verbose_name='Source File')),
+                ('fingerprint', models.CharField(max_length=100, verbose_name='Fingerprint')),
+                ('rows_done', models.PositiveIntegerField(default=0, verbose_name='Rows Done')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Import Checkpoint',
+                'verbose_name_plural': 'Import Checkpoints',
+                'default_permissions': [],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+from employees.search import normalize_text
+
+# The index as it was defined when this migration was written; later changes
+# to employees.search ship their own migration
+TABLE = "employees_employee_fts"
+COLUMNS = ("user__username", "full_name_en", "full_name_ar", "job_number")
+CREATE = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(username, full_name_en, full_name_ar, job_number, tokenize='unicode61 remove_diacritics 2')",
+    ],
+    "postgresql": [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)",
+    ],
+}
+INSERT = {
+    "sqlite": f"INSERT INTO {TABLE} (rowid, username, full_name_en, full_name_ar, job_number) VALUES (%s, %s, %s, %s, %s)",
+    "postgresql": (
+        f"INSERT INTO {TABLE} (id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B'))"
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE:
+        return
+    Employee = apps.get_model('employees', 'Employee')
+    rows = Employee.objects.using(connection.alias).order_by('pk').values_list('pk', *COLUMNS)
+    with connection.cursor() as cursor:
+        for statement in CREATE[connection.vendor]:
+            cursor.execute(statement)
+        batch = []
+        for pk, *texts in rows.iterator(chunk_size=2000):
+            batch.append((pk, *[normalize_text(text) for text in texts]))
+            if len(batch) >= 2000:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_importcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['full_name_en', 'id'], name='employee_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'full_name_en', 'id'], name='employee_department_idx'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def clear_bodies(apps, schema_editor):
+    # Sent and abandoned messages no longer keep their content (credentials)
+    OutgoingEmail = apps.get_model('employees', 'OutgoingEmail')
+    OutgoingEmail.objects.using(schema_editor.connection.alias).exclude(state='pending').update(body='', html_body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_employee_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_bodies, migrations.RunPython.noop),
+    ]
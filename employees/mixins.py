@@ -1,13 +1,14 @@
 import io
+from django.conf import settings
 from django.http import FileResponse, HttpResponse
 from django.shortcuts import get_object_or_404
 from django.views import View
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from openpyxl import Workbook
 
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin
 
+from .permissions import load_permissions
+from .pagination import KeysetPage, approximate_count, decode_cursor, encode_cursor, keyset_filter
+
 # Permission Required
 class PermissionMixin(LoginRequiredMixin, PermissionRequiredMixin):
     """
@@ -18,8 +19,72 @@ class PermissionMixin(LoginRequiredMixin, PermissionRequiredMixin):
         perms = self.get_permission_required()
         if isinstance(perms, str):
             perms = [perms]
-        return user.is_authenticated and (user.has_perms(perms) or user.is_superuser)
+        if not user.is_authenticated:
+            return False
+        if user.is_superuser:
+            return True
+        load_permissions(user)
+        return user.has_perms(perms)
     
+# Keyset Pagination
+class KeysetPaginationMixin:
+    """
+    Opt-in cursor pagination for ListViews, ordered by ``keyset_fields``
+    descending (e.g. ("created_at", "id")). Active when KEYSET_PAGINATION is
+    set or the request carries ?cursor= / ?before=; otherwise the regular
+    page-number paginator is used. Pages are fetched with a seek predicate,
+    so deep pages cost the same as the first one and no COUNT(*) is issued.
+    Querysets ordered by an expression (search relevance) cannot be cut by
+    a cursor and keep page numbers.
+    """
+    keyset_fields = None
+
+    def use_keyset(self, queryset=None):
+        if not self.keyset_fields:
+            return False
+        if queryset is not None and not all(isinstance(order, str) for order in queryset.query.order_by):
+            return False
+        params = self.request.GET
+        return getattr(settings, "KEYSET_PAGINATION", False) or "cursor" in params or "before" in params
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset(queryset):
+            return super().paginate_queryset(queryset, page_size)
+
+        fields = list(self.keyset_fields)
+        approx = None
+        if getattr(settings, "PAGINATION_APPROXIMATE_COUNT", False):
+            approx = approximate_count(queryset)
+
+        queryset = queryset.order_by(*[f"-{name}" for name in fields])
+        before = self.request.GET.get("before")
+        values = decode_cursor(before or self.request.GET.get("cursor", ""), queryset.model, fields)
+        backwards = bool(before) and values is not None
+        if values is not None:
+            queryset = queryset.filter(keyset_filter(fields, values, after=not backwards))
+        if backwards:
+            queryset = queryset.reverse()
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if backwards:
+            rows.reverse()
+
+        def cursor_for(obj):
+            return encode_cursor([getattr(obj, name) for name in fields])
+
+        if backwards:
+            next_cursor = cursor_for(rows[-1]) if rows else None
+            previous_cursor = cursor_for(rows[0]) if has_more else None
+        else:
+            next_cursor = cursor_for(rows[-1]) if has_more else None
+            previous_cursor = cursor_for(rows[0]) if values is not None and rows else None
+
+        page = KeysetPage(rows, next_cursor, previous_cursor, approx)
+        return (None, page, rows, page.has_other_pages())
+
+
 # Export Mixin
 class ExportMixin(View):
     model = None
@@ -30,6 +95,10 @@ class ExportMixin(View):
 
     # --- PDF Export ---
     def render_to_pdf(self, obj, fields, extra_sections=None):
+        # Imported here so loading the views does not pull in reportlab
+        from reportlab.lib.pagesizes import A4
+        from reportlab.pdfgen import canvas
+
         buffer = io.BytesIO()
         p = canvas.Canvas(buffer, pagesize=A4)
         width, height = A4
@@ -77,6 +146,8 @@ class ExportMixin(View):
 
     # --- Excel Export ---
     def render_to_excel(self, obj, sheets):
+        from openpyxl import Workbook
+
         wb = Workbook()
         for idx, (title, rows) in enumerate(sheets):
             ws = wb.active if idx == 0 else wb.create_sheet(title)
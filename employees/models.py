@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.contrib.auth.models import AbstractUser, Group
 from django.utils.translation import gettext_lazy as _
 
@@ -24,6 +26,20 @@ class User(AbstractUser):
     def __str__(self):
         return self.username
 
+    @cached_property
+    def group_names(self):
+        """
+        Names of the user's groups, loaded once per instance, i.e. once per
+        request for request.user. Cleared by the groups m2m_changed signal.
+        """
+        if "groups" in getattr(self, "_prefetched_objects_cache", {}):
+            return frozenset(group.name for group in self.groups.all())
+        return frozenset(self.groups.values_list("name", flat=True))
+
+    def has_role(self, *names):
+        """True if the user belongs to any of the named groups."""
+        return not self.group_names.isdisjoint(names)
+
 
 class Employee(models.Model):
     """Employee profile linked to User."""
@@ -45,7 +61,87 @@ class Employee(models.Model):
     class Meta:
         verbose_name = _("Employee")
         verbose_name_plural = _("Employees")
+        indexes = [
+            models.Index(fields=["full_name_en", "id"], name="employee_name_idx"),
+            models.Index(fields=["department", "full_name_en", "id"], name="employee_department_idx"),
+        ]
 
     def __str__(self):
         return self.full_name_en or self.user.username
 
+
+
+class CountedStatusMixin:
+    """
+    For models whose status is counted in StatusCounter: save() runs in a
+    transaction, so the signal handlers that lock the stored status (pre_save)
+    and move the counts (post_save) commit together with the row.
+    """
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get("using") or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class StatusCounter(models.Model):
+    """Denormalized row count per (scope, status), kept in sync by signals."""
+    scope = models.CharField(max_length=50, verbose_name=_("Scope"))
+    status = models.CharField(max_length=50, verbose_name=_("Status"))
+    count = models.IntegerField(default=0, verbose_name=_("Count"))
+
+    class Meta:
+        verbose_name = _("Status Counter")
+        verbose_name_plural = _("Status Counters")
+        unique_together = ("scope", "status")
+        default_permissions = []
+
+    def __str__(self):
+        return f"{self.scope}.{self.status} = {self.count}"
+
+
+class OutgoingEmail(models.Model):
+    """Email outbox: messages are queued here and delivered by the send_outbox command."""
+
+    class State(models.TextChoices):
+        PENDING = "pending", _("Pending")
+        SENT = "sent", _("Sent")
+        FAILED = "failed", _("Failed")
+
+    subject = models.CharField(max_length=255, verbose_name=_("Subject"))
+    body = models.TextField(blank=True, verbose_name=_("Body"))
+    html_body = models.TextField(blank=True, verbose_name=_("HTML Body"))
+    from_email = models.CharField(max_length=255, blank=True, verbose_name=_("From"))
+    to = models.JSONField(default=list, verbose_name=_("To"))
+    state = models.CharField(max_length=10, choices=State.choices, default=State.PENDING, verbose_name=_("State"))
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_("Attempts"))
+    last_error = models.TextField(blank=True, verbose_name=_("Last Error"))
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name=_("Next Attempt At"))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_("Created At"))
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Sent At"))
+
+    class Meta:
+        verbose_name = _("Outgoing Email")
+        verbose_name_plural = _("Outgoing Emails")
+        ordering = ["created_at"]
+        indexes = [models.Index(fields=["state", "next_attempt_at"])]
+        default_permissions = []
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.state})"
+
+
+class ImportCheckpoint(models.Model):
+    """Rows of a streamed employee import already committed, used to resume after a failure."""
+    source = models.CharField(max_length=500, unique=True, verbose_name=_("Source File"))
+    fingerprint = models.CharField(max_length=100, verbose_name=_("Fingerprint"))
+    rows_done = models.PositiveIntegerField(default=0, verbose_name=_("Rows Done"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
+
+    class Meta:
+        verbose_name = _("Import Checkpoint")
+        verbose_name_plural = _("Import Checkpoints")
+        default_permissions = []
+
+    def __str__(self):
+        return f"{self.source} ({self.rows_done} rows)"
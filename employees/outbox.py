@@ -0,0 +1,158 @@
+import logging
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed batch is hidden from other workers, on top of the time
+# its rate limit needs; a crashed worker's messages are retried after it
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def enqueue_email(subject, to, body="", html_body="", from_email=None):
+    """Queue a message in the outbox. Call it inside the transaction that creates the data it refers to."""
+    if isinstance(to, str):
+        to = [to]
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or "",
+        to=list(to),
+    )
+
+
+def _from_message(message):
+    html_body = ""
+    for content, mimetype in getattr(message, "alternatives", []):
+        if mimetype == "text/html":
+            html_body = content
+    return OutgoingEmail(
+        subject=message.subject,
+        body=message.body,
+        html_body=html_body,
+        from_email=message.from_email or "",
+        to=list(message.to),
+    )
+
+
+def enqueue_message(message):
+    """Queue an already built EmailMessage / EmailMultiAlternatives."""
+    email = _from_message(message)
+    email.save()
+    return email
+
+
+def enqueue_messages(messages):
+    """Queue many built messages with a single bulk insert."""
+    return OutgoingEmail.objects.bulk_create([_from_message(message) for message in messages])
+
+
+def build_message(email, connection=None):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or None,
+        to=email.to,
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def retry_delay(attempts):
+    """Exponential backoff: 1, 2, 4 ... minutes, capped at one hour."""
+    return timedelta(minutes=min(2 ** (attempts - 1), 60))
+
+
+def claim(batch_size=100, lease=CLAIM_TIMEOUT):
+    """
+    Take the next ``batch_size`` due messages for this worker: rows another
+    worker is claiming are skipped, and the claimed ones are not due again
+    until ``lease`` has passed, so concurrent send_outbox processes never
+    deliver the same message twice.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutgoingEmail.objects
+            .select_for_update(skip_locked=True)
+            .filter(state=OutgoingEmail.State.PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(next_attempt_at=now + lease)
+    return batch
+
+
+def send_pending(batch_size=100, max_attempts=5, rate=None):
+    """
+    Deliver one batch of due messages over a single reused connection.
+    ``rate`` caps the number of messages per second. Returns (sent, failed).
+    """
+    lease = CLAIM_TIMEOUT + timedelta(seconds=batch_size / rate if rate else 0)
+    batch = claim(batch_size, lease)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    interval = 1.0 / rate if rate else 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        # Server unreachable: count it as a failed attempt for the whole batch
+        logger.warning("Outbox connection failed", exc_info=e)
+        for email in batch:
+            _record_failure(email, e, max_attempts)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            started = time.monotonic()
+            try:
+                build_message(email, connection).send()
+            except Exception as e:
+                logger.warning("Outbox email %s failed (attempt %s)", email.pk, email.attempts + 1, exc_info=e)
+                _record_failure(email, e, max_attempts)
+                failed += 1
+            else:
+                email.attempts += 1
+                email.state = OutgoingEmail.State.SENT
+                email.sent_at = timezone.now()
+                email.last_error = ""
+                _clear_content(email)
+                email.save(update_fields=["attempts", "state", "sent_at", "last_error", "body", "html_body"])
+                sent += 1
+
+            if interval:
+                elapsed = time.monotonic() - started
+                if elapsed < interval:
+                    time.sleep(interval - elapsed)
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def _clear_content(email):
+    # Bodies may carry credentials or reset links: keep them only while the message can still be sent
+    email.body = ""
+    email.html_body = ""
+
+
+def _record_failure(email, error, max_attempts):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= max_attempts:
+        email.state = OutgoingEmail.State.FAILED
+        _clear_content(email)
+    else:
+        email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+    email.save(update_fields=["attempts", "state", "last_error", "next_attempt_at", "body", "html_body"])
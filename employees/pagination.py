@@ -0,0 +1,87 @@
+import json
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(values):
+    return urlsafe_base64_encode(json.dumps(values, default=str).encode())
+
+
+def decode_cursor(cursor, model, fields):
+    """Return the typed keyset values stored in ``cursor``, or None if it is invalid."""
+    try:
+        raw = json.loads(urlsafe_base64_decode(cursor))
+        if len(raw) != len(fields):
+            return None
+        return [model._meta.get_field(name).to_python(value) for name, value in zip(fields, raw)]
+    except Exception:
+        return None
+
+
+def keyset_filter(fields, values, after=True):
+    """
+    Rows strictly after (or before) ``values`` in descending ``fields`` order,
+    e.g. (created_at < v) OR (created_at = v AND id < id_v).
+    """
+    lookup = "lt" if after else "gt"
+    condition = Q()
+    for i, (name, value) in enumerate(zip(fields, values)):
+        clause = Q(**{f"{name}__{lookup}": value})
+        for prev_name, prev_value in zip(fields[:i], values[:i]):
+            clause &= Q(**{prev_name: prev_value})
+        condition |= clause
+    return condition
+
+
+def approximate_count(queryset):
+    """
+    Planner row estimate for an unfiltered queryset (PostgreSQL reltuples,
+    SQLite sqlite_stat1 after ANALYZE). Returns None when no estimate exists.
+    """
+    if queryset.query.where:
+        return None
+    table = queryset.model._meta.db_table
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == "postgresql":
+                cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+            elif connection.vendor == "sqlite":
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+            else:
+                return None
+            row = cursor.fetchone()
+        except Exception:
+            return None
+    if not row or row[0] is None:
+        return None
+    count = int(str(row[0]).split()[0])
+    return count if count >= 0 else None
+
+
+class KeysetPage:
+    """Page of a cursor-paginated list, exposing the bits of Page the templates use."""
+    is_keyset = True
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, approximate_count=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_count = approximate_count
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
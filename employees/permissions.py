@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.cache import cache
+
+
+VERSION_CACHE_KEY = "permissions:version"
+
+
+def get_version():
+    return cache.get_or_set(VERSION_CACHE_KEY, 1, None)
+
+
+def bump_version():
+    """Invalidate every cached permission set (any user, group or permission change)."""
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+
+
+def load_permissions(user):
+    """
+    Prime ``user`` with its permission set from the cache, so has_perm/has_perms
+    (views and the ``perms`` template variable) run without queries. The set is
+    keyed by user and the permissions version stamp, and stored for
+    PERMISSION_CACHE_TIMEOUT seconds (0 disables the cache).
+    """
+    timeout = getattr(settings, "PERMISSION_CACHE_TIMEOUT", 0)
+    if not timeout or not user.is_authenticated or hasattr(user, "_perm_cache"):
+        return
+    key = f"permissions:{get_version()}:{user.pk}"
+    perms = cache.get(key)
+    if perms is None:
+        cache.set(key, user.get_all_permissions(), timeout)
+    else:
+        # The attribute ModelBackend (and allauth's subclass) memoizes into
+        user._perm_cache = perms
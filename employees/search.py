@@ -0,0 +1,334 @@
+import re
+
+from django.db import connections, transaction
+from django.db.models import F, Q
+from django.db.models.expressions import RawSQL
+from django.db.models.lookups import In
+
+
+REGISTRY = {}
+
+# Arabic: drop tashkeel/tatweel and fold the letter variants users type interchangeably
+ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u0640]")
+ARABIC_FOLDING = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+})
+TOKEN = re.compile(r"\w+")
+
+
+def normalize_text(value):
+    """Normalize Arabic and English text the same way for documents and queries."""
+    if not value:
+        return ""
+    value = ARABIC_DIACRITICS.sub("", str(value))
+    return value.translate(ARABIC_FOLDING).casefold()
+
+
+def query_tokens(query):
+    return TOKEN.findall(normalize_text(query))
+
+
+def register(index):
+    REGISTRY[index.name] = index
+    return index
+
+
+class SearchIndex:
+    """
+    Full-text index kept in a side table, one row per object (row id = pk):
+    a SQLite FTS5 virtual table, or a tsvector column with a GIN index on
+    PostgreSQL. Subclasses set ``model``, ``table`` and weighted ``columns``
+    and may override ``document()``.
+    """
+    name = None
+    model = None
+    table = None
+    # (column, weight): bm25 weight on SQLite, mapped to A-D on PostgreSQL
+    columns = ()
+    tokenize = "unicode61 remove_diacritics 2"
+    # Prefix-match every query term ("lap" finds "laptop")
+    prefix = True
+    # Shorter terms cannot be served by the index (trigram needs 3 characters)
+    min_token_length = 1
+    # Order matches by relevance; unranked indexes keep the queryset's ordering
+    ranked = True
+    # Unranked: above this many matches, filter with a subquery instead of a pk list
+    candidate_limit = 1000
+    # Columns free-text queries look in (SQLite); None searches every column
+    search_columns = None
+
+    def get_model(self):
+        return self.model
+
+    def column_names(self):
+        return [column for column, _weight in self.columns]
+
+    def pg_weights(self):
+        ordered = sorted({weight for _column, weight in self.columns}, reverse=True)
+        letters = {weight: "ABCD"[min(i, 3)] for i, weight in enumerate(ordered)}
+        return [letters[weight] for _column, weight in self.columns]
+
+    def supports(self, connection):
+        return connection.vendor in ("sqlite", "postgresql")
+
+    def document(self, instance):
+        """Return the text to index for each column."""
+        return [getattr(instance, column) for column in self.column_names()]
+
+    def values(self, model=None, pks=None, using="default"):
+        """Row-wise (pk, *column texts) for (re)indexing, without loading model instances."""
+        model = model or self.get_model()
+        rows = model._default_manager.using(using).order_by("pk")
+        if pks is not None:
+            rows = rows.filter(pk__in=pks)
+        return rows.values_list("pk", *self.column_names()).iterator(chunk_size=2000)
+
+    # -------------------------------------------------
+    def create(self, connection):
+        if not self.supports(connection):
+            return
+        with connection.cursor() as cursor:
+            if connection.vendor == "sqlite":
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} "
+                    f"USING fts5({', '.join(self.column_names())}, tokenize='{self.tokenize}')"
+                )
+            else:
+                cursor.execute(
+                    f"CREATE TABLE IF NOT EXISTS {self.table} (id bigint PRIMARY KEY, document tsvector NOT NULL)"
+                )
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {self.table}_document ON {self.table} USING GIN (document)"
+                )
+
+    def drop(self, connection):
+        if not self.supports(connection):
+            return
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def _write(self, cursor, vendor, rows):
+        rows = [(pk, *[normalize_text(text) for text in texts]) for pk, *texts in rows]
+        if not rows:
+            return
+        if vendor == "sqlite":
+            cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(row[0],) for row in rows])
+            placeholders = ", ".join(["%s"] * (len(self.columns) + 1))
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, {', '.join(self.column_names())}) VALUES ({placeholders})",
+                rows,
+            )
+        else:
+            vector = " || ".join(
+                f"setweight(to_tsvector('simple', %s), '{letter}')" for letter in self.pg_weights()
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (id, document) VALUES (%s, {vector}) "
+                f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def update(self, instance, using="default"):
+        connection = connections[using]
+        if not self.supports(connection):
+            return
+        with connection.cursor() as cursor:
+            self._write(cursor, connection.vendor, [(instance.pk, *self.document(instance))])
+
+    def delete(self, pk, using="default"):
+        connection = connections[using]
+        if not self.supports(connection):
+            return
+        key = "rowid" if connection.vendor == "sqlite" else "id"
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table} WHERE {key} = %s", [pk])
+
+    def refresh(self, pks, using="default"):
+        """Re-index ``pks`` from the source table; pks that no longer exist are dropped."""
+        connection = connections[using]
+        if not self.supports(connection):
+            return
+        pks = set(pks)
+        rows = list(self.values(pks=pks, using=using))
+        key = "rowid" if connection.vendor == "sqlite" else "id"
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE {key} = %s",
+                [(pk,) for pk in pks - {row[0] for row in rows}],
+            )
+            self._write(cursor, connection.vendor, rows)
+
+    def rebuild(self, using="default", model=None, batch_size=2000):
+        """Recreate the index from the source table; returns the number of rows indexed."""
+        connection = connections[using]
+        if not self.supports(connection):
+            return 0
+        self.drop(connection)
+        self.create(connection)
+        total = 0
+        batch = []
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for row in self.values(model, using=using):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    self._write(cursor, connection.vendor, batch)
+                    total += len(batch)
+                    batch = []
+            self._write(cursor, connection.vendor, batch)
+            total += len(batch)
+        return total
+
+    # -------------------------------------------------
+    def split_query(self, query, connection):
+        """Return (terms the index can answer, terms shorter than min_token_length)."""
+        if connection.vendor == "sqlite" and self.tokenize.startswith("trigram"):
+            # Trigram phrases match anywhere in the text, punctuation included ("SN-00")
+            tokens = normalize_text(query).split()
+        else:
+            tokens = query_tokens(query)
+        return (
+            [token for token in tokens if len(token) >= self.min_token_length],
+            [token for token in tokens if len(token) < self.min_token_length],
+        )
+
+    def match_expression(self, terms, connection, columns=None):
+        """Full-text query matching every term: FTS5 MATCH syntax or a to_tsquery() string."""
+        if connection.vendor == "sqlite":
+            star = "*" if self.prefix and not self.tokenize.startswith("trigram") else ""
+            expression = " ".join('"{}"{}'.format(term.replace('"', '""'), star) for term in terms)
+            columns = columns or self.search_columns
+            if columns:
+                expression = f"{{{' '.join(columns)}}} : ({expression})"
+            return expression
+        return " & ".join(f"{term}{':*' if self.prefix else ''}" for term in terms)
+
+    def match(self, terms, connection, columns=None):
+        """SQL selecting the pks of the rows matching every term, and its params."""
+        return self.match_query(self.match_expression(terms, connection, columns), connection)
+
+    def match_query(self, expression, connection):
+        """SQL selecting the pks of the rows matching a full-text ``expression``, and its params."""
+        if connection.vendor == "sqlite":
+            return f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s", [expression]
+        return f"SELECT id FROM {self.table} WHERE document @@ to_tsquery('simple', %s)", [expression]
+
+    def candidates(self, terms, connection, columns=None):
+        """Subquery used by unranked filtering; subclasses may widen it."""
+        return self.match(terms, connection, columns)
+
+    def filter_candidates(self, queryset, terms, connection, columns=None):
+        return queryset.filter(self.candidate_condition(terms, connection, columns))
+
+    def candidate_condition(self, terms, connection, columns=None):
+        """Q restricting a queryset to the candidates for ``terms``; subclasses may widen it."""
+        return self.subquery_condition(*self.candidates(terms, connection, columns), connection)
+
+    def filter_subquery(self, queryset, sql, params, connection):
+        return queryset.filter(self.subquery_condition(sql, params, connection))
+
+    def subquery_condition(self, sql, params, connection):
+        """
+        Q restricting to the pks selected by ``sql``. Few matches: filter on
+        the fetched pks, so the database reads just those rows. Many matches:
+        keep the predicate as a subquery the planner cannot drive
+        (``pk + 0``), so it walks the list in its indexed order and stops
+        after one page instead of sorting every match.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} LIMIT %s", [*params, self.candidate_limit + 1])
+            pks = [row[0] for row in cursor.fetchall()]
+        if len(pks) <= self.candidate_limit:
+            return Q(pk__in=pks)
+        # "pk + 0" is not the indexed column, so the planner cannot start from the match
+        # list and must keep the list's own ordering index, stopping after one page
+        return Q(In(F("pk") + 0, RawSQL(sql, params)))
+
+    def fallback(self, queryset, query):
+        condition = Q()
+        for column in self.column_names():
+            condition |= Q(**{f"{column}__icontains": query})
+        return queryset.filter(condition)
+
+    def rank(self, queryset, terms):
+        """
+        Relevance of each row of ``queryset`` for ``terms``, lower first, as a
+        subquery on the pk, so rows are ranked after the queryset's own
+        filters and the page is cut by its LIMIT. SQLite can only score
+        inside a MATCH query: the scores are materialized once per statement
+        and looked up by rowid (a correlated MATCH would rescan per row).
+        """
+        connection = connections[queryset.db]
+        column = f'"{queryset.model._meta.db_table}"."{queryset.model._meta.pk.column}"'
+        expression = self.match_expression(terms, connection)
+        if connection.vendor == "sqlite":
+            weights = ", ".join(str(weight) for _column, weight in self.columns)
+            return RawSQL(
+                f"(WITH scores AS MATERIALIZED (SELECT rowid AS id, bm25({self.table}, {weights}) AS score "
+                f"FROM {self.table} WHERE {self.table} MATCH %s) SELECT score FROM scores WHERE id = {column})",
+                [expression],
+            )
+        return RawSQL(
+            f"(SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {self.table} WHERE id = {column})",
+            [expression],
+        )
+
+    def filter(self, queryset, query):
+        """
+        Restrict ``queryset`` to the matches of ``query``, ordered by rank or,
+        for unranked indexes, in the queryset's own ordering (terms too short
+        for the index are matched with icontains).
+        """
+        connection = connections[queryset.db]
+        if not self.supports(connection):
+            return self.fallback(queryset, query)
+        if not self.ranked:
+            terms, short = self.split_query(query, connection)
+            if terms:
+                queryset = self.filter_candidates(queryset, terms, connection)
+            for term in short:
+                queryset = self.fallback(queryset, term)
+            return queryset
+
+        terms, short = self.split_query(query, connection)
+        if short:
+            return self.fallback(queryset, query)
+        if not terms:
+            return queryset.none()
+        sql, params = self.match(terms, connection)
+        # The queryset's own ordering breaks ties, so pages stay stable
+        return queryset.filter(pk__in=RawSQL(sql, params)).order_by(
+            self.rank(queryset, terms), *queryset.query.order_by
+        )
+
+
+class EmployeeSearchIndex(SearchIndex):
+    """Prefix search over employee names, username and job number."""
+    name = "employees"
+    table = "employees_employee_fts"
+    columns = (
+        ("username", 5.0),
+        ("full_name_en", 5.0),
+        ("full_name_ar", 5.0),
+        ("job_number", 3.0),
+    )
+    # The list keeps its alphabetical order
+    ranked = False
+
+    def get_model(self):
+        from .models import Employee
+
+        return Employee
+
+    def document(self, employee):
+        return [employee.user.username, employee.full_name_en, employee.full_name_ar, employee.job_number]
+
+    def values(self, model=None, pks=None, using="default"):
+        model = model or self.get_model()
+        rows = model._default_manager.using(using).order_by("pk")
+        if pks is not None:
+            rows = rows.filter(pk__in=pks)
+        return rows.values_list("pk", "user__username", "full_name_en", "full_name_ar", "job_number").iterator(chunk_size=2000)
+
+
+employee_index = register(EmployeeSearchIndex())
@@ -0,0 +1,98 @@
+from django.contrib.auth.models import Group, Permission
+from django.db.models.signals import m2m_changed, pre_save, post_save, post_delete
+
+from . import counters, permissions
+from .models import Employee, User
+from .search import employee_index
+
+
+def remember_counted_status(sender, instance, raw=False, using="default", update_fields=None, **kwargs):
+    """
+    Read the stored status of tracked rows, locking the row until the save
+    commits (CountedStatusMixin), so post_save moves the count from the
+    status a concurrent save left rather than a stale one.
+    """
+    if raw:
+        return
+    scope = counters.tracked_scope(sender)
+    _model, field, to_status = counters.TRACKED[scope]
+    instance._counted_status = None
+    # New rows have nothing to read; saves that leave the status alone need no read
+    if instance.pk is None or (update_fields is not None and field not in update_fields):
+        return
+    previous = list(
+        sender._default_manager.using(using).select_for_update()
+        .filter(pk=instance.pk).values_list(field, flat=True)
+    )
+    if previous:
+        instance._counted_status = to_status(previous[0])
+
+
+def update_status_counters(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    scope = counters.tracked_scope(sender)
+    _model, field, _to_status = counters.TRACKED[scope]
+    if update_fields is not None and field not in update_fields:
+        return
+    old_status = getattr(instance, "_counted_status", None)
+    new_status = counters.status_of(scope, instance)
+    if old_status == new_status:
+        return
+    if old_status is not None:
+        counters.bump(scope, old_status, -1)
+    counters.bump(scope, new_status, 1)
+
+
+def release_status_counters(sender, instance, **kwargs):
+    scope = counters.tracked_scope(sender)
+    counters.bump(scope, counters.status_of(scope, instance), -1)
+
+
+for _model, _field, _to_status in counters.TRACKED.values():
+    pre_save.connect(remember_counted_status, sender=_model)
+    post_save.connect(update_status_counters, sender=_model)
+    post_delete.connect(release_status_counters, sender=_model)
+
+
+def index_employee(sender, instance, using="default", **kwargs):
+    employee_index.update(instance, using=using)
+
+
+def unindex_employee(sender, instance, using="default", **kwargs):
+    employee_index.delete(instance.pk, using=using)
+
+
+def index_user_employee(sender, instance, created=False, using="default", update_fields=None, **kwargs):
+    # Logins save last_login only; a new user has no profile yet
+    if created or (update_fields is not None and "username" not in update_fields):
+        return
+    employee_index.refresh(
+        Employee.objects.using(using).filter(user=instance).values_list("pk", flat=True),
+        using=using,
+    )
+
+
+post_save.connect(index_employee, sender=Employee)
+post_delete.connect(unindex_employee, sender=Employee)
+post_save.connect(index_user_employee, sender=User)
+
+
+def forget_group_names(sender, instance, action, **kwargs):
+    # Drop the per-request role cache when this user's groups change
+    if action in ("post_add", "post_remove", "post_clear") and isinstance(instance, User):
+        instance.__dict__.pop("group_names", None)
+
+
+m2m_changed.connect(forget_group_names, sender=User.groups.through)
+
+
+def invalidate_permissions(sender, action=None, **kwargs):
+    if action is None or action in ("post_add", "post_remove", "post_clear"):
+        permissions.bump_version()
+
+
+for _through in (User.user_permissions.through, User.groups.through, Group.permissions.through):
+    m2m_changed.connect(invalidate_permissions, sender=_through)
+post_delete.connect(invalidate_permissions, sender=Group)
+post_delete.connect(invalidate_permissions, sender=Permission)
@@ -1,3 +1,399 @@
-from django.test import TestCase
+import csv
+import os
+import re
+import tempfile
+import time
+from datetime import date, timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import Group, Permission
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import counters, dashboard, outbox
+from .hashing import PasswordHasherPool
+from .management.commands.import_employees import Command as ImportCommand
+from .models import Employee, ImportCheckpoint, OutgoingEmail, StatusCounter, User
+from devices.models import Custody, Device, Status
+
+
+class EmployeeListTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        cls.group = Group.objects.create(name="Employee")
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def add_employees(self, count, department="IT"):
+        for _ in range(count):
+            n = User.objects.count()
+            user = User.objects.create(username=f"user{n}", email=f"user{n}@example.com")
+            user.groups.add(self.group)
+            Employee.objects.create(
+                user=user, full_name_en=f"Employee {n}", full_name_ar=f"موظف {n}", department=department
+            )
+
+    def get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("employee_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_is_constant(self):
+        self.add_employees(2)
+        _response, baseline = self.get()
+        self.add_employees(8)
+        _response, queries = self.get()
+        self.assertEqual(queries, baseline)
+
+    def test_paginated(self):
+        self.add_employees(25)
+        response, _queries = self.get(page=2)
+        self.assertTrue(response.context["is_paginated"])
+        self.assertEqual(len(response.context["employees"]), 10)
+
+    def test_search_and_department(self):
+        self.add_employees(3, department="IT")
+        self.add_employees(2, department="HR")
+        response, _queries = self.get(department="HR")
+        self.assertEqual({e.department for e in response.context["employees"]}, {"HR"})
+        self.assertEqual(len(response.context["employees"]), 2)
+
+        employee = Employee.objects.filter(department="IT").first()
+        response, _queries = self.get(q=employee.user.username)
+        self.assertEqual(list(response.context["employees"]), [employee])
+
+
+class RoleCacheTests(TestCase):
+
+    def test_group_names_loaded_once_and_refreshed_on_change(self):
+        user = User.objects.create(username="tech", email="tech@example.com")
+        technician = Group.objects.create(name="Technician")
+        manager = Group.objects.create(name="Manager")
+        user.groups.add(technician)
+
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_role("Technician"))
+            self.assertTrue(user.has_role("Manager", "Technician"))
+            self.assertFalse(user.has_role("Manager"))
+
+        user.groups.add(manager)
+        self.assertTrue(user.has_role("Manager"))
+        user.groups.clear()
+        self.assertFalse(user.has_role("Technician"))
+
+
+@override_settings(PERMISSION_CACHE_TIMEOUT=60)
+class PermissionCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username="staff", email="staff@example.com")
+        self.group = Group.objects.create(name="Employee")
+        self.user.groups.add(self.group)
+        self.employee = Employee.objects.create(user=self.user, full_name_en="Staff", full_name_ar="موظف")
+        self.client.force_login(self.user)
+
+    def get(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("employee_list"))
+        permission_queries = [q for q in queries if "auth_permission" in q["sql"]]
+        return response.status_code, len(permission_queries)
+
+    def test_permissions_cached_across_requests_and_invalidated(self):
+        self.assertEqual(self.get()[0], 403)
+
+        self.group.permissions.add(Permission.objects.get(codename="view_employee"))
+        status, _queries = self.get()
+        self.assertEqual(status, 200)
+        self.assertEqual(self.get(), (200, 0))
+
+        self.user.groups.remove(self.group)
+        self.assertEqual(self.get()[0], 403)
+
+
+class OutboxTests(TestCase):
+
+    def queue(self, n=1):
+        return [
+            outbox.enqueue_email(f"Credentials {i}", f"user{i}@example.com", "Account created", "<p>Password: s3cret</p>")
+            for i in range(n)
+        ]
+
+    def test_send_pending_delivers_and_drops_the_content(self):
+        email, = self.queue()
+        self.assertEqual(outbox.send_pending(), (1, 0))
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["user0@example.com"])
+        self.assertEqual(mail.outbox[0].alternatives[0].content, "<p>Password: s3cret</p>")
+        email.refresh_from_db()
+        self.assertEqual(email.state, OutgoingEmail.State.SENT)
+        self.assertEqual((email.body, email.html_body), ("", ""))
+        self.assertEqual(outbox.send_pending(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failures_back_off_then_give_up(self):
+        email, = self.queue()
+        with (
+            mock.patch.object(outbox.EmailMultiAlternatives, "send", side_effect=SMTPException("down")),
+            self.assertLogs("employees.outbox", "WARNING"),
+        ):
+            self.assertEqual(outbox.send_pending(max_attempts=2), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.state, email.attempts), (OutgoingEmail.State.PENDING, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertTrue(email.html_body)
+
+            email.next_attempt_at = timezone.now()
+            email.save(update_fields=["next_attempt_at"])
+            self.assertEqual(outbox.send_pending(max_attempts=2), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.state, email.attempts, email.last_error), (OutgoingEmail.State.FAILED, 2, "down"))
+        self.assertEqual((email.body, email.html_body), ("", ""))
+        self.assertEqual(mail.outbox, [])
+
+    def test_claimed_messages_are_not_sent_by_another_worker(self):
+        first, second, third = self.queue(3)
+        claimed = outbox.claim(batch_size=2)
+        self.assertEqual(claimed, [first, second])
+
+        # A second worker only gets what is left
+        self.assertEqual(outbox.send_pending(), (1, 0))
+        self.assertEqual(mail.outbox[0].subject, third.subject)
+
+        # An abandoned claim is retried once its lease has run out
+        with mock.patch.object(outbox.timezone, "now", return_value=timezone.now() + outbox.CLAIM_TIMEOUT + timedelta(seconds=1)):
+            self.assertEqual(outbox.send_pending(), (2, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_admin_does_not_show_the_content(self):
+        email, = self.queue()
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "pass"))
+        response = self.client.get(reverse("admin:employees_outgoingemail_change", args=[email.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, "s3cret")
+
+
+class DashboardSummaryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def add_device(self, n):
+        Device.objects.create(name_en=f"Laptop {n}", name_ar=f"حاسوب {n}", serial_number=f"SN-{n}", brand="Dell")
+
+    def test_live_without_a_timeout(self):
+        self.add_device(1)
+        self.assertEqual(dashboard.get_summaries()["devices_summary"]["total"], 1)
+        self.add_device(2)
+        self.assertEqual(dashboard.get_summaries()["devices_summary"]["total"], 2)
+        self.assertIsNone(cache.get(dashboard.SNAPSHOT_CACHE_KEY))
+
+    @override_settings(DASHBOARD_CACHE_TIMEOUT=60)
+    def test_snapshot_is_served_from_cache_until_it_expires(self):
+        user = User.objects.create(username="staff", email="staff@example.com")
+        Employee.objects.create(user=user, full_name_en="Staff", full_name_ar="موظف", department="IT")
+        self.add_device(1)
+        summaries = dashboard.get_summaries()
+
+        self.add_device(2)
+        with self.assertNumQueries(0):
+            cached = dashboard.get_summaries()
+        self.assertEqual(cached["devices_summary"], summaries["devices_summary"])
+        self.assertEqual(cached["devices_summary"]["total"], 1)
+        self.assertEqual(list(cached["employees_summary"]["by_department"]), [{"department": "IT", "count": 1}])
+
+        with mock.patch("time.time", return_value=time.time() + 61):
+            self.assertEqual(dashboard.get_summaries()["devices_summary"]["total"], 2)
+
+
+class StatusCounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create(username="owner", email="owner@example.com")
+        cls.employee = Employee.objects.create(user=user, full_name_en="Owner", full_name_ar="مالك")
+
+    def add_device(self, n, status=Status.AVAILABLE):
+        return Device.objects.create(
+            name_en=f"Laptop {n}", name_ar=f"حاسوب {n}", serial_number=f"SN-{n}", brand="Dell", status=status
+        )
+
+    def test_signals_follow_creates_status_changes_and_deletes(self):
+        devices = [self.add_device(n) for n in range(3)]
+        self.assertEqual(counters.get_counts("devices"), {Status.AVAILABLE: 3})
+
+        devices[0].status = Status.IN_USE
+        devices[0].save()
+        devices[1].status = Status.MAINTENANCE
+        devices[1].save(update_fields=["status"])
+        devices[2].delete()
+        self.assertEqual(
+            counters.get_counts("devices"),
+            {Status.AVAILABLE: 0, Status.IN_USE: 1, Status.MAINTENANCE: 1},
+        )
+
+        custody = Custody.objects.create(employee=self.employee, custody_date=date(2024, 1, 1))
+        custody.return_date = date(2024, 2, 1)
+        custody.save()
+        self.assertEqual(
+            counters.get_counts("custodies"), {counters.CUSTODY_ACTIVE: 0, counters.CUSTODY_RETURNED: 1}
+        )
+        self.assertEqual(counters.verify(), {})
+
+    def test_saves_that_leave_the_status_alone_touch_no_counter(self):
+        device = self.add_device(1)
+        device.notes = "Spare"
+        with CaptureQueriesContext(connection) as queries:
+            device.save(update_fields=["notes"])
+        self.assertFalse([q for q in queries if "statuscounter" in q["sql"].lower()])
+        self.assertEqual(counters.get_counts("devices"), {Status.AVAILABLE: 1})
+
+    def test_verify_reports_drift_and_rebuild_repairs_it(self):
+        self.add_device(1)
+        self.add_device(2, status=Status.LOST)
+        StatusCounter.objects.filter(scope="devices", status=Status.LOST).update(count=5)
+        Device.objects.filter(serial_number="SN-1").update(status=Status.IN_USE)
+
+        self.assertEqual(
+            counters.verify(["devices"]),
+            {"devices": ({Status.AVAILABLE: 1, Status.LOST: 5}, {Status.IN_USE: 1, Status.LOST: 1})},
+        )
+        counters.rebuild(["devices"])
+        self.assertEqual(counters.get_counts("devices"), {Status.IN_USE: 1, Status.LOST: 1})
+        self.assertEqual(counters.verify(), {})
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class PasswordHasherPoolTests(SimpleTestCase):
+
+    def test_process_pool_hashes_match_in_process_checks(self):
+        passwords = [f"secret-{n}" for n in range(6)]
+        with PasswordHasherPool(workers=2) as hasher:
+            self.assertIsNotNone(hasher._executor)
+            hashes = hasher.hash_many(passwords)
+        self.assertEqual(len(hashes), len(passwords))
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+        self.assertFalse(check_password("secret-0", hashes[1]))
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class ImportEmployeesTests(TestCase):
+
+    HEADER = ["username", "email", "full_name_en", "full_name_ar", "birth_date", "department", "group_type"]
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "employees.csv")
+        User.objects.create(username="taken", email="Taken@example.com")
+
+    def write_csv(self, rows):
+        with open(self.path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(self.HEADER)
+            writer.writerows(rows)
+
+    def row(self, n, **values):
+        row = {
+            "username": f"new{n}", "email": f"new{n}@example.com", "full_name_en": f"New {n}",
+            "full_name_ar": f"جديد {n}", "birth_date": "1990-01-31", "department": "IT", "group_type": "Employee",
+        }
+        row.update(values)
+        return [row[field] for field in self.HEADER]
+
+    def run_import(self, *args):
+        out = StringIO()
+        call_command("import_employees", self.path, "--workers", "1", "--chunk-size", "2", *args, stdout=out)
+        return out.getvalue()
+
+    def test_bulk_skips_invalid_rows_and_existing_emails(self):
+        self.write_csv([
+            self.row(1),
+            self.row(2, birth_date="31/01/1990"),
+            self.row(3, email="TAKEN@example.com"),
+            self.row(4, full_name_en=""),
+            self.row(5),
+        ])
+        output = self.run_import("--bulk")
+
+        self.assertIn("line 3 (birth_date:", output)
+        self.assertIn("line 5 (full_name_en:", output)
+        self.assertIn("Skipped: TAKEN@example.com", output)
+        self.assertIn("Imported 2 of 5 rows", output)
+        employees = Employee.objects.order_by("full_name_en")
+        self.assertEqual([e.user.username for e in employees], ["new1", "new5"])
+        self.assertEqual(employees[0].birth_date, date(1990, 1, 31))
+        self.assertEqual(set(employees[0].user.group_names), {"Employee"})
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
+
+    def test_bulk_hashes_passwords_in_worker_processes(self):
+        self.write_csv([self.row(n) for n in range(1, 4)])
+        out = StringIO()
+        call_command("import_employees", self.path, "--bulk", "--workers", "2", stdout=out)
+        self.assertIn("Imported 3 of 3 rows", out.getvalue())
+
+        # The generated passwords only travel in the queued credentials emails
+        for email in OutgoingEmail.objects.all():
+            user = User.objects.get(email=email.to[0])
+            password = re.search(r"Password:.*?<[^>]*>\s*([^<\s]+)", email.html_body, re.S)
+            self.assertTrue(password and user.check_password(password.group(1)), email.html_body)
+
+    def test_stream_skips_invalid_rows_and_existing_emails(self):
+        self.write_csv([
+            self.row(1, email="taken@EXAMPLE.com"),
+            self.row(2, birth_date="1990-02-30"),
+            self.row(3, email="not-an-email"),
+            self.row(4, email="NEW4@example.com"),
+            self.row(5, email="new4@example.com"),
+        ])
+        output = self.run_import("--stream")
+
+        self.assertIn("line 3 (birth_date:", output)
+        self.assertIn("line 4 (email:", output)
+        self.assertIn("Skipped: taken@EXAMPLE.com", output)
+        self.assertIn("Skipped: new4@example.com", output)
+        self.assertIn("Imported 1 of 5 rows", output)
+        self.assertEqual(list(Employee.objects.values_list("user__email", flat=True)), ["NEW4@example.com"])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_stream_resumes_after_the_last_committed_chunk(self):
+        self.write_csv([self.row(n) for n in range(1, 6)])
+        bulk_create_chunk = ImportCommand.bulk_create_chunk
+        calls = []
+
+        def fail_second_chunk(command, *args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise DatabaseError("connection lost")
+            return bulk_create_chunk(command, *args, **kwargs)
+
+        with mock.patch.object(ImportCommand, "bulk_create_chunk", fail_second_chunk):
+            with self.assertRaises(DatabaseError):
+                self.run_import("--stream")
+        self.assertEqual(Employee.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get().rows_done, 2)
+
+        output = self.run_import("--stream")
+        self.assertIn("Resuming after row 2", output)
+        self.assertIn("Imported 3 of 5 rows", output)
+        self.assertEqual(
+            sorted(Employee.objects.values_list("user__username", flat=True)),
+            ["new1", "new2", "new3", "new4", "new5"],
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
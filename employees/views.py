@@ -11,14 +11,15 @@ from django.views.generic import TemplateView, ListView, DetailView, CreateView,
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.views import PasswordResetView
 from django.contrib import messages
-from django.db import models
 
+from .dashboard import get_summaries, tickets_summary
 from .forms import EmployeeCreationForm, EmployeeUpdateForm, ProfileUpdateForm
 from .mixins import PermissionMixin
+from .outbox import enqueue_email
+from .search import employee_index
 from .models import Employee, User
 from tickets.models import Ticket
-from devices.models import Device, Custody
-from inventories.models import InkInventory, OfficeSupply
+from devices.models import Custody
 
 import logging
 
@@ -43,52 +44,10 @@ class DashboardView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        user_groups = user.groups.values_list("name", flat=True)
-        is_manager_or_it = any(g in ["Manager", "IT Employee"] for g in user_groups)
+        is_manager_or_it = user.has_role("Manager", "IT Employee")
 
         if is_manager_or_it or user.is_superuser:
-            # Employees
-            context["employees_summary"] = {
-                "total": Employee.objects.count(),
-                "active": Employee.objects.filter(user__is_active=True).count(),
-                "inactive": Employee.objects.filter(user__is_active=False).count(),
-                "by_department": Employee.objects.values("department").annotate(count=models.Count("id")),
-                "by_job_title": Employee.objects.values("job_title").annotate(count=models.Count("id")),
-                "departments": Employee.objects.values("department").distinct().count(),
-                "job_titles": Employee.objects.values("job_title").distinct().count(),
-            }
-
-            # Tickets
-            context["tickets_summary"] = {
-                "total": Ticket.objects.count(),
-                "new": Ticket.objects.filter(status="NEW").count(),
-                "in_progress": Ticket.objects.filter(status="IN_PROGRESS").count(),
-                "resolved": Ticket.objects.filter(status="RESOLVED").count(),
-                "rejected": Ticket.objects.filter(status="REJECTED").count(),
-            }
-
-            # Devices
-            context["devices_summary"] = {
-                "total": Device.objects.count(),
-                "available": Device.objects.filter(status="available").count(),
-                "in_use": Device.objects.filter(status="in_use").count(),
-                "maintenance": Device.objects.filter(status="maintenance").count(),
-                "lost": Device.objects.filter(status="lost").count(),
-            }
-
-            # Custodies
-            context["custodies_summary"] = {
-                "total": Custody.objects.count(),
-                "active": Custody.objects.filter(return_date__isnull=True).count(),
-                "inactive": Custody.objects.filter(return_date__isnull=False).count(),
-                "my_custodies": 0,
-            }
-
-            # Inventories
-            context["inventories_summary"] = {
-                "inks": InkInventory.objects.count(),
-                "office_supplies": OfficeSupply.objects.count(),
-            }
+            context.update(get_summaries())
 
             context["recent_tickets"] = Ticket.objects.order_by("-created_at")[:5]
             context["recent_custodies"] = (
@@ -99,13 +58,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
             )
         else:
             # Restricted (Employee/Technician)
-            context["tickets_summary"] = {
-                "total": Ticket.objects.filter(employee=user).count(),
-                "new": Ticket.objects.filter(employee=user, status="NEW").count(),
-                "in_progress": Ticket.objects.filter(employee=user, status="IN_PROGRESS").count(),
-                "resolved": Ticket.objects.filter(employee=user, status="RESOLVED").count(),
-                "rejected": Ticket.objects.filter(employee=user, status="REJECTED").count(),
-            }
+            context["tickets_summary"] = tickets_summary(Ticket.objects.filter(employee=user))
             context["custodies_summary"] = {
                 "my_custodies": Custody.objects.filter(employee=user.employee_profile.pk).count() if hasattr(user, "employee") else 0,
             }
@@ -168,14 +121,23 @@ class CPasswordResetView(PasswordResetView):
         )
 
         try:
-            send_mail(
-                subject=subject,
-                message="", 
-                from_email=settings.DEFAULT_FROM_EMAIL, 
-                recipient_list=[email],
-                fail_silently=False,
-                html_message=html_content,
-            )
+            if settings.EMAIL_USE_OUTBOX:
+                # Delivered by the send_outbox worker
+                enqueue_email(
+                    subject=subject,
+                    to=[email],
+                    html_body=html_content,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                )
+            else:
+                send_mail(
+                    subject=subject,
+                    message="", 
+                    from_email=settings.DEFAULT_FROM_EMAIL, 
+                    recipient_list=[email],
+                    fail_silently=False,
+                    html_message=html_content,
+                )
 
         except Exception as e:
             logger.error("Password reset email failed", exc_info=e)
@@ -205,6 +167,37 @@ class EmployeeListView(PermissionMixin, ListView):
     template_name = "employees/list.html"
     context_object_name = "employees"
     permission_required = "employees.view_employee"
+    paginate_by = 10
+
+    def get_queryset(self):
+        queryset = (
+            super().get_queryset()
+            .select_related("user")
+            .prefetch_related("user__groups")
+            .order_by("full_name_en", "id")
+        )
+        search_query = self.request.GET.get("q", "").strip()
+        department = self.request.GET.get("department", "").strip()
+
+        if search_query:
+            queryset = employee_index.filter(queryset, search_query)
+
+        if department:
+            queryset = queryset.filter(department=department)
+
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["departments"] = (
+            Employee.objects.exclude(department__isnull=True).exclude(department="")
+            .order_by("department").values_list("department", flat=True).distinct()
+        )
+        context["selected_department"] = self.request.GET.get("department", "").strip()
+        context["search_query"] = self.request.GET.get("q", "").strip()
+        if context["is_paginated"]:
+            context["page_range"] = context["paginator"].get_elided_page_range(context["page_obj"].number)
+        return context
 
 
 class EmployeeDetailView(PermissionMixin, DetailView):
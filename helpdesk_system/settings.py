@@ -117,6 +117,10 @@ EMAIL_HOST_USER = config("EMAIL_HOST_USER")
 EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD")
 DEFAULT_FROM_EMAIL = config("DEFAULT_FROM_EMAIL")
 EMAIL_FAIL_SILENTLY = config("EMAIL_FAIL_SILENTLY", default=False, cast=bool)
+# Used by django.core.mail.backends.filebased.EmailBackend (local/tests)
+EMAIL_FILE_PATH = config("EMAIL_FILE_PATH", default=str(BASE_DIR / "sent_emails"))
+# Queue password reset emails in the outbox (delivered by `manage.py send_outbox`)
+EMAIL_USE_OUTBOX = config("EMAIL_USE_OUTBOX", default=False, cast=bool)
 
 # --------------------------------------------------------------------
 # Authentication
@@ -167,6 +171,48 @@ LOCALE_PATHS = [BASE_DIR / "locale"]
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# --------------------------------------------------------------------
+# Dashboard
+# --------------------------------------------------------------------
+# Seconds to keep the aggregated dashboard snapshot cached (0 = always live)
+DASHBOARD_CACHE_TIMEOUT = config("DASHBOARD_CACHE_TIMEOUT", default=0, cast=int)
+
+# --------------------------------------------------------------------
+# Permissions
+# --------------------------------------------------------------------
+# Seconds to cache each user's permission set (0 = load per request). Needs a
+# cache shared by all workers (e.g. Redis/Memcached) so invalidation reaches them.
+PERMISSION_CACHE_TIMEOUT = config("PERMISSION_CACHE_TIMEOUT", default=0, cast=int)
+
+# --------------------------------------------------------------------
+# Pagination
+# --------------------------------------------------------------------
+# Cursor (keyset) pagination for the ticket/device/custody lists instead of page numbers
+KEYSET_PAGINATION = config("KEYSET_PAGINATION", default=False, cast=bool)
+# Show the planner's row estimate in cursor mode instead of running COUNT(*)
+PAGINATION_APPROXIMATE_COUNT = config("PAGINATION_APPROXIMATE_COUNT", default=False, cast=bool)
+
+# --------------------------------------------------------------------
+# Inventory Forecasting
+# --------------------------------------------------------------------
+# Days of usage history behind each item's burn rate, and the half-life (days)
+# of the exponential smoothing applied to it
+STOCK_FORECAST_WINDOW = config("STOCK_FORECAST_WINDOW", default=90, cast=int)
+STOCK_FORECAST_HALF_LIFE = config("STOCK_FORECAST_HALF_LIFE", default=14, cast=float)
+# Reorder items that will run out within the lead time, enough to cover this many days
+REORDER_LEAD_DAYS = config("REORDER_LEAD_DAYS", default=14, cast=int)
+REORDER_COVER_DAYS = config("REORDER_COVER_DAYS", default=30, cast=int)
+
+# --------------------------------------------------------------------
+# Receipt Cache
+# --------------------------------------------------------------------
+# Rendered custody receipts (PDF/Excel), stored under a hash of their content
+RECEIPT_CACHE_DIR = config("RECEIPT_CACHE_DIR", default=str(MEDIA_ROOT / "receipts"))
+# Bytes of receipts to keep before the least recently used ones are deleted
+RECEIPT_CACHE_MAX_SIZE = config("RECEIPT_CACHE_MAX_SIZE", default=200 * 1024 * 1024, cast=int)
+# Processes rendering bulk receipt exports (0 = one per CPU)
+RECEIPT_EXPORT_WORKERS = config("RECEIPT_EXPORT_WORKERS", default=0, cast=int)
+
 # --------------------------------------------------------------------
 # Security Headers (Production)
 # --------------------------------------------------------------------
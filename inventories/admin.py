@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import InkCategory, InkInventory, OfficeSupplyCategory, OfficeSupply
+from .models import InkCategory, InkInventory, OfficeSupplyCategory, OfficeSupply, StockMovement, InkUsageDaily
 
 
 @admin.register(InkCategory)
@@ -12,6 +12,8 @@ class InkInventoryAdmin(admin.ModelAdmin):
     list_display = ("name_en", "name_ar", "category", "quantity", "created_at", "updated_at")
     list_filter = ("category",)
     search_fields = ("name_en", "name_ar")
+    # Stock changes go through the ledger (inventories.stock), not this form
+    readonly_fields = ("quantity",)
 
 
 @admin.register(OfficeSupplyCategory)
@@ -24,3 +26,30 @@ class OfficeSupplyAdmin(admin.ModelAdmin):
     list_display = ("name_en", "name_ar", "category", "quantity", "created_at", "updated_at")
     list_filter = ("category",)
     search_fields = ("name_en", "name_ar")
+    # Stock changes go through the ledger (inventories.stock), not this form
+    readonly_fields = ("quantity",)
+
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ("created_at", "ink", "supply", "kind", "change", "balance", "user")
+    list_filter = ("kind",)
+    list_select_related = ("ink", "supply", "user")
+
+    # Append-only
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InkUsageDaily)
+class InkUsageDailyAdmin(admin.ModelAdmin):
+    list_display = ("day", "ink", "category", "user", "quantity", "requests")
+    list_filter = ("category",)
+    date_hierarchy = "day"
+    list_select_related = ("ink", "category", "user")
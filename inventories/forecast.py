@@ -0,0 +1,115 @@
+import math
+from bisect import bisect_right
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import ExpressionWrapper, F, FloatField, Sum
+from django.utils import timezone
+
+from . import rollups
+from .models import InkInventory, InkUsageDaily, MovementKind, OfficeSupply, StockMovement
+
+
+def smoothing_weights(window, half_life):
+    """
+    Exponential weight of one day's usage by its age (0 = yesterday),
+    normalised over the window: the weighted sum is a smoothed daily rate
+    in which days without usage count as zero.
+    """
+    decay = 0.5 ** (1 / half_life)
+    weights = [decay ** age for age in range(window)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def daily_usage(start, end):
+    """
+    (kind, pk, day, quantity) for the items used between two dates, several
+    rows per day allowed: inks come grouped from the daily rollup, office
+    supplies as the ledger's individual issues. One query per kind, whatever
+    the number of items.
+    """
+    inks = (
+        InkUsageDaily.objects.filter(day__gte=start, day__lte=end)
+        .values_list("ink_id", "day").annotate(quantity=Sum("quantity")).order_by()
+    )
+    for pk, day, quantity in inks:
+        yield "ink", pk, day, quantity
+
+    # Each issue is placed between the local midnights of the window: grouping
+    # on TruncDate runs a Python function per row on SQLite and is far slower
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    # In UTC, like the fetched values, so comparisons skip the zone lookups
+    midnights = [timezone.make_aware(datetime.combine(day, time.min)).astimezone(dt_timezone.utc) for day in days]
+    until = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    supplies = (
+        StockMovement.objects.filter(
+            supply__isnull=False, kind=MovementKind.ISSUE, created_at__gte=midnights[0], created_at__lt=until,
+        )
+        .values_list("supply_id", "created_at", "change").order_by()
+    )
+    for pk, created_at, change in supplies.iterator(chunk_size=5000):
+        yield "supply", pk, days[bisect_right(midnights, created_at) - 1], -change
+
+
+def burn_rates(today=None, window=None, half_life=None):
+    """Smoothed units used per day for every item with usage in the window: {(kind, pk): rate}."""
+    window = window or settings.STOCK_FORECAST_WINDOW
+    weights = smoothing_weights(window, half_life or settings.STOCK_FORECAST_HALF_LIFE)
+    # Today is not over yet; the window ends yesterday
+    end = (today or timezone.localdate()) - timedelta(days=1)
+    rates = {}
+    for kind, pk, day, quantity in daily_usage(end - timedelta(days=window - 1), end):
+        rates[kind, pk] = rates.get((kind, pk), 0.0) + weights[(end - day).days] * quantity
+    return rates
+
+
+def recompute(today=None):
+    """Roll up pending ink requests, then store every item's burn rate; returns the number of items updated."""
+    rollups.rollup()
+    rates = burn_rates(today)
+    updated = 0
+    with transaction.atomic():
+        for kind, model in (("ink", InkInventory), ("supply", OfficeSupply)):
+            changed = []
+            for item in model.objects.only("pk", "burn_rate"):
+                rate = round(rates.get((kind, item.pk), 0.0), 4)
+                if item.burn_rate != rate:
+                    item.burn_rate = rate
+                    changed.append(item)
+            # bulk_update leaves updated_at alone: a new forecast is not an edit
+            model.objects.bulk_update(changed, ["burn_rate"], batch_size=500)
+            updated += len(changed)
+    return updated
+
+
+def low_stock(model, lead_days):
+    """Items of ``model`` expected to run out within ``lead_days``, soonest first."""
+    return (
+        model.objects.select_related("category")
+        .filter(burn_rate__gt=0, quantity__lte=F("burn_rate") * lead_days)
+        .annotate(days_left=ExpressionWrapper(F("quantity") / F("burn_rate"), output_field=FloatField()))
+        .order_by("days_left")
+    )
+
+
+def reorder_list(lead_days=None, cover_days=None, limit=None):
+    """
+    Inks and office supplies due for reordering, soonest stockout first. Each
+    item gets ``kind``, ``days_left``, ``stockout_date`` and
+    ``reorder_quantity`` (enough to cover ``cover_days`` of use).
+    """
+    lead_days = lead_days or settings.REORDER_LEAD_DAYS
+    cover_days = cover_days or settings.REORDER_COVER_DAYS
+    today = timezone.localdate()
+    items = []
+    for kind, model in (("ink", InkInventory), ("supply", OfficeSupply)):
+        rows = low_stock(model, lead_days)
+        for item in rows[:limit] if limit else rows:
+            item.kind = kind
+            item.stockout_date = today + timedelta(days=math.floor(item.days_left))
+            item.reorder_quantity = max(math.ceil(item.burn_rate * cover_days) - item.quantity, 1)
+            items.append(item)
+    items.sort(key=lambda item: item.days_left)
+    return items[:limit] if limit else items
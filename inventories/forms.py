@@ -1,6 +1,12 @@
 from django import forms
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 from .models import InkCategory, InkInventory, InkRequest, OfficeSupplyCategory, OfficeSupply
 
+User = get_user_model()
+
 
 class InkCategoryForm(forms.ModelForm):
     class Meta:
@@ -8,7 +14,31 @@ class InkCategoryForm(forms.ModelForm):
         fields = ["name_ar", "name_en"]
 
 
-class InkInventoryForm(forms.ModelForm):
+class StockItemForm(forms.ModelForm):
+    """
+    Stocked item: the quantity is posted back along with the value the form
+    was rendered with, so an edit is booked as a change against what the
+    user saw rather than against whatever is on hand when it is saved.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["quantity"].show_hidden_initial = True
+
+    def quantity_change(self):
+        """Units added (negative: removed) relative to the quantity the form was rendered with."""
+        field = self.fields["quantity"]
+        shown = field.hidden_widget().value_from_datadict(self.data, self.files, self.add_initial_prefix("quantity"))
+        try:
+            shown = field.to_python(shown)
+        except ValidationError:
+            shown = None
+        if shown is None:
+            shown = self.initial["quantity"]
+        return self.cleaned_data["quantity"] - shown
+
+
+class InkInventoryForm(StockItemForm):
     class Meta:
         model = InkInventory
         fields = ["name_ar", "name_en", "category", "quantity"]
@@ -26,7 +56,68 @@ class OfficeSupplyCategoryForm(forms.ModelForm):
         fields = ["name_ar", "name_en"]
 
 
-class OfficeSupplyForm(forms.ModelForm):
+class OfficeSupplyForm(StockItemForm):
     class Meta:
         model = OfficeSupply
         fields = ["name_ar", "name_en", "category", "quantity"]
+
+
+# Bulk issue: one header form plus a formset of (item, quantity) lines
+class BulkIssueForm(forms.Form):
+    requested_by = forms.ModelChoiceField(queryset=User.objects.all(), required=False, label=_("Requested By"))
+    reason = forms.CharField(widget=forms.Textarea(attrs={"rows": 2}), required=False, label=_("Reason / Purpose"))
+
+
+class IssueLineForm(forms.Form):
+    # "ink:<pk>" or "supply:<pk>"
+    item = forms.ChoiceField(label=_("Item"))
+    quantity = forms.IntegerField(min_value=1, label=_("Quantity"))
+
+    def __init__(self, *args, item_choices=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields["item"].choices = item_choices
+
+    def clean_item(self):
+        kind, pk = self.cleaned_data["item"].split(":")
+        return kind, int(pk)
+
+
+class BaseIssueLineFormSet(forms.BaseFormSet):
+    """Loads the in-stock items once for the whole formset; blank rows are ignored."""
+
+    @cached_property
+    def item_choices(self):
+        inks = InkInventory.objects.filter(quantity__gt=0).order_by("name_en")
+        supplies = OfficeSupply.objects.filter(quantity__gt=0).order_by("name_en")
+        return [
+            ("", "---------"),
+            (_("Inks"), [(f"ink:{ink.pk}", str(ink)) for ink in inks]),
+            (_("Office Supplies"), [(f"supply:{supply.pk}", str(supply)) for supply in supplies]),
+        ]
+
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        kwargs["item_choices"] = self.item_choices
+        return kwargs
+
+    def clean(self):
+        if not any(self.errors) and not self.lines():
+            raise forms.ValidationError(_("Add at least one item."))
+
+    def lines(self):
+        """(kind, pk, quantity) for every filled-in row."""
+        return [
+            (*form.cleaned_data["item"], form.cleaned_data["quantity"])
+            for form in self.forms
+            if form.has_changed() and form.cleaned_data
+        ]
+
+    def add_shortages(self, shortages):
+        """Flag the rows InsufficientStock rejected, with the quantity on hand."""
+        for form in self.forms:
+            item = form.cleaned_data.get("item") if form.cleaned_data else None
+            if item in shortages:
+                form.add_error("quantity", _("Only %(available)d in stock.") % {"available": shortages[item]})
+
+
+IssueLineFormSet = forms.formset_factory(IssueLineForm, formset=BaseIssueLineFormSet, extra=5)
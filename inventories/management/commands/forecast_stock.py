@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from inventories import forecast
+
+
+class Command(BaseCommand):
+    help = "Recompute ink and office supply burn rates and report the items due for reordering (run nightly)"
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        updated = forecast.recompute()
+        self.stdout.write(self.style.SUCCESS(f"Updated the burn rate of {updated} item(s)."))
+
+        for item in forecast.reorder_list():
+            self.stdout.write(
+                f"{item.name_en}: {item.quantity} left, ~{item.days_left:.1f} day(s), reorder {item.reorder_quantity}"
+            )
+
+# python manage.py forecast_stock
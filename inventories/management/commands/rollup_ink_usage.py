@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventories import rollups
+
+
+class Command(BaseCommand):
+    help = "Fold new ink requests into the daily ink usage rollup (run it periodically, e.g. from cron)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Recompute the rollup from the whole request history.",
+        )
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Only compare the rollup with the ink requests, do not change it.",
+        )
+
+    # -------------------------------------------------
+    def handle(self, *args, **kwargs):
+        if kwargs["verify"]:
+            mismatches = rollups.verify()
+            for ink_id, (stored, actual) in sorted(mismatches.items()):
+                self.stdout.write(self.style.ERROR(f"ink {ink_id}: rolled up {stored} != actual {actual}"))
+            if mismatches:
+                raise CommandError("Ink usage rollup is out of date, run with --rebuild.")
+            self.stdout.write(self.style.SUCCESS("Ink usage rollup is consistent."))
+            return
+
+        folded = rollups.rebuild() if kwargs["rebuild"] else rollups.rollup()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {folded} ink request(s)."))
+
+# python manage.py rollup_ink_usage [--rebuild | --verify]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    """Start every item's ledger with its current quantity, so the ledger sums to it."""
+    StockMovement = apps.get_model("inventories", "StockMovement")
+    using = schema_editor.connection.alias
+    movements = []
+    for model_name, field in (("InkInventory", "ink"), ("OfficeSupply", "supply")):
+        model = apps.get_model("inventories", model_name)
+        for pk, quantity in model.objects.using(using).filter(quantity__gt=0).values_list("pk", "quantity"):
+            movements.append(StockMovement(
+                **{f"{field}_id": pk}, kind="receive", change=quantity, balance=quantity, note="Opening balance",
+            ))
+    StockMovement.objects.using(using).bulk_create(movements, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventories', '0002_inkrequest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('issue', 'Issue'), ('receive', 'Receive'), ('adjust', 'Adjust')], max_length=10, verbose_name='Kind')),
+                ('change', models.IntegerField(verbose_name='Change')),
+                ('balance', models.PositiveIntegerField(verbose_name='Balance')),
+                ('note', models.TextField(blank=True, verbose_name='Note')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('ink', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventories.inkinventory', verbose_name='Ink')),
+                ('ink_request', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movement', to='inventories.inkrequest', verbose_name='Ink Request')),
+                ('supply', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventories.officesupply', verbose_name='Office Supply')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Stock Movement',
+                'verbose_name_plural': 'Stock Movements',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['ink', 'created_at'], name='movement_ink_idx'), models.Index(fields=['supply', 'created_at'], name='movement_supply_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('ink__isnull', False), ('supply__isnull', True)), models.Q(('ink__isnull', True), ('supply__isnull', False)), _connector='OR'), name='stockmovement_one_item')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventories', '0003_stockmovement'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupMark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Name')),
+                ('last_id', models.BigIntegerField(default=0, verbose_name='Last ID')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Updated At')),
+            ],
+            options={
+                'verbose_name': 'Rollup Mark',
+                'verbose_name_plural': 'Rollup Marks',
+                'default_permissions': [],
+            },
+        ),
+        migrations.CreateModel(
+            name='InkUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Day')),
+                ('quantity', models.PositiveIntegerField(default=0, verbose_name='Quantity Used')),
+                ('requests', models.PositiveIntegerField(default=0, verbose_name='Requests')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='inventories.inkcategory', verbose_name='Category')),
+                ('ink', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='inventories.inkinventory', verbose_name='Ink')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Daily Ink Usage',
+                'verbose_name_plural': 'Daily Ink Usage',
+                'ordering': ['-day'],
+                'default_permissions': ['view'],
+                'indexes': [models.Index(fields=['day', 'ink'], name='inkusage_day_idx'), models.Index(fields=['ink', 'day'], name='inkusage_ink_idx')],
+            },
+        ),
+    ]
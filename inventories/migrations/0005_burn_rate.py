@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventories', '0004_ink_usage_rollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inkinventory',
+            name='burn_rate',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Daily Burn Rate'),
+        ),
+        migrations.AddField(
+            model_name='officesupply',
+            name='burn_rate',
+            field=models.FloatField(blank=True, editable=False, null=True, verbose_name='Daily Burn Rate'),
+        ),
+    ]
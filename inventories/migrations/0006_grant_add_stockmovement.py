@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.contrib.auth.management import create_permissions
+from django.db import migrations
+
+
+# Whoever may raise or handle ink requests also issues stock in bulk
+GRANTED_FROM = ("add_inkrequest", "change_inkrequest")
+
+
+def grant_add_stockmovement(apps, schema_editor):
+    # Permissions are normally created after migrate; the grant needs them now
+    app_config = apps.get_app_config("inventories")
+    app_config.models_module = True
+    create_permissions(app_config, apps=apps, verbosity=0, using=schema_editor.connection.alias)
+    app_config.models_module = None
+
+    Permission = apps.get_model("auth", "Permission")
+    Group = apps.get_model("auth", "Group")
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    permissions = Permission.objects.filter(content_type__app_label="inventories")
+    add_stockmovement = permissions.get(codename="add_stockmovement")
+    sources = permissions.filter(codename__in=GRANTED_FROM)
+
+    for group in Group.objects.filter(permissions__in=sources).distinct():
+        group.permissions.add(add_stockmovement)
+    for user in User.objects.filter(user_permissions__in=sources).distinct():
+        user.user_permissions.add(add_stockmovement)
+
+    from employees.permissions import bump_version
+    bump_version()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventories', '0005_burn_rate'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(grant_add_stockmovement, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,7 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
 from django.utils.translation import gettext_lazy as _
 
 User = get_user_model()
@@ -32,6 +32,8 @@ class InkInventory(models.Model):
         verbose_name=_("Category"),
     )
     quantity = models.PositiveIntegerField(default=0, verbose_name=_("Quantity"))
+    # Smoothed units used per day, recomputed nightly by inventories.forecast
+    burn_rate = models.FloatField(null=True, blank=True, editable=False, verbose_name=_("Daily Burn Rate"))
     created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Created At"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
 
@@ -62,12 +64,18 @@ class InkRequest(models.Model):
 
     def save(self, *args, **kwargs):
         """عند إنشاء طلب جديد يتم خصم الكمية مباشرة من المخزون"""
-        if not self.pk:  # فقط عند الإنشاء الجديد
-            if self.ink.quantity < self.quantity_used:
-                raise ValueError(_("Not enough ink in stock"))
-            self.ink.quantity -= self.quantity_used
-            self.ink.save()
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        from .stock import change_quantity, record
+
+        # Conditional UPDATE ... quantity >= n: concurrent requests cannot oversell
+        with transaction.atomic():
+            balance = change_quantity(self.ink, -self.quantity_used)
+            super().save(*args, **kwargs)
+            record(
+                self.ink, MovementKind.ISSUE, -self.quantity_used, balance,
+                user=self.requested_by, note=self.reason, ink_request=self,
+            )
 
 
 class OfficeSupplyCategory(models.Model):
@@ -88,6 +96,8 @@ class OfficeSupply(models.Model):
     name_en = models.CharField(max_length=100, verbose_name=_("Supply Name (English)"))
     category = models.ForeignKey(OfficeSupplyCategory, on_delete=models.CASCADE, related_name="supplies", verbose_name=_("Category"),)
     quantity = models.PositiveIntegerField(default=0, verbose_name=_("Quantity"))
+    # Smoothed units used per day, recomputed nightly by inventories.forecast
+    burn_rate = models.FloatField(null=True, blank=True, editable=False, verbose_name=_("Daily Burn Rate"))
     created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Created At"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
 
@@ -98,3 +108,85 @@ class OfficeSupply(models.Model):
 
     def __str__(self):
         return f"{self.name_en} / {self.name_ar} - {self.quantity}"
+
+
+class MovementKind(models.TextChoices):
+    ISSUE = "issue", _("Issue")
+    RECEIVE = "receive", _("Receive")
+    ADJUST = "adjust", _("Adjust")
+
+
+class StockMovement(models.Model):
+    """Append-only ledger of every change to an ink's or office supply's quantity."""
+    ink = models.ForeignKey(InkInventory, on_delete=models.CASCADE, null=True, blank=True, related_name="movements", verbose_name=_("Ink"))
+    supply = models.ForeignKey(OfficeSupply, on_delete=models.CASCADE, null=True, blank=True, related_name="movements", verbose_name=_("Office Supply"))
+    kind = models.CharField(max_length=10, choices=MovementKind.choices, verbose_name=_("Kind"))
+    # Signed: negative for issues
+    change = models.IntegerField(verbose_name=_("Change"))
+    # Quantity on hand right after this movement
+    balance = models.PositiveIntegerField(verbose_name=_("Balance"))
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("User"))
+    ink_request = models.OneToOneField(InkRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name="movement", verbose_name=_("Ink Request"))
+    note = models.TextField(blank=True, verbose_name=_("Note"))
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Created At"))
+
+    class Meta:
+        verbose_name = _("Stock Movement")
+        verbose_name_plural = _("Stock Movements")
+        ordering = ["-created_at", "-id"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(ink__isnull=False, supply__isnull=True) | models.Q(ink__isnull=True, supply__isnull=False),
+                name="stockmovement_one_item",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["ink", "created_at"], name="movement_ink_idx"),
+            models.Index(fields=["supply", "created_at"], name="movement_supply_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} {self.change:+d} ({self.get_kind_display()})"
+
+    @property
+    def item(self):
+        return self.ink or self.supply
+
+
+class InkUsageDaily(models.Model):
+    """InkRequest totals per day, ink and requester, maintained by inventories.rollups."""
+    day = models.DateField(verbose_name=_("Day"))
+    ink = models.ForeignKey(InkInventory, on_delete=models.CASCADE, related_name="daily_usage", verbose_name=_("Ink"))
+    # The ink's category when the requests were rolled up
+    category = models.ForeignKey(InkCategory, on_delete=models.CASCADE, related_name="daily_usage", verbose_name=_("Category"))
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name=_("User"))
+    quantity = models.PositiveIntegerField(default=0, verbose_name=_("Quantity Used"))
+    requests = models.PositiveIntegerField(default=0, verbose_name=_("Requests"))
+
+    class Meta:
+        verbose_name = _("Daily Ink Usage")
+        verbose_name_plural = _("Daily Ink Usage")
+        ordering = ["-day"]
+        default_permissions = ["view"]
+        indexes = [
+            models.Index(fields=["day", "ink"], name="inkusage_day_idx"),
+            models.Index(fields=["ink", "day"], name="inkusage_ink_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.ink_id}: {self.quantity}"
+
+
+class RollupMark(models.Model):
+    """High-water mark of an incremental rollup: the last source id folded in."""
+    name = models.CharField(max_length=50, unique=True, verbose_name=_("Name"))
+    last_id = models.BigIntegerField(default=0, verbose_name=_("Last ID"))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Updated At"))
+
+    class Meta:
+        verbose_name = _("Rollup Mark")
+        verbose_name_plural = _("Rollup Marks")
+        default_permissions = []
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
@@ -0,0 +1,144 @@
+from datetime import timedelta
+
+from django.db import connections, transaction
+from django.db.models import Count, Max, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import InkInventory, InkRequest, InkUsageDaily, RollupMark
+
+
+MARK = "ink_usage"
+# Ids are handed out at INSERT time, so a lower id can still be uncommitted
+# while a higher one is visible: requests younger than this wait for the next run
+SETTLE_DELAY = timedelta(minutes=1)
+
+
+def pending(last_id):
+    """InkRequests after ``last_id``, stopping before the first one that may not be committed yet."""
+    requests = InkRequest.objects.filter(pk__gt=last_id)
+    unsettled = requests.filter(created_at__gte=timezone.now() - SETTLE_DELAY).aggregate(first=Min("id"))["first"]
+    if unsettled is not None:
+        requests = requests.filter(pk__lt=unsettled)
+    return requests
+
+
+def aggregate(requests):
+    """Return ({(day, ink_id, user_id): [category_id, quantity, count]}, highest id seen)."""
+    # Summed in Python: an incremental batch is small, and a GROUP BY here
+    # lets SQLite walk the ink index over the whole history instead of the id range
+    totals = {}
+    last_id = None
+    rows = requests.order_by().values_list("pk", "created_at", "ink_id", "requested_by_id", "quantity_used")
+    for pk, created_at, ink_id, user_id, quantity in rows.iterator(chunk_size=2000):
+        total = totals.setdefault((timezone.localtime(created_at).date(), ink_id, user_id), [None, 0, 0])
+        total[1] += quantity
+        total[2] += 1
+        last_id = max(last_id or 0, pk)
+    categories = dict(
+        InkInventory.objects.filter(pk__in={ink_id for _day, ink_id, _user in totals}).values_list("pk", "category_id")
+    )
+    for (_day, ink_id, _user), total in totals.items():
+        total[0] = categories[ink_id]
+    return totals, last_id
+
+
+@transaction.atomic
+def rollup():
+    """
+    Fold the InkRequests added since the high-water mark into InkUsageDaily
+    and advance the mark; returns the number of requests folded in. Only the
+    new requests are read, so each run costs the same however long the
+    history is.
+    """
+    mark, _created = RollupMark.objects.select_for_update().get_or_create(name=MARK)
+    totals, last_id = aggregate(pending(mark.last_id))
+    if not totals:
+        return 0
+
+    days = [day for day, _ink, _user in totals]
+    existing = {}
+    for row in InkUsageDaily.objects.filter(day__gte=min(days), day__lte=max(days)):
+        existing.setdefault((row.day, row.ink_id, row.user_id), row)
+
+    changed, created = [], []
+    for (day, ink_id, user_id), (category_id, quantity, count) in totals.items():
+        row = existing.get((day, ink_id, user_id))
+        if row is None:
+            created.append(InkUsageDaily(
+                day=day, ink_id=ink_id, category_id=category_id, user_id=user_id, quantity=quantity, requests=count,
+            ))
+        else:
+            row.quantity += quantity
+            row.requests += count
+            changed.append(row)
+    InkUsageDaily.objects.bulk_update(changed, ["quantity", "requests"], batch_size=500)
+    InkUsageDaily.objects.bulk_create(created, batch_size=1000)
+
+    mark.last_id = last_id
+    mark.save(update_fields=["last_id", "updated_at"])
+    return sum(count for _category, _quantity, count in totals.values())
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Recompute the rollup from the whole request history with a single
+    INSERT ... SELECT (no rows pass through Python); returns the number of
+    requests rolled up.
+    """
+    InkUsageDaily.objects.all().delete()
+    requests = pending(0)
+    summary = requests.aggregate(last_id=Max("id"), count=Count("id"))
+    grouped = (
+        requests.annotate(day=TruncDate("created_at"))
+        .values("day", "ink_id", "requested_by_id")
+        .annotate(quantity=Sum("quantity_used"), count=Count("id"))
+        .order_by()
+    )
+
+    connection = connections[InkUsageDaily.objects.db]
+    quote = connection.ops.quote_name
+    sql, params = grouped.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(InkUsageDaily._meta.db_table)} "
+            f"(day, ink_id, user_id, category_id, quantity, requests) "
+            f"SELECT rollup.day, rollup.ink_id, rollup.requested_by_id, ink.category_id, "
+            f"rollup.quantity, rollup.{quote('count')} "
+            f"FROM ({sql}) rollup INNER JOIN {quote(InkInventory._meta.db_table)} ink ON ink.id = rollup.ink_id",
+            params,
+        )
+    RollupMark.objects.update_or_create(name=MARK, defaults={"last_id": summary["last_id"] or 0})
+    return summary["count"]
+
+
+def verify():
+    """Return {ink_id: (rolled up, actual)} for every ink whose total up to the mark has drifted."""
+    last_id = RollupMark.objects.filter(name=MARK).values_list("last_id", flat=True).first() or 0
+    actual = dict(
+        InkRequest.objects.filter(pk__lte=last_id).values("ink_id")
+        .annotate(total=Sum("quantity_used")).order_by().values_list("ink_id", "total")
+    )
+    stored = dict(
+        InkUsageDaily.objects.values("ink_id")
+        .annotate(total=Sum("quantity")).order_by().values_list("ink_id", "total")
+    )
+    return {
+        ink_id: (stored.get(ink_id, 0), actual.get(ink_id, 0))
+        for ink_id in stored.keys() | actual.keys()
+        if stored.get(ink_id, 0) != actual.get(ink_id, 0)
+    }
+
+
+def consumption(by="ink", start=None, end=None):
+    """
+    Quantity used and request count per ``by`` ("ink", "category", "user" or
+    "day") between two dates (inclusive), read from the rollup table.
+    """
+    rows = InkUsageDaily.objects.all()
+    if start:
+        rows = rows.filter(day__gte=start)
+    if end:
+        rows = rows.filter(day__lte=end)
+    return rows.values(by).annotate(quantity=Sum("quantity"), requests=Sum("requests")).order_by(by)
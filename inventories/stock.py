@@ -0,0 +1,179 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from .models import InkInventory, InkRequest, MovementKind, OfficeSupply, StockMovement
+
+# Item kinds, named after the StockMovement foreign keys
+STOCK_MODELS = {"ink": InkInventory, "supply": OfficeSupply}
+
+
+class InsufficientStock(ValueError):
+    def __init__(self, message, shortages=None):
+        super().__init__(message)
+        # (kind, pk) -> quantity on hand, for multi-line issues
+        self.shortages = shortages or {}
+
+
+def item_field(item):
+    """Name of the StockMovement foreign key pointing at ``item``."""
+    if isinstance(item, InkInventory):
+        return "ink"
+    if isinstance(item, OfficeSupply):
+        return "supply"
+    raise TypeError(f"{type(item).__name__} has no stock ledger")
+
+
+def change_quantity(item, change):
+    """
+    Add ``change`` (negative to take stock out) to ``item.quantity`` with a
+    single conditional UPDATE, so concurrent writers can neither lose an
+    update nor take the quantity below zero. Returns the new quantity, which
+    is also set on ``item``. Call inside a transaction.
+    """
+    rows = type(item)._default_manager.filter(pk=item.pk)
+    if change < 0:
+        rows = rows.filter(quantity__gte=-change)
+    if not rows.update(quantity=F("quantity") + change, updated_at=timezone.now()):
+        raise InsufficientStock(_("Not enough stock for %(item)s") % {"item": item.name_en})
+    # The UPDATE holds the row's write lock until commit, so this reads our own result
+    item.quantity = type(item)._default_manager.filter(pk=item.pk).values_list("quantity", flat=True).get()
+    return item.quantity
+
+
+def record(item, kind, change, balance, user=None, note="", **extra):
+    return StockMovement.objects.create(
+        **{item_field(item): item},
+        kind=kind,
+        change=change,
+        balance=balance,
+        user=user,
+        note=note or "",
+        **extra,
+    )
+
+
+@transaction.atomic
+def issue(item, quantity, user=None, note=""):
+    """Take ``quantity`` out of stock; raises InsufficientStock if there is not enough."""
+    balance = change_quantity(item, -quantity)
+    return record(item, MovementKind.ISSUE, -quantity, balance, user, note)
+
+
+@transaction.atomic
+def receive(item, quantity, user=None, note=""):
+    balance = change_quantity(item, quantity)
+    return record(item, MovementKind.RECEIVE, quantity, balance, user, note)
+
+
+@transaction.atomic
+def adjust(item, quantity, user=None, note=""):
+    """Set the quantity on hand after a stock count; returns None when nothing changed."""
+    current = (
+        type(item)._default_manager.select_for_update()
+        .filter(pk=item.pk).values_list("quantity", flat=True).get()
+    )
+    if current == quantity:
+        item.quantity = quantity
+        return None
+    balance = change_quantity(item, quantity - current)
+    return record(item, MovementKind.ADJUST, quantity - current, balance, user, note)
+
+
+@transaction.atomic
+def adjust_by(item, change, user=None, note=""):
+    """
+    Book a correction of ``change`` units on top of whatever is on hand now,
+    for edits made against a quantity read earlier; returns None for zero.
+    """
+    if not change:
+        return None
+    balance = change_quantity(item, change)
+    return record(item, MovementKind.ADJUST, change, balance, user, note)
+
+
+def _on_hand(wanted):
+    """(kind, pk) -> quantity on hand for the items of ``wanted``."""
+    on_hand = {}
+    for kind, quantities in wanted.items():
+        rows = STOCK_MODELS[kind]._default_manager.filter(pk__in=list(quantities))
+        for pk, quantity in rows.values_list("pk", "quantity"):
+            on_hand[kind, pk] = quantity
+    return on_hand
+
+
+@transaction.atomic
+def issue_many(lines, user=None, note=""):
+    """
+    Issue several items at once: ``lines`` are (kind, pk, quantity) with kind
+    "ink" or "supply"; repeated items are summed. Per kind, stock is taken
+    with one UPDATE whose WHERE clause requires enough stock on each row, so
+    a row whose stock ran out is simply not updated, and the balances are
+    read back afterwards; then every ledger row (and an InkRequest per ink)
+    is written with bulk_create. Nothing is issued unless every line can be
+    served; InsufficientStock.shortages names the lines that cannot.
+    """
+    wanted = defaultdict(lambda: defaultdict(int))
+    for kind, pk, quantity in lines:
+        if kind not in STOCK_MODELS or quantity <= 0:
+            raise ValueError(f"Invalid issue line: {kind} {pk} x {quantity}")
+        wanted[kind][pk] += quantity
+
+    now = timezone.now()
+    short = False
+    try:
+        with transaction.atomic():
+            for kind, quantities in wanted.items():
+                taken = Case(
+                    *[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+                    output_field=IntegerField(),
+                )
+                updated = STOCK_MODELS[kind]._default_manager.filter(
+                    pk__in=list(quantities), quantity__gte=taken,
+                ).update(quantity=F("quantity") - taken, updated_at=now)
+                if updated != len(quantities):
+                    short = True
+                    transaction.set_rollback(True)
+                    break
+    except IntegrityError:
+        # The quantity check constraint caught an oversell the WHERE clause let through
+        short = True
+    if short:
+        # Rolled back to before the UPDATEs: report what is actually on hand
+        on_hand = _on_hand(wanted)
+        shortages = {
+            (kind, pk): on_hand.get((kind, pk), 0)
+            for kind, quantities in wanted.items()
+            for pk, quantity in quantities.items()
+            if on_hand.get((kind, pk), 0) < quantity
+        }
+        raise InsufficientStock(
+            _("Not enough stock for %(count)d item(s)") % {"count": max(len(shortages), 1)}, shortages
+        ) from None
+    # Our UPDATEs hold the rows' write locks until commit, so these are our balances
+    balances = _on_hand(wanted)
+
+    ink_requests = InkRequest.objects.bulk_create([
+        InkRequest(ink_id=pk, requested_by=user, quantity_used=quantity, reason=note or None, created_at=now)
+        for pk, quantity in wanted.get("ink", {}).items()
+    ])
+    movements = [
+        StockMovement(
+            **{f"{kind}_id": pk},
+            kind=MovementKind.ISSUE,
+            change=-quantity,
+            balance=balances[kind, pk],
+            user=user,
+            note=note or "",
+            created_at=now,
+        )
+        for kind, quantities in wanted.items()
+        for pk, quantity in quantities.items()
+    ]
+    requests = {request.ink_id: request for request in ink_requests}
+    for movement in movements:
+        movement.ink_request = requests.get(movement.ink_id)
+    return StockMovement.objects.bulk_create(movements)
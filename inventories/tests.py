@@ -1,3 +1,352 @@
-from django.test import TestCase
+import datetime
+import importlib
+import json
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import Group, Permission
+from django.db import IntegrityError, OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from employees.models import User
+from . import forecast, rollups, stock
+from .models import (
+    InkCategory, InkInventory, InkRequest, InkUsageDaily, MovementKind, OfficeSupply, OfficeSupplyCategory, StockMovement,
+)
+
+
+def make_ink(quantity):
+    category, _ = InkCategory.objects.get_or_create(name_en="Toner", name_ar="حبر")
+    ink = InkInventory.objects.create(name_en="HP 85A", name_ar="اتش بي", category=category)
+    if quantity:
+        stock.receive(ink, quantity)
+    return ink
+
+
+class StockLedgerTests(TestCase):
+    def test_ink_request_issues_stock(self):
+        ink = make_ink(10)
+        request = InkRequest.objects.create(ink=ink, quantity_used=3, reason="Printer 2")
+
+        ink.refresh_from_db()
+        self.assertEqual(ink.quantity, 7)
+        self.assertEqual(request.movement.kind, MovementKind.ISSUE)
+        self.assertEqual((request.movement.change, request.movement.balance), (-3, 7))
+
+    def test_insufficient_stock_writes_nothing(self):
+        ink = make_ink(2)
+        with self.assertRaises(stock.InsufficientStock):
+            InkRequest.objects.create(ink=ink, quantity_used=3)
+
+        ink.refresh_from_db()
+        self.assertEqual(ink.quantity, 2)
+        self.assertFalse(InkRequest.objects.exists())
+        self.assertEqual(ink.movements.count(), 1)
+
+    def test_supply_adjust(self):
+        category = OfficeSupplyCategory.objects.create(name_en="Paper", name_ar="ورق")
+        supply = OfficeSupply.objects.create(name_en="A4", name_ar="ورق", category=category)
+        stock.receive(supply, 50)
+        stock.issue(supply, 8)
+        movement = stock.adjust(supply, 40)
+
+        self.assertEqual((movement.kind, movement.change, movement.balance), (MovementKind.ADJUST, -2, 40))
+        self.assertIsNone(stock.adjust(supply, 40))
+        self.assertEqual(supply.movements.aggregate(total=Sum("change"))["total"], 40)
+
+    def test_edit_form_books_adjustment(self):
+        admin = User.objects.create(username="admin", is_superuser=True)
+        self.client.force_login(admin)
+        ink = make_ink(5)
+        response = self.client.post(reverse("inkinvent_edit", args=[ink.pk]), {
+            "name_ar": ink.name_ar, "name_en": "HP 85A Black", "category": ink.category_id, "quantity": 9,
+        })
+
+        self.assertEqual(response.status_code, 302)
+        ink.refresh_from_db()
+        self.assertEqual((ink.name_en, ink.quantity), ("HP 85A Black", 9))
+        self.assertEqual(ink.movements.first().change, 4)
+
+    def edit_ink(self, ink, quantity, shown, name_en="HP 85A"):
+        return self.client.post(reverse("inkinvent_edit", args=[ink.pk]), {
+            "name_ar": ink.name_ar, "name_en": name_en, "category": ink.category_id,
+            "quantity": quantity, "initial-quantity": shown,
+        })
+
+    def test_edit_form_keeps_stock_issued_since_it_was_loaded(self):
+        self.client.force_login(User.objects.create(username="admin", is_superuser=True))
+        ink = make_ink(10)
+        response = self.client.get(reverse("inkinvent_edit", args=[ink.pk]))
+        self.assertContains(response, 'name="initial-quantity" value="10"')
+
+        stock.issue(ink, 3)
+        self.assertEqual(self.edit_ink(ink, 12, shown=10).status_code, 302)
+        ink.refresh_from_db()
+        self.assertEqual(ink.quantity, 9)
+        self.assertEqual((ink.movements.first().change, ink.movements.first().balance), (2, 9))
+
+        # Unchanged quantity: only the other fields are saved
+        stock.issue(ink, 4)
+        self.assertEqual(self.edit_ink(ink, 9, shown=9, name_en="HP 85X").status_code, 302)
+        ink.refresh_from_db()
+        self.assertEqual((ink.name_en, ink.quantity), ("HP 85X", 5))
+        self.assertEqual(ink.movements.filter(kind=MovementKind.ADJUST).count(), 1)
+
+    def test_edit_form_cannot_remove_more_than_on_hand(self):
+        self.client.force_login(User.objects.create(username="admin", is_superuser=True))
+        ink = make_ink(10)
+        stock.issue(ink, 8)
+        response = self.edit_ink(ink, 5, shown=10, name_en="Renamed")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["form"].errors["quantity"])
+        ink.refresh_from_db()
+        self.assertEqual((ink.name_en, ink.quantity), ("HP 85A", 2))
+
+
+class BulkIssueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create(username="admin", is_superuser=True)
+        category = OfficeSupplyCategory.objects.create(name_en="Paper", name_ar="ورق")
+        cls.supplies = [
+            OfficeSupply.objects.create(name_en=f"Item {i}", name_ar=f"صنف {i}", category=category, quantity=20)
+            for i in range(10)
+        ]
+        cls.ink = make_ink(5)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post_api(self, lines, **extra):
+        return self.client.post(
+            reverse("bulk_issue_api"), json.dumps({"lines": lines, **extra}), content_type="application/json"
+        )
+
+    def test_ink_request_staff_may_issue_after_the_grant_migration(self):
+        group = Group.objects.create(name="Storekeeper")
+        group.permissions.add(Permission.objects.get(codename="change_inkrequest"))
+        staff = User.objects.create(username="storekeeper", email="storekeeper@example.com")
+        staff.groups.add(group)
+
+        # Re-run the data migration now that a group holds the ink request permission
+        migration = importlib.import_module("inventories.migrations.0006_grant_add_stockmovement")
+        state = MigrationExecutor(connection).loader.project_state(("inventories", "0006_grant_add_stockmovement"))
+        migration.grant_add_stockmovement(state.apps, SimpleNamespace(connection=connection))
+        self.assertTrue(group.permissions.filter(codename="add_stockmovement").exists())
+
+        self.client.force_login(staff)
+        response = self.post_api([{"item": "supply", "id": self.supplies[0].pk, "quantity": 1}])
+        self.assertEqual(response.status_code, 201)
+        response = self.client.get(reverse("bulk_issue"))
+        self.assertEqual(response.status_code, 200)
+
+    def test_api_issues_every_line(self):
+        lines = [{"item": "supply", "id": supply.pk, "quantity": 2} for supply in self.supplies]
+        lines += [{"item": "ink", "id": self.ink.pk, "quantity": 1}, {"item": "ink", "id": self.ink.pk, "quantity": 2}]
+        response = self.post_api(lines, reason="March")
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()["movements"]), 11)
+        self.assertEqual(set(OfficeSupply.objects.values_list("quantity", flat=True)), {18})
+        self.ink.refresh_from_db()
+        self.assertEqual(self.ink.quantity, 2)
+        request = InkRequest.objects.get()
+        self.assertEqual((request.quantity_used, request.reason, request.movement.balance), (3, "March", 2))
+
+    def test_api_rejects_whole_batch_on_shortage(self):
+        response = self.post_api([
+            {"item": "supply", "id": self.supplies[0].pk, "quantity": 1},
+            {"item": "ink", "id": self.ink.pk, "quantity": 6},
+        ])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["shortages"], [{"item": "ink", "id": self.ink.pk, "available": 5}])
+        self.assertEqual(StockMovement.objects.filter(kind=MovementKind.ISSUE).count(), 0)
+        self.assertEqual(OfficeSupply.objects.get(pk=self.supplies[0].pk).quantity, 20)
+
+    def test_balances_are_read_back_after_the_update(self):
+        movements = stock.issue_many([("ink", self.ink.pk, 5), ("supply", self.supplies[0].pk, 20)])
+
+        self.assertEqual(sorted(movement.balance for movement in movements), [0, 0])
+        self.ink.refresh_from_db()
+        self.assertEqual(self.ink.quantity, 0)
+        with self.assertRaises(stock.InsufficientStock) as raised:
+            stock.issue_many([("ink", self.ink.pk, 1), ("supply", self.supplies[1].pk, 1)])
+        self.assertEqual(raised.exception.shortages, {("ink", self.ink.pk): 0})
+        self.assertEqual(OfficeSupply.objects.get(pk=self.supplies[1].pk).quantity, 20)
+
+    def test_constraint_violation_is_reported_as_insufficient_stock(self):
+        with (
+            mock.patch("django.db.models.query.QuerySet.update", side_effect=IntegrityError("CHECK constraint failed")),
+            self.assertRaises(stock.InsufficientStock),
+        ):
+            stock.issue_many([("supply", self.supplies[0].pk, 1)])
+        self.assertFalse(StockMovement.objects.filter(kind=MovementKind.ISSUE).exists())
+
+    def test_api_query_count_is_constant(self):
+        def count(supplies):
+            lines = [{"item": "supply", "id": supply.pk, "quantity": 1} for supply in supplies]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.post_api(lines).status_code, 201)
+            return len(queries)
+
+        self.assertEqual(count(self.supplies[:1]), count(self.supplies))
+
+    def test_form(self):
+        data = {
+            "lines-TOTAL_FORMS": 3, "lines-INITIAL_FORMS": 0,
+            "lines-0-item": f"supply:{self.supplies[0].pk}", "lines-0-quantity": 4,
+            "lines-1-item": f"ink:{self.ink.pk}", "lines-1-quantity": 9,
+            "lines-2-item": "", "lines-2-quantity": "",
+            "requested_by": "", "reason": "",
+        }
+        response = self.client.post(reverse("bulk_issue"), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["formset"].forms[1].errors["quantity"], ["Only 5 in stock."])
+
+        data["lines-1-quantity"] = 5
+        self.assertRedirects(self.client.post(reverse("bulk_issue"), data), reverse("bulk_issue"))
+        self.assertEqual(OfficeSupply.objects.get(pk=self.supplies[0].pk).quantity, 16)
+        self.assertEqual(InkRequest.objects.get().requested_by, self.admin)
+
+
+class InkUsageRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username="clerk")
+        cls.ink = make_ink(100)
+
+    def request(self, quantity, days_ago=0, user=None):
+        created_at = datetime.datetime(2025, 3, 10, 12, tzinfo=datetime.timezone.utc) - datetime.timedelta(days=days_ago)
+        return InkRequest.objects.create(ink=self.ink, quantity_used=quantity, requested_by=user, created_at=created_at)
+
+    def test_incremental_rollup(self):
+        self.request(2, days_ago=1, user=self.user)
+        self.request(3, user=self.user)
+        self.request(1)
+        self.assertEqual(rollups.rollup(), 3)
+
+        self.request(4, user=self.user)
+        with self.assertNumQueries(9):
+            self.assertEqual(rollups.rollup(), 1)
+        self.assertEqual(rollups.rollup(), 0)
+
+        rows = InkUsageDaily.objects.order_by("day", "user_id").values_list("day", "user_id", "quantity", "requests")
+        self.assertEqual(list(rows), [
+            (datetime.date(2025, 3, 9), self.user.pk, 2, 1),
+            (datetime.date(2025, 3, 10), None, 1, 1),
+            (datetime.date(2025, 3, 10), self.user.pk, 7, 2),
+        ])
+        self.assertEqual(rollups.verify(), {})
+        self.assertEqual(list(rollups.consumption("ink")), [{"ink": self.ink.pk, "quantity": 10, "requests": 4}])
+
+    def test_recent_requests_wait_for_next_run(self):
+        self.request(2)
+        InkRequest.objects.create(ink=self.ink, quantity_used=5)
+        self.request(1)
+        self.assertEqual(rollups.rollup(), 1)
+        self.assertEqual(rollups.verify(), {})
+        self.assertEqual(rollups.rebuild(), 1)
+
+
+class ForecastTests(TestCase):
+    today = datetime.date(2025, 3, 11)
+
+    def test_smoothing_weights(self):
+        weights = forecast.smoothing_weights(90, 14)
+        self.assertAlmostEqual(sum(weights), 1)
+        self.assertAlmostEqual(weights[14] / weights[0], 0.5)
+
+    def test_burn_rates_and_reorder_list(self):
+        ink = make_ink(1000)
+        for days_ago in range(1, 91):
+            InkRequest.objects.create(
+                ink=ink, quantity_used=2,
+                created_at=datetime.datetime(2025, 3, 11, 12, tzinfo=datetime.timezone.utc) - datetime.timedelta(days=days_ago),
+            )
+        category = OfficeSupplyCategory.objects.create(name_en="Paper", name_ar="ورق")
+        supply = OfficeSupply.objects.create(name_en="A4", name_ar="ورق", category=category)
+        idle = OfficeSupply.objects.create(name_en="Pens", name_ar="أقلام", category=category)
+        stock.receive(supply, 30)
+        StockMovement.objects.create(
+            supply=supply, kind=MovementKind.ISSUE, change=-9, balance=21,
+            created_at=datetime.datetime(2025, 3, 10, 12, tzinfo=datetime.timezone.utc),
+        )
+
+        rollups.rollup()
+        rates = forecast.burn_rates(self.today, window=90, half_life=14)
+        self.assertAlmostEqual(rates["ink", ink.pk], 2)
+        self.assertAlmostEqual(rates["supply", supply.pk], 9 * forecast.smoothing_weights(90, 14)[0])
+        self.assertNotIn(("supply", idle.pk), rates)
+
+        with self.settings(STOCK_FORECAST_WINDOW=90, STOCK_FORECAST_HALF_LIFE=14):
+            self.assertEqual(forecast.recompute(self.today), 3)
+            self.assertEqual(forecast.recompute(self.today), 0)
+        InkInventory.objects.filter(pk=ink.pk).update(quantity=10)
+
+        items = forecast.reorder_list(lead_days=14, cover_days=30)
+        self.assertEqual([(item.kind, item.pk) for item in items], [("ink", ink.pk)])
+        self.assertAlmostEqual(items[0].days_left, 5)
+        self.assertEqual(items[0].reorder_quantity, 50)
+
+
+class ConcurrentIssueTests(TransactionTestCase):
+    """Parallel writers on separate connections must neither lose updates nor oversell."""
+    workers = 8
+    attempts = 25
+
+    def run_workers(self, target):
+        threads = [threading.Thread(target=target) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def issue_all(self, ink_pk, succeeded):
+        def work():
+            try:
+                for _ in range(self.attempts):
+                    # Retry lock errors: only stock errors count as rejections
+                    while True:
+                        try:
+                            ink = InkInventory.objects.get(pk=ink_pk)
+                            InkRequest.objects.create(ink=ink, quantity_used=1)
+                            succeeded.append(1)
+                            break
+                        except stock.InsufficientStock:
+                            break
+                        except OperationalError:
+                            time.sleep(0.001)
+            finally:
+                connection.close()
+        return work
+
+    def test_no_lost_updates(self):
+        initial = self.workers * self.attempts + 50
+        ink = make_ink(initial)
+        succeeded = []
+        self.run_workers(self.issue_all(ink.pk, succeeded))
+
+        ink.refresh_from_db()
+        self.assertEqual(len(succeeded), self.workers * self.attempts)
+        self.assertEqual(ink.quantity, 50)
+        self.assertEqual(InkRequest.objects.count(), len(succeeded))
+        self.assertEqual(ink.movements.aggregate(total=Sum("change"))["total"], 50)
+
+    def test_no_overselling(self):
+        ink = make_ink(30)
+        succeeded = []
+        self.run_workers(self.issue_all(ink.pk, succeeded))
+
+        ink.refresh_from_db()
+        self.assertEqual(len(succeeded), 30)
+        self.assertEqual(ink.quantity, 0)
+        balances = sorted(StockMovement.objects.filter(ink=ink, kind=MovementKind.ISSUE).values_list("balance", flat=True))
+        self.assertEqual(balances, list(range(30)))
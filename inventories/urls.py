@@ -23,4 +23,11 @@ urlpatterns = [
     path("supplies/add/", views.OfficeSupplyCreateView.as_view(), name="supply_add"),
     path("supplies/<int:pk>/edit/", views.OfficeSupplyUpdateView.as_view(), name="supply_edit"),
     path("supplies/<int:pk>/delete/", views.OfficeSupplyDeleteView.as_view(), name="supply_delete"),
+
+    # --- Reorder List ---
+    path("reorder/", views.ReorderListView.as_view(), name="reorder_list"),
+
+    # --- Bulk Issue ---
+    path("issue/", views.BulkIssueView.as_view(), name="bulk_issue"),
+    path("issue/api/", views.BulkIssueAPIView.as_view(), name="bulk_issue_api"),
 ]
@@ -3,15 +3,51 @@ from django.contrib.auth.decorators import login_required, permission_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.utils.translation import gettext as _
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.views import View
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, FormView, TemplateView
 from .models import InkCategory, InkInventory, InkRequest, OfficeSupplyCategory, OfficeSupply
-from .forms import InkInventoryForm, InkRequestForm, OfficeSupplyForm
+from .forms import BulkIssueForm, InkInventoryForm, InkRequestForm, IssueLineFormSet, OfficeSupplyForm
 
 from employees.mixins import PermissionMixin
+from . import forecast, stock
 
-from django.db import IntegrityError, DatabaseError
+from django.db import IntegrityError, DatabaseError, transaction
 from django.db.models import Q
 
+class StockFormMixin:
+    """
+    Create/update views for stocked items: the quantity typed in the form is
+    booked through the stock ledger (opening receipt, or a stock-count
+    adjustment) instead of overwriting the column.
+    """
+
+    def form_valid(self, form):
+        quantity = form.cleaned_data["quantity"]
+        try:
+            with transaction.atomic():
+                if form.instance.pk:
+                    self.object = form.save(commit=False)
+                    fields = [name for name in form.fields if name != "quantity"]
+                    self.object.save(update_fields=[*fields, "updated_at"])
+                    if "quantity" in form.changed_data:
+                        # Stock issued since the form was loaded stays issued
+                        stock.adjust_by(self.object, form.quantity_change(), user=self.request.user)
+                else:
+                    form.instance.quantity = 0
+                    self.object = form.save()
+                    if quantity:
+                        stock.receive(self.object, quantity, user=self.request.user, note=_("Opening stock"))
+        except stock.InsufficientStock as e:
+            form.add_error("quantity", str(e))
+            return self.form_invalid(form)
+        return redirect(self.get_success_url())
+
+
 # -------------------------------
 # Ink Category Manager
 # -------------------------------
@@ -228,7 +264,7 @@ class InkInventoryListView(PermissionMixin, ListView):
         return context
 
 
-class InkInventoryCreateView(PermissionMixin, CreateView):
+class InkInventoryCreateView(PermissionMixin, StockFormMixin, CreateView):
     model = InkInventory
     form_class = InkInventoryForm
     template_name = "inventory/form.html"
@@ -236,7 +272,7 @@ class InkInventoryCreateView(PermissionMixin, CreateView):
     permission_required = "inventories.add_inkinventory"
 
 
-class InkInventoryUpdateView(PermissionMixin, UpdateView):
+class InkInventoryUpdateView(PermissionMixin, StockFormMixin, UpdateView):
     model = InkInventory
     form_class = InkInventoryForm
     template_name = "inventory/form.html"
@@ -260,6 +296,7 @@ class InkInventoryDetailView(PermissionMixin, DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["requests"] = self.object.requests.select_related("requested_by").order_by("-created_at")
+        context["movements"] = self.object.movements.select_related("user")[:50]
         return context
 
 
@@ -323,7 +360,7 @@ class OfficeSupplyListView(PermissionMixin, ListView):
         return context
 
 
-class OfficeSupplyCreateView(PermissionMixin, CreateView):
+class OfficeSupplyCreateView(PermissionMixin, StockFormMixin, CreateView):
     model = OfficeSupply
     form_class = OfficeSupplyForm
     template_name = "inventory/form.html"
@@ -331,7 +368,7 @@ class OfficeSupplyCreateView(PermissionMixin, CreateView):
     permission_required = "inventories.add_officesupply"
 
 
-class OfficeSupplyUpdateView(PermissionMixin, UpdateView):
+class OfficeSupplyUpdateView(PermissionMixin, StockFormMixin, UpdateView):
     model = OfficeSupply
     form_class = OfficeSupplyForm
     template_name = "inventory/form.html"
@@ -344,3 +381,100 @@ class OfficeSupplyDeleteView(PermissionMixin, DeleteView):
     template_name = "inventory/delete.html"
     success_url = reverse_lazy("supply_list")
     permission_required = "inventories.delete_officesupply"
+
+
+# --- Reorder List ---
+class ReorderListView(PermissionMixin, TemplateView):
+    """Inks and office supplies expected to run out within the reorder lead time."""
+    template_name = "inventory/reorder_list.html"
+    permission_required = ("inventories.view_inkinventory", "inventories.view_officesupply")
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["items"] = forecast.reorder_list()
+        context["lead_days"] = settings.REORDER_LEAD_DAYS
+        context["cover_days"] = settings.REORDER_COVER_DAYS
+        return context
+
+
+# --- Bulk Issue ---
+class BulkIssueView(PermissionMixin, FormView):
+    """Issue many inks and office supplies in one submission (one transaction)."""
+    form_class = BulkIssueForm
+    template_name = "inventory/bulk_issue.html"
+    success_url = reverse_lazy("bulk_issue")
+    permission_required = "inventories.add_stockmovement"
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.setdefault("formset", IssueLineFormSet(prefix="lines"))
+        return context
+
+    def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        formset = IssueLineFormSet(request.POST, prefix="lines")
+        if form.is_valid() and formset.is_valid():
+            try:
+                movements = stock.issue_many(
+                    formset.lines(),
+                    user=form.cleaned_data["requested_by"] or request.user,
+                    note=form.cleaned_data["reason"],
+                )
+            except stock.InsufficientStock as e:
+                formset.add_shortages(e.shortages)
+                messages.error(request, str(e))
+            else:
+                messages.success(request, _("%(count)d item(s) issued successfully.") % {"count": len(movements)})
+                return redirect(self.get_success_url())
+        return self.render_to_response(self.get_context_data(form=form, formset=formset))
+
+
+class BulkIssueAPIView(PermissionMixin, View):
+    """
+    JSON bulk issue::
+
+        POST {"lines": [{"item": "ink", "id": 3, "quantity": 2}, ...],
+              "reason": "...", "requested_by": 5}
+
+    201 with the ledger rows written, 400 for a malformed body, 409 with the
+    short lines (and their quantity on hand) when stock is insufficient.
+    """
+    permission_required = "inventories.add_stockmovement"
+
+    def post(self, request, *args, **kwargs):
+        try:
+            payload = json.loads(request.body)
+            lines = [(str(line["item"]), int(line["id"]), int(line["quantity"])) for line in payload["lines"]]
+            requested_by = payload.get("requested_by")
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return JsonResponse({"error": "Invalid payload."}, status=400)
+        if not lines or any(kind not in stock.STOCK_MODELS or quantity <= 0 for kind, _pk, quantity in lines):
+            return JsonResponse({"error": "Invalid lines."}, status=400)
+
+        user = request.user
+        if requested_by is not None:
+            user = get_user_model().objects.filter(pk=requested_by).first()
+            if user is None:
+                return JsonResponse({"error": "Unknown requested_by."}, status=400)
+
+        try:
+            movements = stock.issue_many(lines, user=user, note=str(payload.get("reason") or ""))
+        except stock.InsufficientStock as e:
+            shortages = [
+                {"item": kind, "id": pk, "available": available}
+                for (kind, pk), available in e.shortages.items()
+            ]
+            return JsonResponse({"error": str(e), "shortages": shortages}, status=409)
+
+        return JsonResponse({"movements": [self.serialize(movement) for movement in movements]}, status=201)
+
+    @staticmethod
+    def serialize(movement):
+        kind = "ink" if movement.ink_id else "supply"
+        return {
+            "id": movement.pk,
+            "item": kind,
+            "item_id": movement.ink_id or movement.supply_id,
+            "change": movement.change,
+            "balance": movement.balance,
+        }
@@ -9,17 +9,31 @@ document.addEventListener("DOMContentLoaded", function () {
   const emptyFormDiv = document.getElementById("empty-form");
   if (!container || !addBtn || !totalForms || !emptyFormDiv) return;
 
-  // Fetch accessories via API
-  async function loadAccessories(deviceId, wrapper, selected = []) {
+  // Accessories already fetched, keyed by device id
+  const accessoriesCache = new Map();
+
+  // Most device ids the API accepts per request
+  const maxDeviceIds = 100;
+
+  // Fetch accessories of several devices, up to maxDeviceIds per request
+  async function fetchAccessories(deviceIds) {
+    const missing = [...new Set(deviceIds)].filter(id => id && !accessoriesCache.has(id));
+    for (let start = 0; start < missing.length; start += maxDeviceIds) {
+      const batch = missing.slice(start, start + maxDeviceIds);
+      const response = await fetch(`${apiUrl}?device_ids=` + batch.join(","));
+      if (!response.ok) return;
+
+      const data = await response.json();
+      Object.entries(data.devices).forEach(([id, accessories]) => accessoriesCache.set(id, accessories));
+    }
+  }
+
+  function renderAccessories(deviceId, wrapper, selected = []) {
+    if (!deviceId || !accessoriesCache.has(deviceId)) return;
     const accessoriesContainer = wrapper.querySelector(".checkbox-list");
     accessoriesContainer.innerHTML = "";
-    if (!deviceId) return;
-
-    const response = await fetch(`${apiUrl}?device_id=` + deviceId);
-    if (!response.ok) return;
 
-    const data = await response.json();
-    data.accessories.forEach(acc => {
+    accessoriesCache.get(deviceId).forEach(acc => {
       const label = document.createElement("label");
       label.classList.add("form-check-label", "d-block");
 
@@ -37,21 +51,42 @@ document.addEventListener("DOMContentLoaded", function () {
     });
   }
 
+  async function loadAccessories(deviceId, wrapper, selected = []) {
+    wrapper.querySelector(".checkbox-list").innerHTML = "";
+    if (!deviceId) return;
+    await fetchAccessories([deviceId]);
+    renderAccessories(deviceId, wrapper, selected);
+  }
+
   function setupDeviceWrapper(wrapper) {
     const deviceField = wrapper.querySelector("select[id$='-device']");
     if (!deviceField) return;
 
-    const selectedInputs = wrapper.querySelectorAll(".checkbox-list input:checked");
-    const selectedValues = Array.from(selectedInputs).map(i => i.value);
-
-    if (deviceField.value) loadAccessories(deviceField.value, wrapper, selectedValues);
-
     deviceField.addEventListener("change", function () {
       loadAccessories(this.value, wrapper, []);
     });
   }
 
+  // Existing rows: the server already rendered the accessories of their device;
+  // fetch (in one request) only for rows whose select the browser restored to another device
+  async function loadInitialAccessories() {
+    const rows = Array.from(container.querySelectorAll(".device-item")).map(wrapper => {
+      const deviceField = wrapper.querySelector("select[id$='-device']");
+      const selectedInputs = wrapper.querySelectorAll(".checkbox-list input:checked");
+      return {
+        wrapper,
+        deviceId: deviceField ? deviceField.value : "",
+        selected: Array.from(selectedInputs).map(i => i.value),
+      };
+    }).filter(row => row.deviceId && row.deviceId !== row.wrapper.dataset.renderedDevice);
+    if (!rows.length) return;
+
+    await fetchAccessories(rows.map(row => row.deviceId));
+    rows.forEach(row => renderAccessories(row.deviceId, row.wrapper, row.selected));
+  }
+
   container.querySelectorAll(".device-item").forEach(setupDeviceWrapper);
+  loadInitialAccessories();
 
   addBtn.addEventListener("click", function () {
     const formIndex = parseInt(totalForms.value, 10);
@@ -0,0 +1,62 @@
+from django.db import migrations
+
+from employees.search import normalize_text
+
+# The index as it was defined when this migration was written; later changes
+# to tickets.search ship their own migration
+TABLE = "tickets_ticket_fts"
+COLUMNS = ("title", "technician_notes", "details")
+CREATE = {
+    "sqlite": [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} "
+        f"USING fts5(title, technician_notes, details, tokenize='unicode61 remove_diacritics 2')",
+    ],
+    "postgresql": [
+        f"CREATE TABLE IF NOT EXISTS {TABLE} (id bigint PRIMARY KEY, document tsvector NOT NULL)",
+        f"CREATE INDEX IF NOT EXISTS {TABLE}_document ON {TABLE} USING GIN (document)",
+    ],
+}
+INSERT = {
+    "sqlite": f"INSERT INTO {TABLE} (rowid, title, technician_notes, details) VALUES (%s, %s, %s, %s)",
+    "postgresql": (
+        f"INSERT INTO {TABLE} (id, document) VALUES (%s, "
+        "setweight(to_tsvector('simple', %s), 'A') || "
+        "setweight(to_tsvector('simple', %s), 'B') || "
+        "setweight(to_tsvector('simple', %s), 'C'))"
+    ),
+}
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor not in CREATE:
+        return
+    Ticket = apps.get_model('tickets', 'Ticket')
+    rows = Ticket.objects.using(connection.alias).order_by('pk').values_list('pk', *COLUMNS)
+    with connection.cursor() as cursor:
+        for statement in CREATE[connection.vendor]:
+            cursor.execute(statement)
+        batch = []
+        for pk, *texts in rows.iterator(chunk_size=2000):
+            batch.append((pk, *[normalize_text(text) for text in texts]))
+            if len(batch) >= 2000:
+                cursor.executemany(INSERT[connection.vendor], batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT[connection.vendor], batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE:
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0002_ticket_ticket_created_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
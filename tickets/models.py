@@ -1,6 +1,6 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
-from employees.models import User
+from employees.models import CountedStatusMixin, User
 
 
 class TicketStatus(models.TextChoices):
@@ -28,7 +28,7 @@ class RequestType(models.Model):
         return f"{self.name_en} / {self.name_ar}"
 
 
-class Ticket(models.Model):
+class Ticket(CountedStatusMixin, models.Model):
     title = models.CharField(max_length=200, verbose_name=_("Title"))
     details = models.TextField(verbose_name=_("Details"))
     request_type = models.ForeignKey(RequestType, on_delete=models.PROTECT, verbose_name=_("Type"))
@@ -44,6 +44,9 @@ class Ticket(models.Model):
         verbose_name = _("Ticket")
         verbose_name_plural = _("Tickets")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="ticket_created_keyset_idx"),
+        ]
 
     def __str__(self):
         return f"#{self.pk} - {self.title}"
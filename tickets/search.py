@@ -0,0 +1,17 @@
+from employees.search import SearchIndex, register
+
+from .models import Ticket
+
+
+class TicketSearchIndex(SearchIndex):
+    name = "tickets"
+    model = Ticket
+    table = "tickets_ticket_fts"
+    columns = (
+        ("title", 10.0),
+        ("technician_notes", 2.0),
+        ("details", 1.0),
+    )
+
+
+ticket_index = register(TicketSearchIndex())
@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+
+from .models import Ticket
+from .search import ticket_index
+
+
+def index_ticket(sender, instance, using="default", update_fields=None, **kwargs):
+    # Status/assignment-only saves do not touch the indexed text
+    if update_fields is not None and not set(update_fields) & set(ticket_index.column_names()):
+        return
+    ticket_index.update(instance, using=using)
+
+
+def unindex_ticket(sender, instance, using="default", **kwargs):
+    ticket_index.delete(instance.pk, using=using)
+
+
+post_save.connect(index_ticket, sender=Ticket)
+post_delete.connect(unindex_ticket, sender=Ticket)
@@ -1,3 +1,140 @@
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from employees.models import User
+from employees.pagination import decode_cursor, encode_cursor
+from .models import Priority, RequestType, Ticket, TicketStatus
+from .search import ticket_index
+
+
+class TicketSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.request_type = RequestType.objects.create(name_en="Hardware", name_ar="أجهزة")
+        cls.alice = User.objects.create(username="alice", email="alice@example.com")
+        cls.bob = User.objects.create(username="bob", email="bob@example.com")
+
+    def add(self, title, details="", employee=None, **fields):
+        return Ticket.objects.create(
+            title=title, details=details, request_type=self.request_type,
+            employee=employee or self.alice, **fields
+        )
+
+    def search(self, query, queryset=None):
+        queryset = Ticket.objects.order_by("-created_at") if queryset is None else queryset
+        return list(ticket_index.filter(queryset, query))
+
+    def indexed(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {ticket_index.table} WHERE rowid = %s", [pk])
+            return cursor.fetchone()[0]
+
+    def test_indexed_on_create_with_prefixes_and_arabic_folding(self):
+        printer = self.add("Printer jammed", "Paper stuck in tray")
+        arabic = self.add("الطابعة لا تعمل", "الحبر منتهي")
+        self.assertEqual(self.search("print"), [printer])
+        self.assertEqual(self.search("stuck tray"), [printer])
+        self.assertEqual(self.search("الطابعه"), [arabic])
+        self.assertEqual(self.search("scanner"), [])
+
+    def test_save_and_delete_keep_the_index_current(self):
+        ticket = self.add("VPN drops", "Connection lost every hour")
+        ticket.technician_notes = "Replaced router firmware"
+        ticket.save()
+        self.assertEqual(self.search("firmware"), [ticket])
+
+        ticket.technician_notes = "Swapped the cable"
+        ticket.save()
+        self.assertEqual(self.search("firmware"), [])
+        self.assertEqual(self.search("cable"), [ticket])
+
+        pk = ticket.pk
+        ticket.delete()
+        self.assertEqual(self.indexed(pk), 0)
+
+    def test_title_matches_rank_above_details_matches(self):
+        in_details = self.add("Slow computer", "The keyboard also sticks")
+        in_title = self.add("Keyboard broken")
+        self.assertEqual(self.search("keyboard"), [in_title, in_details])
+
+    def test_ranking_applies_within_the_scope(self):
+        # Bob's tickets outrank Alice's; her list must still show her own match
+        for n in range(5):
+            self.add(f"Laptop battery {n}", "Laptop battery drains", employee=self.bob)
+        own = self.add("Dock", "The laptop does not charge", employee=self.alice)
+        self.assertEqual(self.search("laptop", Ticket.objects.filter(employee=self.alice)), [own])
+        self.assertEqual(len(self.search("laptop")), 6)
+        self.assertEqual(self.search("laptop", Ticket.objects.filter(status=TicketStatus.RESOLVED)), [])
+
+    def test_list_view_search_is_filtered_and_paginated(self):
+        admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        self.client.force_login(admin)
+        for n in range(12):
+            self.add(f"Printer {n}", priority=Priority.HIGH if n % 2 else Priority.NORMAL)
+        response = self.client.get(reverse("ticket_list"), {"q": "printer", "priority": Priority.HIGH})
+        self.assertEqual(response.status_code, 200)
+        tickets = list(response.context["tickets"])
+        self.assertEqual(len(tickets), 6)
+        self.assertEqual({ticket.priority for ticket in tickets}, {Priority.HIGH})
+
+
+@override_settings(KEYSET_PAGINATION=True)
+class TicketListPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "pass")
+        request_type = RequestType.objects.create(name_en="Hardware", name_ar="أجهزة")
+        cls.tickets = [
+            Ticket.objects.create(
+                title=f"Printer {n}", details="x" * n, request_type=request_type, employee=cls.admin
+            )
+            for n in range(25)
+        ]
+        # Newest first, as the list shows them
+        cls.tickets.reverse()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def page(self, **params):
+        response = self.client.get(reverse("ticket_list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context["page_obj"]
+
+    def test_cursor_round_trip(self):
+        ticket = self.tickets[0]
+        fields = ["created_at", "id"]
+        cursor = encode_cursor([ticket.created_at, ticket.pk])
+        self.assertEqual(decode_cursor(cursor, Ticket, fields), [ticket.created_at, ticket.pk])
+        self.assertIsNone(decode_cursor("garbage", Ticket, fields))
+
+    def test_forwards_then_backwards(self):
+        first = self.page()
+        self.assertTrue(first.is_keyset)
+        self.assertEqual(list(first), self.tickets[:10])
+        self.assertFalse(first.has_previous())
+
+        second = self.page(cursor=first.next_cursor)
+        self.assertEqual(list(second), self.tickets[10:20])
+        third = self.page(cursor=second.next_cursor)
+        self.assertEqual(list(third), self.tickets[20:])
+        self.assertFalse(third.has_next())
+
+        back = self.page(before=third.previous_cursor)
+        self.assertEqual(list(back), self.tickets[10:20])
+        self.assertEqual(back.next_cursor, second.next_cursor)
+        back = self.page(before=back.previous_cursor)
+        self.assertEqual(list(back), self.tickets[:10])
+        self.assertFalse(back.has_previous())
+
+    def test_search_keeps_relevance_order_with_page_numbers(self):
+        ranked = list(ticket_index.filter(Ticket.objects.order_by("-created_at"), "printer"))
+        self.assertNotEqual(ranked, self.tickets)
+
+        first = self.page(q="printer")
+        self.assertFalse(getattr(first, "is_keyset", False))
+        self.assertEqual(list(first), ranked[:10])
+        self.assertEqual(list(self.page(q="printer", page=3)), ranked[20:])
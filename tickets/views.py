@@ -6,9 +6,10 @@ from django.utils.translation import gettext_lazy as _
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.db import IntegrityError, DatabaseError
 
-from employees.mixins import PermissionMixin
+from employees.mixins import KeysetPaginationMixin, PermissionMixin
 from employees.models import User
 from .models import Ticket, RequestType
+from .search import ticket_index
 
 
 # Request Types View
@@ -98,18 +99,19 @@ def request_type_manage(request):
     })
 
 
-class TicketListView(PermissionMixin, ListView):
+class TicketListView(PermissionMixin, KeysetPaginationMixin, ListView):
     model = Ticket
     template_name = "tickets/list.html"
     context_object_name = "tickets"
     paginate_by = 10
+    keyset_fields = ("created_at", "id")
     permission_required = "tickets.view_ticket"
 
     def get_queryset(self):
         queryset = super().get_queryset().select_related("employee", "technician", "request_type").order_by("-created_at")
-        if self.request.user.groups.filter(name="Employee").exists() and not self.request.user.is_superuser:
+        if self.request.user.has_role("Employee") and not self.request.user.is_superuser:
             queryset = queryset.filter(employee=self.request.user)
-        elif self.request.user.groups.filter(name="Technician").exists() and not self.request.user.is_superuser:
+        elif self.request.user.has_role("Technician") and not self.request.user.is_superuser:
             queryset = queryset.filter(technician=self.request.user)
 
         # Filters
@@ -125,7 +127,7 @@ class TicketListView(PermissionMixin, ListView):
         if priority_filter:
             queryset = queryset.filter(priority=priority_filter)
         if search_query:
-            queryset = queryset.filter(title__icontains=search_query)
+            queryset = ticket_index.filter(queryset, search_query)
 
         return queryset
 
@@ -155,7 +157,7 @@ class TicketCreateView(PermissionMixin, CreateView):
 
     def get_form(self, form_class=None):
         form = super().get_form(form_class)
-        if self.request.user.groups.filter(name__in=["IT Employee", "Manager"]).exists() or self.request.user.is_superuser:
+        if self.request.user.has_role("IT Employee", "Manager") or self.request.user.is_superuser:
             technician_field = self.model._meta.get_field("technician").formfield()
             technician_field.queryset = User.objects.filter(groups__name__in=["IT Employee", "Technician"])
             form.fields["technician"] = technician_field
@@ -166,7 +168,7 @@ class TicketCreateView(PermissionMixin, CreateView):
         return form
     
     def form_valid(self, form):
-        if self.request.user.groups.filter(name="Employee").exists():
+        if self.request.user.has_role("Employee"):
             form.instance.employee = self.request.user
         messages.success(self.request, _("Ticket created successfully"))
         return super().form_valid(form)
@@ -190,7 +192,7 @@ class TicketUpdateView(PermissionMixin, UpdateView):
             if field_name in form.fields:
                 form.fields[field_name].disabled = True
 
-        if self.request.user.groups.filter(name__in=["IT Employee", "Manager"]).exists() or self.request.user.is_superuser:
+        if self.request.user.has_role("IT Employee", "Manager") or self.request.user.is_superuser:
             technician_field = self.model._meta.get_field("technician").formfield()
             technician_field.queryset = User.objects.filter(groups__name__in=["IT Employee", "Technician"]) 
             form.fields["technician"] = technician_field